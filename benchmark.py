@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Docker CTF Lab - Micro-benchmarks
+Mide las rutas calientes de docker_challenge.py con Docker y MQTT
+reemplazados por fakes en proceso (resultados deterministas):
+- generar_flag_personalizada
+- submit_flag (acierto, flag incorrecta, reto ya completado)
+- _verificar_reto_especifico por reto
+- save_progress / _cargar_progreso con progresos de tamaño creciente
+- Construcción de DockerChallenge()
+- Con --escala: captura del estado y verify_all contra el Docker Engine
+  simulado (fake_docker_engine.py) con hosts de tamaño creciente
+
+Uso:
+    python3 benchmark.py [--salida resultados.json] [--filtro texto] [--escala]
+    python3 benchmark.py --comparar baseline.json [--umbral 0.25]
+"""
+
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# Archivo de resultados por defecto
+SALIDA_POR_DEFECTO = "bench_results.json"
+
+# Tamaños de progreso (eventos registrados) para save/cargar
+TAMANOS_PROGRESO = (15, 150, 1500)
+
+# Contenedores del host simulado para los benchmarks de escala
+TAMANOS_HOST = (100, 1000, 10000)
+
+# Documento del estudiante usado en todas las mediciones
+DOCUMENTO = "1234567890"
+
+# Tiempo objetivo por repetición y número de repeticiones
+TIEMPO_REPETICION = 0.05
+REPETICIONES = 5
+
+
+# ============================================================================
+# FAKES DE DOCKER Y MQTT
+# ============================================================================
+
+def _con_tag(referencia: str) -> str:
+    """Referencia de imagen con ':latest' si no tiene tag"""
+    return referencia if ":" in referencia.rsplit("/", 1)[-1] else f"{referencia}:latest"
+
+
+def _filtro(filters: Optional[Dict], nombre: str) -> List[str]:
+    """Valores de un filtro de la API (lista o {valor: true})"""
+    valores = (filters or {}).get(nombre)
+    if isinstance(valores, dict):
+        return [v for v, activo in valores.items() if activo]
+    if isinstance(valores, str):
+        return [valores]
+    return list(valores or [])
+
+
+def _contenedor(id: str, nombre: str, imagen: str, estado: str = "running",
+                puertos=(), redes=("bridge",)) -> Dict:
+    """Elemento de GET /containers/json"""
+    return {
+        "Id": id,
+        "Names": [f"/{nombre}"],
+        "Image": imagen,
+        "ImageID": f"sha256:{imagen}",
+        "State": estado,
+        "Labels": {},
+        "Ports": [
+            {"PublicPort": host, "PrivatePort": privado, "Type": "tcp"}
+            for host, privado in puertos
+        ],
+        "NetworkSettings": {"Networks": {red: {} for red in redes}},
+    }
+
+
+class FakeDockerApi:
+    """API de bajo nivel con un laboratorio en el que todos los retos se cumplen"""
+
+    def __init__(self):
+        imagenes = ["hello-world:latest", "nginx:alpine", "alpine:latest",
+                    "redis:alpine", "mi-app:v1", "ssh-custom:latest"]
+        self._imagenes = [{"Id": f"sha256:{tag}", "RepoTags": [tag]} for tag in imagenes]
+        self._contenedores = [
+            _contenedor("c01", "hola", "hello-world", estado="exited"),
+            _contenedor("c02", "webserver", "nginx:alpine"),
+            _contenedor("c03", "webserver-port", "nginx:alpine", puertos=[(8080, 80)]),
+            _contenedor("c04", "contenedor1", "alpine", redes=("mi_red_ctf",)),
+            _contenedor("c05", "contenedor2", "alpine", redes=("mi_red_ctf",)),
+            _contenedor("c06", "ssh-server", "ssh-custom", puertos=[(2222, 22)]),
+            _contenedor("c07", "telnet-server", "alpine", puertos=[(2323, 23)]),
+            _contenedor("c08", "scada-server", "alpine", puertos=[(8000, 8000)]),
+            _contenedor("c09", "vnc-desktop", "alpine", puertos=[(5900, 5900)]),
+            _contenedor("c10", "app-web", "nginx:alpine"),
+            _contenedor("c11", "app-cache", "redis:alpine"),
+        ]
+
+    # Filtros como los aplica Docker: las verificaciones por reto los usan
+
+    def images(self, name=None, filters=None):
+        referencias = [_con_tag(r) for r in _filtro(filters, "reference") + ([name] if name else [])]
+        return [i for i in self._imagenes
+                if not referencias or set(referencias) & set(i["RepoTags"])]
+
+    def containers(self, all=False, filters=None):
+        nombres = _filtro(filters, "name")
+        ancestros = [_con_tag(a) for a in _filtro(filters, "ancestor")]
+        redes = _filtro(filters, "network")
+        publicados = [p.split("/")[0] for p in _filtro(filters, "publish")]
+        return [
+            c for c in self._contenedores
+            if (all or c["State"] == "running")
+            and (not nombres or any(re.search(n, c["Names"][0]) for n in nombres))
+            and (not ancestros or _con_tag(c["Image"]) in ancestros)
+            and (not redes or set(redes) & set(c["NetworkSettings"]["Networks"]))
+            and (not publicados or any(str(p["PublicPort"]) in publicados for p in c["Ports"]))
+        ]
+
+    def volumes(self, filters=None):
+        nombres = _filtro(filters, "name")
+        return {"Volumes": [{"Name": v} for v in ("datos_importantes",)
+                            if not nombres or any(n in v for n in nombres)]}
+
+    def networks(self, names=None, filters=None):
+        nombres = list(names or []) + _filtro(filters, "name")
+        return [{"Name": r} for r in ("bridge", "host", "mi_red_ctf")
+                if not nombres or any(n in r for n in nombres)]
+
+
+class FakeDockerClient:
+    """Cliente Docker en proceso (solo la API de bajo nivel que usa el lab)"""
+
+    def __init__(self):
+        self.api = FakeDockerApi()
+
+
+class FakeOutbox:
+    """Outbox MQTT que solo cuenta los eventos"""
+
+    def __init__(self):
+        self.eventos = 0
+
+    def enviar(self, topic: str, payload: Dict, qos: int = 1) -> None:
+        self.eventos += 1
+
+    def cerrar(self, timeout: float = 0) -> bool:
+        return True
+
+
+# ============================================================================
+# MEDICIÓN
+# ============================================================================
+
+def medir(funcion: Callable, preparar: Optional[Callable] = None) -> Dict:
+    """
+    Mide el tiempo por llamada de una función.
+
+    Args:
+        funcion: Función a medir (sin argumentos). Si se indica 'preparar',
+            recibe lo que éste devuelva.
+        preparar: Preparación por iteración, excluida de la medición
+
+    Returns:
+        {"mediana_us", "min_us", "iteraciones"}
+    """
+    # Calibrar las iteraciones para que cada repetición dure TIEMPO_REPETICION
+    iteraciones = 1
+    while True:
+        duracion = _repeticion(funcion, preparar, iteraciones)
+        if duracion >= TIEMPO_REPETICION or iteraciones >= 1_000_000:
+            break
+        iteraciones *= 2 if duracion == 0 else max(2, min(10, int(TIEMPO_REPETICION / duracion) + 1))
+
+    tiempos = [
+        _repeticion(funcion, preparar, iteraciones) / iteraciones * 1e6
+        for _ in range(REPETICIONES)
+    ]
+    return {
+        "mediana_us": round(statistics.median(tiempos), 3),
+        "min_us": round(min(tiempos), 3),
+        "iteraciones": iteraciones,
+    }
+
+
+def _repeticion(funcion: Callable, preparar: Optional[Callable], iteraciones: int) -> float:
+    """Segundos que tardan 'iteraciones' llamadas (sin contar la preparación)"""
+    if preparar is None:
+        inicio = time.perf_counter()
+        for _ in range(iteraciones):
+            funcion()
+        return time.perf_counter() - inicio
+
+    total = 0.0
+    for _ in range(iteraciones):
+        argumento = preparar()
+        inicio = time.perf_counter()
+        funcion(argumento)
+        total += time.perf_counter() - inicio
+    return total
+
+
+# ============================================================================
+# BENCHMARKS
+# ============================================================================
+
+class Benchmarks:
+    """Prepara el entorno aislado y ejecuta cada benchmark"""
+
+    def __init__(self, directorio: Path):
+        # HOME temporal: progreso, spool y caché de packs aislados
+        self.directorio = directorio
+        os.environ["HOME"] = str(directorio)
+        os.environ["MQTT_ENABLED"] = "true"
+        os.environ["DOCKER_CTF_PROGRESS_BACKEND"] = "json"
+        os.environ["DOCKER_CTF_DAEMON"] = "false"
+
+        from docker_challenge import DockerChallenge
+        from progress_store import JsonProgressStore
+
+        self.DockerChallenge = DockerChallenge
+        self.JsonProgressStore = JsonProgressStore
+        self.contador = 0
+
+        self.challenge = self._nuevo_challenge()
+        self.challenge.progress_store.registrar_documento(DOCUMENTO)
+        self.challenge.documento_estudiante = DOCUMENTO
+
+    def _nuevo_challenge(self):
+        """DockerChallenge con Docker y MQTT falsos"""
+        challenge = self.DockerChallenge()
+        challenge.docker_client = FakeDockerClient()
+        challenge._mqtt_outbox = FakeOutbox()
+        return challenge
+
+    def _store_nuevo(self, eventos: int = 0, compactar: bool = True):
+        """Progress store en un archivo nuevo con N retos completados"""
+        self.contador += 1
+        ruta = self.directorio / "stores" / f"progreso_{self.contador}.json"
+        ruta.parent.mkdir(exist_ok=True)
+        store = self.JsonProgressStore(ruta, compactar_cada=10 ** 9)
+        store.cargar()
+        store.registrar_documento(DOCUMENTO)
+        for reto_id in range(1, eventos + 1):
+            store.registrar_completado(reto_id, 10)
+        if compactar:
+            store.compactar()
+        store.flush()
+        return store
+
+    def ejecutar(self, filtro: str = "", escala: bool = False) -> Dict[str, Dict]:
+        """Ejecuta los benchmarks cuyo nombre contiene 'filtro'"""
+        resultados = {}
+        casos = self._casos_escala() if escala else self._casos()
+        for nombre, funcion, preparar in casos:
+            if filtro and filtro not in nombre:
+                continue
+            resultados[nombre] = medir(funcion, preparar)
+            print(f"   {nombre:<40} {resultados[nombre]['mediana_us']:>12.2f} µs")
+        return resultados
+
+    def _casos(self):
+        """(nombre, función, preparación) de cada benchmark"""
+        challenge = self.challenge
+        reto = challenge.retos[0]
+        flag = challenge.obtener_flag(reto.id)
+
+        yield ("generar_flag_personalizada",
+               lambda: challenge.generar_flag_personalizada(reto.id, reto.flag_base), None)
+
+        # submit_flag: cada acierto usa un progreso nuevo (preparación no medida)
+        def preparar_acierto():
+            challenge.progress_store.cerrar()
+            challenge.progress_store = self._store_nuevo()
+            return flag
+
+        yield ("submit_flag_acierto", challenge.submit_flag, preparar_acierto)
+
+        def submit_incorrecta():
+            challenge.progress_store = completado
+            return challenge.submit_flag("00000000-0000-0000-0000-000000000000")
+
+        def submit_ya_completado():
+            challenge.progress_store = completado
+            return challenge.submit_flag(flag)
+
+        completado = self._store_nuevo()
+        completado.registrar_completado(reto.id, reto.puntos)
+        yield ("submit_flag_incorrecta", submit_incorrecta, None)
+        yield ("submit_flag_ya_completado", submit_ya_completado, None)
+
+        for r in challenge.retos:
+            yield (f"verificar_reto_{r.id:02d}",
+                   lambda reto_id=r.id: challenge._verificar_reto_especifico(reto_id), None)
+
+        for eventos in TAMANOS_PROGRESO:
+            store = self._store_nuevo(eventos)
+            yield (f"save_progress_{eventos}", self._save_progress(store), None)
+
+            ruta = self._store_nuevo(eventos).snapshot_path
+            yield (f"cargar_progreso_{eventos}", self._cargar_progreso(ruta), None)
+
+            ruta = self._store_nuevo(eventos, compactar=False).snapshot_path
+            yield (f"cargar_progreso_diario_{eventos}", self._cargar_progreso(ruta), None)
+
+        def construir():
+            # Cerrar el store de cada instancia: el benchmark construye miles
+            self.DockerChallenge().progress_store.cerrar()
+
+        yield ("construccion_docker_challenge", construir, None)
+
+    def _casos_escala(self):
+        """Verificadores contra el Docker Engine simulado con N contenedores"""
+        import docker
+        from fake_docker_engine import FakeDockerEngine, generar_fixture
+
+        challenge = self._nuevo_challenge()
+        for contenedores in TAMANOS_HOST:
+            fixture = generar_fixture(contenedores=contenedores, imagenes=contenedores // 50,
+                                      redes=contenedores // 100, volumenes=contenedores // 100)
+            engine = FakeDockerEngine(str(self.directorio / "docker.sock"), fixture).iniciar()
+            try:
+                challenge.docker_client = docker.DockerClient(base_url=engine.base_url)
+                yield (f"capturar_estado_{contenedores}", challenge.capturar_estado_docker, None)
+                yield (f"verify_all_{contenedores}", challenge.verify_all, None)
+                yield (f"verificar_reto_03_{contenedores}",
+                       lambda: challenge._verificar_reto_especifico(3), None)
+            finally:
+                challenge.docker_client.close()
+                engine.detener()
+
+    def _save_progress(self, store) -> Callable:
+        """save_progress sobre un store con el tamaño indicado"""
+        challenge = self._nuevo_challenge()
+        challenge.progress_store = store
+        return challenge.save_progress
+
+    def _cargar_progreso(self, ruta: Path) -> Callable:
+        """_cargar_progreso desde un store nuevo (lectura en frío del archivo)"""
+        challenge = self.challenge
+
+        def cargar():
+            challenge.progress_store = self.JsonProgressStore(ruta)
+            challenge._cargar_progreso()
+            challenge.progress_store.cerrar()
+
+        return cargar
+
+
+# ============================================================================
+# RESULTADOS Y COMPARACIÓN
+# ============================================================================
+
+def comparar(resultados: Dict[str, Dict], baseline: Dict[str, Dict], umbral: float) -> List[str]:
+    """
+    Compara contra un baseline y muestra la tabla de diferencias.
+
+    Args:
+        resultados: Resultados actuales
+        baseline: Resultados de referencia
+        umbral: Aumento relativo de la mediana considerado regresión (0.25 = 25%)
+
+    Returns:
+        Nombres de los benchmarks con regresión
+    """
+    regresiones = []
+    print(f"\n{'Benchmark':<40} {'Baseline µs':>12} {'Actual µs':>12} {'Cambio':>9}")
+    print("-" * 76)
+
+    for nombre, actual in resultados.items():
+        referencia = baseline.get(nombre)
+        if not referencia:
+            print(f"{nombre:<40} {'-':>12} {actual['mediana_us']:>12.2f} {'nuevo':>9}")
+            continue
+
+        cambio = actual["mediana_us"] / referencia["mediana_us"] - 1 if referencia["mediana_us"] else 0.0
+        marca = ""
+        if cambio > umbral:
+            regresiones.append(nombre)
+            marca = " ❌"
+        elif cambio < -umbral:
+            marca = " ✅"
+        print(f"{nombre:<40} {referencia['mediana_us']:>12.2f} {actual['mediana_us']:>12.2f} {cambio:>+8.0%}{marca}")
+
+    return regresiones
+
+
+def _opcion(args: List[str], nombre: str, defecto: Optional[str] = None) -> Optional[str]:
+    """Valor de una opción '--nombre valor' de la línea de comandos"""
+    if nombre in args:
+        indice = args.index(nombre)
+        if indice + 1 < len(args):
+            return args[indice + 1]
+        print(f"❌ La opción {nombre} requiere un valor")
+        sys.exit(1)
+    return defecto
+
+
+def main():
+    """Ejecuta los benchmarks y guarda (o compara) los resultados"""
+    args = sys.argv[1:]
+    salida = Path(_opcion(args, "--salida", SALIDA_POR_DEFECTO))
+    baseline_path = _opcion(args, "--comparar")
+    umbral = float(_opcion(args, "--umbral", "0.25"))
+    filtro = _opcion(args, "--filtro", "")
+    escala = "--escala" in args
+
+    # Leer el baseline antes de cambiar HOME (las rutas relativas no cambian)
+    baseline = None
+    if baseline_path:
+        try:
+            with open(baseline_path, "r", encoding="utf-8") as f:
+                baseline = json.load(f)["resultados"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"❌ No se pudo leer el baseline {baseline_path}: {e}")
+            sys.exit(1)
+
+    print("\n⏱️  Docker CTF Lab - Benchmarks\n")
+    with tempfile.TemporaryDirectory(prefix="docker_ctf_bench_") as directorio:
+        resultados = Benchmarks(Path(directorio)).ejecutar(filtro, escala)
+
+    datos = {
+        "fecha": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "resultados": resultados,
+    }
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(datos, f, indent=2)
+    print(f"\n💾 Resultados guardados en {salida}")
+
+    if baseline is not None:
+        regresiones = comparar(resultados, baseline, umbral)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} regresiones (> {umbral:.0%}): {', '.join(regresiones)}\n")
+            sys.exit(1)
+        print(f"\n✅ Sin regresiones mayores a {umbral:.0%}\n")
+
+
+if __name__ == "__main__":
+    main()
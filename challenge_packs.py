@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Docker CTF Lab - Packs de Retos
+Carga packs de retos declarativos (JSON) y los compila en objetos inmutables
+más una tabla de despacho de predicados de verificación.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# Pack incluido con el laboratorio
+PACK_POR_DEFECTO = Path(__file__).resolve().parent / "retos" / "docker_ctf_lab.json"
+
+# Directorio de caché de packs compilados (clave: hash del archivo)
+CACHE_DIR = Path.home() / ".docker_ctf_cache" / "packs"
+
+# Se incrementa cuando cambia la estructura compilada para invalidar la caché
+FORMATO_CACHE = 2
+
+
+class ChallengePackError(Exception):
+    """Error al cargar o compilar un pack de retos"""
+    pass
+
+
+class Pregunta(NamedTuple):
+    """Pregunta de quiz asociada a un reto"""
+    pregunta: str
+    respuesta: str
+
+
+class Reto(NamedTuple):
+    """Reto compilado (inmutable) de un pack"""
+    id: int
+    nombre: str
+    descripcion: str
+    pista: str
+    flag_base: str
+    puntos: int
+    dificultad: str
+    categoria: str
+    preguntas: Tuple[Pregunta, ...]
+    verificacion: Tuple[Callable, ...]
+
+    def preguntas_dict(self) -> List[Dict]:
+        """Preguntas en el formato JSON usado por la API"""
+        return [p._asdict() for p in self.preguntas]
+
+
+class RecursosLab(NamedTuple):
+    """Recursos Docker que crea el laboratorio (usados por la limpieza)"""
+    contenedores: frozenset
+    volumenes: frozenset
+    redes: frozenset
+    imagenes: frozenset
+    # Imágenes base cuyos contenedores (con cualquier nombre) son del lab,
+    # pero que no se eliminan para no tener que descargarlas de nuevo
+    imagenes_origen: frozenset
+
+
+# ============================================================================
+# PREDICADOS DE VERIFICACIÓN
+# Cada predicado recibe un DockerStateSnapshot y los parámetros del pack.
+# ============================================================================
+
+def _contenedor_en_ejecucion(estado, nombre: str) -> bool:
+    """Contenedor con nombre X en ejecución"""
+    contenedor = estado.contenedor(nombre)
+    return contenedor is not None and contenedor.en_ejecucion
+
+
+def _contenedor_desde_imagen(estado, imagen: str) -> bool:
+    """Al menos un contenedor (en cualquier estado) creado desde la imagen"""
+    return len(estado.contenedores_con_imagen(imagen)) > 0
+
+
+def _imagen_presente(estado, tag: str) -> bool:
+    """Imagen con el tag indicado presente localmente"""
+    return estado.tiene_imagen(tag)
+
+
+def _volumen_presente(estado, nombre: str) -> bool:
+    """Volumen con el nombre indicado"""
+    return nombre in estado.volumenes
+
+
+def _red_presente(estado, nombre: str) -> bool:
+    """Red con el nombre indicado"""
+    return nombre in estado.redes
+
+
+def _red_con_miembros(estado, red: str, contenedores: Tuple[str, ...]) -> bool:
+    """Todos los contenedores indicados corren conectados a la red"""
+    for nombre in contenedores:
+        contenedor = estado.contenedor(nombre)
+        if contenedor is None or not contenedor.en_ejecucion or red not in contenedor.redes:
+            return False
+    return True
+
+
+def _puerto_host_publicado(estado, puertos: Tuple[int, ...]) -> bool:
+    """Algún contenedor en ejecución publica alguno de los puertos en el host"""
+    return any(estado.puerto_host_publicado(puerto) for puerto in puertos)
+
+
+def _puerto_mapeado(estado, contenedor: str, puerto_host: int,
+                    puerto_contenedor: int, protocolo: str = "tcp") -> bool:
+    """El contenedor mapea puerto_host -> puerto_contenedor/protocolo"""
+    info = estado.contenedor(contenedor)
+    return info is not None and (puerto_host, puerto_contenedor, protocolo) in info.puertos
+
+
+def _imagenes_en_ejecucion(estado, contienen: Tuple[str, ...]) -> bool:
+    """Para cada texto hay un contenedor en ejecución cuya imagen lo contiene"""
+    tags = [tag for c in estado.contenedores_en_ejecucion() for tag in c.tags]
+    return all(any(texto in tag for tag in tags) for texto in contienen)
+
+
+def _contenedores_en_ejecucion(estado, minimo: int = 1) -> bool:
+    """Hay al menos 'minimo' contenedores en ejecución"""
+    return len(estado.contenedores_en_ejecucion()) >= minimo
+
+
+# Tabla de despacho: tipo declarado en el pack -> predicado
+PREDICADOS: Dict[str, Callable] = {
+    "contenedor_en_ejecucion": _contenedor_en_ejecucion,
+    "contenedor_desde_imagen": _contenedor_desde_imagen,
+    "imagen_presente": _imagen_presente,
+    "volumen_presente": _volumen_presente,
+    "red_presente": _red_presente,
+    "red_con_miembros": _red_con_miembros,
+    "puerto_host_publicado": _puerto_host_publicado,
+    "puerto_mapeado": _puerto_mapeado,
+    "imagenes_en_ejecucion": _imagenes_en_ejecucion,
+    "contenedores_en_ejecucion": _contenedores_en_ejecucion,
+}
+
+
+# Parámetros de cada predicado que nombran recursos del laboratorio:
+# predicado -> ((parámetro, tipo de recurso), ...)
+RECURSOS_POR_PREDICADO: Dict[Callable, Tuple[Tuple[str, str], ...]] = {
+    _contenedor_en_ejecucion: (("nombre", "contenedores"),),
+    _contenedor_desde_imagen: (("imagen", "imagenes_origen"),),
+    _volumen_presente: (("nombre", "volumenes"),),
+    _red_presente: (("nombre", "redes"),),
+    _red_con_miembros: (("red", "redes"), ("contenedores", "contenedores")),
+    _puerto_mapeado: (("contenedor", "contenedores"),),
+}
+
+
+def _congelar(valor):
+    """Convierte listas de parámetros en tuplas (inmutables y hashables)"""
+    if isinstance(valor, list):
+        return tuple(_congelar(v) for v in valor)
+    return valor
+
+
+class PackRetos:
+    """
+    Pack de retos compilado: retos inmutables indexados por id y tabla de
+    despacho reto_id -> predicados de verificación.
+    """
+
+    __slots__ = ("nombre", "retos", "por_id", "flag_bases", "verificadores",
+                 "limpieza", "recursos", "huella")
+
+    def __init__(self, nombre: str, retos: Tuple[Reto, ...], huella: str = "",
+                 limpieza: Optional[Dict[str, Tuple[str, ...]]] = None):
+        self.nombre = nombre
+        self.retos = retos
+        self.por_id: Dict[int, Reto] = {reto.id: reto for reto in retos}
+        self.flag_bases: Dict[int, str] = {reto.id: reto.flag_base for reto in retos}
+        self.verificadores: Dict[int, Tuple[Callable, ...]] = {reto.id: reto.verificacion for reto in retos}
+        self.limpieza = limpieza or {}
+        self.recursos = self._calcular_recursos()
+        self.huella = huella
+
+    def __reduce__(self):
+        return (PackRetos, (self.nombre, self.retos, self.huella, self.limpieza))
+
+    def _calcular_recursos(self) -> RecursosLab:
+        """Recursos nombrados en los predicados más la sección 'limpieza' del pack"""
+        recursos = {campo: set(self.limpieza.get(campo, ())) for campo in RecursosLab._fields}
+
+        for predicados in self.verificadores.values():
+            for predicado in predicados:
+                for parametro, campo in RECURSOS_POR_PREDICADO.get(predicado.func, ()):
+                    valor = predicado.keywords.get(parametro)
+                    if isinstance(valor, tuple):
+                        recursos[campo].update(valor)
+                    elif valor:
+                        recursos[campo].add(valor)
+
+        return RecursosLab(**{campo: frozenset(valores) for campo, valores in recursos.items()})
+
+    def verificar(self, reto_id: int, estado) -> bool:
+        """
+        Evalúa los predicados de un reto sobre un estado de Docker.
+
+        Args:
+            reto_id: ID del reto
+            estado: DockerStateSnapshot a evaluar
+
+        Returns:
+            True si se cumplen todos los predicados (o el reto no tiene)
+        """
+        return all(predicado(estado) for predicado in self.verificadores.get(reto_id, ()))
+
+
+def _compilar_predicado(reto_id: int, definicion: Dict) -> Callable:
+    """Compila una definición {"tipo": ..., parámetros...} a un predicado"""
+    parametros = dict(definicion)
+    tipo = parametros.pop("tipo", None)
+    funcion = PREDICADOS.get(tipo)
+    if funcion is None:
+        raise ChallengePackError(f"Reto {reto_id}: tipo de verificación desconocido '{tipo}'")
+
+    parametros = {clave: _congelar(valor) for clave, valor in parametros.items()}
+
+    # Validar los parámetros contra la firma del predicado
+    # (inspect se importa solo al compilar; cargar desde la caché no lo necesita)
+    import inspect
+    try:
+        inspect.signature(funcion).bind(None, **parametros)
+    except TypeError as e:
+        raise ChallengePackError(f"Reto {reto_id}: parámetros inválidos para '{tipo}': {e}")
+
+    return partial(funcion, **parametros)
+
+
+def compilar_pack(datos: Dict, huella: str = "") -> PackRetos:
+    """
+    Compila la definición JSON de un pack.
+
+    Args:
+        datos: Contenido del pack ya decodificado
+        huella: Hash del archivo de origen
+
+    Returns:
+        PackRetos compilado
+    """
+    retos = []
+    ids = set()
+
+    for definicion in datos.get("retos", []):
+        try:
+            reto_id = int(definicion["id"])
+            if reto_id in ids:
+                raise ChallengePackError(f"Reto {reto_id} duplicado")
+            ids.add(reto_id)
+
+            retos.append(Reto(
+                id=reto_id,
+                nombre=definicion["nombre"],
+                descripcion=definicion.get("descripcion", ""),
+                pista=definicion.get("pista", ""),
+                flag_base=definicion["flag_base"],
+                puntos=int(definicion.get("puntos", 0)),
+                dificultad=definicion.get("dificultad", ""),
+                categoria=definicion.get("categoria", ""),
+                preguntas=tuple(
+                    Pregunta(p["pregunta"], p["respuesta"])
+                    for p in definicion.get("preguntas", [])
+                ),
+                verificacion=tuple(
+                    _compilar_predicado(reto_id, v)
+                    for v in definicion.get("verificacion", [])
+                ),
+            ))
+        except KeyError as e:
+            raise ChallengePackError(f"Reto sin el campo obligatorio {e}")
+
+    limpieza = datos.get("limpieza") or {}
+    desconocidos = set(limpieza) - set(RecursosLab._fields)
+    if desconocidos:
+        raise ChallengePackError(f"Sección 'limpieza' con claves desconocidas: {sorted(desconocidos)}")
+
+    return PackRetos(
+        datos.get("nombre", ""),
+        tuple(retos),
+        huella,
+        {campo: tuple(valores) for campo, valores in limpieza.items()},
+    )
+
+
+# Packs ya cargados en este proceso: ruta -> (huella, pack)
+_packs_cargados: Dict[str, Tuple[str, PackRetos]] = {}
+
+
+def cargar_pack(ruta=None, usar_cache: bool = True) -> PackRetos:
+    """
+    Carga un pack de retos, reutilizando la versión compilada en caché
+    (en memoria o en disco) si el hash del archivo no cambió.
+
+    Args:
+        ruta: Archivo JSON del pack (por defecto DOCKER_CTF_PACK o el pack incluido)
+        usar_cache: Si es False siempre se recompila
+
+    Returns:
+        PackRetos compilado
+    """
+    ruta = Path(ruta or os.getenv("DOCKER_CTF_PACK") or PACK_POR_DEFECTO)
+
+    try:
+        contenido = ruta.read_bytes()
+    except OSError as e:
+        raise ChallengePackError(f"No se pudo leer el pack {ruta}: {e}")
+
+    huella = hashlib.sha256(contenido).hexdigest()
+    clave = str(ruta.resolve())
+
+    if usar_cache:
+        en_memoria = _packs_cargados.get(clave)
+        if en_memoria and en_memoria[0] == huella:
+            return en_memoria[1]
+
+    cache_file = CACHE_DIR / f"{huella}.v{FORMATO_CACHE}.pickle"
+    pack = None
+
+    if usar_cache and cache_file.exists():
+        try:
+            with open(cache_file, "rb") as f:
+                pack = pickle.load(f)
+        except Exception:
+            pack = None
+
+    if pack is None:
+        try:
+            datos = json.loads(contenido.decode("utf-8"))
+        except ValueError as e:
+            raise ChallengePackError(f"Pack {ruta} no es JSON válido: {e}")
+        pack = compilar_pack(datos, huella)
+
+        if usar_cache:
+            _guardar_cache(cache_file, pack)
+
+    _packs_cargados[clave] = (huella, pack)
+    return pack
+
+
+def _guardar_cache(cache_file: Path, pack: PackRetos) -> None:
+    """Escribe el pack compilado en la caché de forma atómica"""
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_file.with_suffix(f".tmp{os.getpid()}")
+        with open(tmp, "wb") as f:
+            pickle.dump(pack, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_file)
+    except OSError:
+        # La caché es opcional: si no se puede escribir se recompila la próxima vez
+        pass
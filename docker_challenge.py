@@ -6,23 +6,25 @@ Sistema principal de gestión de retos para aprendizaje de Docker
 """
 
 import os
+import re
 import sys
 import json
-import hashlib
-import docker
-import subprocess
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from functools import partial
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
 
-# MQTT (opcional - se instala si está disponible)
-try:
-    import paho.mqtt.client as mqtt
-    MQTT_AVAILABLE = True
-except ImportError:
-    MQTT_AVAILABLE = False
-    mqtt = None
+from challenge_packs import Reto, cargar_pack
+from mqtt_outbox import MqttOutbox
+from progress_store import ProgressStore, crear_progress_store
+
+# Namespace UUID5 estándar usado para derivar las flags personalizadas
+FLAG_NAMESPACE = uuid.UUID('6ba7b810-9dad-11d1-80b4-00c04fd430c8')
 
 
 class DockerChallengeError(Exception):
@@ -30,28 +32,566 @@ class DockerChallengeError(Exception):
     pass
 
 
+# Estados posibles de la verificación de una flag
+VERIFICACION_SIN_DOCUMENTO = "sin_documento"
+VERIFICACION_FLAG_INVALIDA = "flag_invalida"
+VERIFICACION_YA_COMPLETADO = "ya_completado"
+VERIFICACION_REQUISITOS_PENDIENTES = "requisitos_pendientes"
+VERIFICACION_EXITOSA = "verificado"
+# Flag válida de un reto sin completar; falta verificar los requisitos Docker
+VERIFICACION_POR_VERIFICAR = "por_verificar"
+
+MENSAJE_YA_COMPLETADO = "❌ Este reto ya fue completado anteriormente"
+
+
+# Etiqueta que marca contenedores, volúmenes, redes e imágenes del laboratorio
+# (docker run --label docker-ctf-lab ...) para que 'cleanup' los encuentre
+ETIQUETA_LAB = "docker-ctf-lab"
+
+# Redes que crea Docker y nunca se eliminan
+REDES_PREDETERMINADAS = frozenset({"bridge", "host", "none"})
+
+
+class ResultadoVerificacion(NamedTuple):
+    """Resultado estructurado de verificar una flag contra los retos"""
+    estado: str
+    reto_id: Optional[int] = None
+    reto: Optional[Reto] = None
+
+    @property
+    def exitoso(self) -> bool:
+        """True si la flag es correcta y se cumplen los requisitos Docker"""
+        return self.estado == VERIFICACION_EXITOSA
+
+
+class ResultadoEnvio(NamedTuple):
+    """Resultado de una flag enviada dentro de un lote (submit_flags)"""
+    flag: str
+    exito: bool
+    mensaje: str
+    reto_id: int = 0
+
+
+def _normalizar_imagen(referencia: str) -> str:
+    """Normaliza una referencia de imagen agregando ':latest' si no tiene tag"""
+    if ":" not in referencia.rsplit("/", 1)[-1]:
+        return f"{referencia}:latest"
+    return referencia
+
+
+def _repositorio_imagen(referencia: str) -> str:
+    """Devuelve el repositorio de una referencia de imagen (sin tag)"""
+    return _normalizar_imagen(referencia).rsplit(":", 1)[0]
+
+
+class ContenedorInfo:
+    """Datos de un contenedor capturados en un DockerStateSnapshot"""
+
+    __slots__ = ("id", "nombre", "estado", "imagen", "image_id", "tags",
+                 "puertos", "redes", "labels")
+
+    def __init__(self, id: str, nombre: str, estado: str, imagen: str = "",
+                 image_id: str = "", tags: Iterable[str] = (),
+                 puertos: Iterable[Tuple[int, int, str]] = (),
+                 redes: Iterable[str] = (), labels: Optional[Dict] = None):
+        self.id = id
+        self.nombre = nombre
+        self.estado = estado
+        self.imagen = imagen
+        self.image_id = image_id
+        self.tags = frozenset(tags)
+        # Tuplas (puerto_host, puerto_contenedor, protocolo)
+        self.puertos = frozenset(puertos)
+        self.redes = frozenset(redes)
+        self.labels = labels or {}
+
+    @property
+    def en_ejecucion(self) -> bool:
+        """True si el contenedor está corriendo"""
+        return self.estado == "running"
+
+    @classmethod
+    def desde_api(cls, datos: Dict, tags_por_imagen: Dict[str, Iterable[str]]) -> "ContenedorInfo":
+        """
+        Construye la información desde un elemento de GET /containers/json.
+        
+        Args:
+            datos: Diccionario devuelto por la API de Docker
+            tags_por_imagen: Mapeo image_id -> tags para resolver la imagen
+        """
+        nombres = datos.get("Names") or []
+        nombre = nombres[0].lstrip("/") if nombres else datos.get("Id", "")[:12]
+        
+        imagen = datos.get("Image", "")
+        image_id = datos.get("ImageID", "")
+        tags = set(tags_por_imagen.get(image_id, ()))
+        if imagen and not imagen.startswith("sha256:"):
+            tags.add(_normalizar_imagen(imagen))
+        
+        puertos = [
+            (p["PublicPort"], p.get("PrivatePort", 0), p.get("Type", "tcp"))
+            for p in datos.get("Ports") or []
+            if p.get("PublicPort")
+        ]
+        redes = ((datos.get("NetworkSettings") or {}).get("Networks") or {}).keys()
+        
+        return cls(
+            id=datos.get("Id", ""),
+            nombre=nombre,
+            estado=datos.get("State", ""),
+            imagen=imagen,
+            image_id=image_id,
+            tags=tags,
+            puertos=puertos,
+            redes=redes,
+            labels=datos.get("Labels") or {},
+        )
+
+
+class PlanLimpieza(NamedTuple):
+    """Recursos del laboratorio que eliminará cleanup_containers"""
+    contenedores: List[ContenedorInfo]
+    volumenes: List[str]
+    redes: List[str]
+    imagenes: List[str]
+
+    @property
+    def vacio(self) -> bool:
+        """True si no hay nada que limpiar"""
+        return not (self.contenedores or self.volumenes or self.redes or self.imagenes)
+
+
+class DockerStateSnapshot:
+    """
+    Foto del estado de Docker (contenedores, imágenes, volúmenes y redes)
+    capturada en una sola pasada e indexada para las verificaciones de retos.
+    """
+
+    def __init__(self):
+        self.contenedores: Dict[str, ContenedorInfo] = {}
+        self.imagenes: Dict[str, frozenset] = {}
+        self.volumenes: Set[str] = set()
+        self.redes: Set[str] = set()
+        
+        # Índices secundarios
+        self.por_nombre: Dict[str, ContenedorInfo] = {}
+        self.por_puerto_host: Dict[int, Set[str]] = {}
+        self.por_red: Dict[str, Set[str]] = {}
+        self.por_imagen: Dict[str, Set[str]] = {}
+        self.tags_imagenes: Dict[str, Set[str]] = {}
+
+    @classmethod
+    def capturar(cls, docker_client) -> "DockerStateSnapshot":
+        """
+        Captura el estado completo con una llamada por tipo de recurso.
+        
+        Args:
+            docker_client: Cliente de Docker (docker.DockerClient)
+        """
+        api = docker_client.api
+        snapshot = cls()
+        
+        for imagen in api.images():
+            snapshot.agregar_imagen(imagen.get("Id", ""), imagen.get("RepoTags") or [])
+        
+        for datos in api.containers(all=True):
+            snapshot.agregar_contenedor(ContenedorInfo.desde_api(datos, snapshot.imagenes))
+        
+        for volumen in api.volumes().get("Volumes") or []:
+            snapshot.volumenes.add(volumen.get("Name", ""))
+        
+        for red in api.networks():
+            snapshot.redes.add(red.get("Name", ""))
+        
+        return snapshot
+
+    def agregar_imagen(self, image_id: str, tags: Iterable[str]) -> None:
+        """Registra (o reemplaza) una imagen y sus tags"""
+        self.quitar_imagen(image_id)
+        tags = frozenset(t for t in tags if t and t != "<none>:<none>")
+        self.imagenes[image_id] = tags
+        for tag in tags:
+            self.tags_imagenes.setdefault(tag, set()).add(image_id)
+
+    def quitar_imagen(self, image_id: str) -> None:
+        """Elimina una imagen de la foto"""
+        for tag in self.imagenes.pop(image_id, ()):
+            ids = self.tags_imagenes.get(tag)
+            if ids is not None:
+                ids.discard(image_id)
+                if not ids:
+                    del self.tags_imagenes[tag]
+
+    def agregar_contenedor(self, info: ContenedorInfo) -> None:
+        """Registra (o reemplaza) un contenedor y actualiza los índices"""
+        self.quitar_contenedor(info.id)
+        self.contenedores[info.id] = info
+        self.por_nombre[info.nombre] = info
+        for puerto_host, _, _ in info.puertos:
+            self.por_puerto_host.setdefault(puerto_host, set()).add(info.id)
+        for red in info.redes:
+            self.por_red.setdefault(red, set()).add(info.id)
+        for clave in self._claves_imagen(info):
+            self.por_imagen.setdefault(clave, set()).add(info.id)
+
+    def quitar_contenedor(self, container_id: str) -> Optional[ContenedorInfo]:
+        """Elimina un contenedor de la foto y de sus índices"""
+        info = self.contenedores.pop(container_id, None)
+        if info is None:
+            return None
+        if self.por_nombre.get(info.nombre) is info:
+            del self.por_nombre[info.nombre]
+        for puerto_host, _, _ in info.puertos:
+            self._descartar(self.por_puerto_host, puerto_host, info.id)
+        for red in info.redes:
+            self._descartar(self.por_red, red, info.id)
+        for clave in self._claves_imagen(info):
+            self._descartar(self.por_imagen, clave, info.id)
+        return info
+
+    @staticmethod
+    def _claves_imagen(info: ContenedorInfo) -> Set[str]:
+        """Tags y repositorios bajo los que se indexa un contenedor"""
+        claves = set(info.tags)
+        claves.update(_repositorio_imagen(tag) for tag in info.tags)
+        return claves
+
+    @staticmethod
+    def _descartar(indice: Dict, clave, container_id: str) -> None:
+        """Quita un id de un índice eliminando la clave si queda vacía"""
+        ids = indice.get(clave)
+        if ids is not None:
+            ids.discard(container_id)
+            if not ids:
+                del indice[clave]
+
+    # ------------------------------------------------------------------
+    # Consultas usadas por los verificadores
+    # ------------------------------------------------------------------
+
+    def contenedor(self, nombre: str) -> Optional[ContenedorInfo]:
+        """Busca un contenedor por nombre"""
+        return self.por_nombre.get(nombre)
+
+    def contenedores_en_ejecucion(self) -> List[ContenedorInfo]:
+        """Lista los contenedores que están corriendo"""
+        return [c for c in self.contenedores.values() if c.en_ejecucion]
+
+    def contenedores_con_imagen(self, referencia: str) -> List[ContenedorInfo]:
+        """Contenedores creados desde una imagen (por tag o repositorio)"""
+        ids = self.por_imagen.get(referencia) or self.por_imagen.get(_normalizar_imagen(referencia), ())
+        return [self.contenedores[i] for i in ids]
+
+    def contenedores_en_red(self, red: str) -> List[ContenedorInfo]:
+        """Contenedores conectados a una red"""
+        return [self.contenedores[i] for i in self.por_red.get(red, ())]
+
+    def puerto_host_publicado(self, puerto: int) -> bool:
+        """True si algún contenedor en ejecución publica el puerto en el host"""
+        return any(self.contenedores[i].en_ejecucion for i in self.por_puerto_host.get(puerto, ()))
+
+    def tiene_imagen(self, tag: str) -> bool:
+        """True si existe una imagen local con el tag indicado"""
+        return _normalizar_imagen(tag) in self.tags_imagenes
+
+
+class _NombresConsultados:
+    """Conjunto de nombres (volúmenes o redes) consultado a Docker bajo demanda"""
+
+    def __init__(self, listar: Callable[[str], Iterable[str]]):
+        self._listar = listar
+        self._cache: Dict[str, bool] = {}
+
+    def __contains__(self, nombre: str) -> bool:
+        if nombre not in self._cache:
+            self._cache[nombre] = nombre in set(self._listar(nombre))
+        return self._cache[nombre]
+
+
+class DockerStateConsulta:
+    """
+    Alternativa a DockerStateSnapshot para verificar un solo reto: responde
+    las mismas consultas con peticiones filtradas a la API de Docker (por
+    nombre, imagen, puerto...) en lugar de listar todo el host. Cada consulta
+    se hace una sola vez por instancia.
+    """
+
+    def __init__(self, docker_client):
+        """
+        Args:
+            docker_client: Cliente de Docker (docker.DockerClient)
+        """
+        self.api = docker_client.api
+        self._cache: Dict[Tuple, object] = {}
+        self._tags_imagenes: Optional[Dict[str, frozenset]] = None
+        self.volumenes = _NombresConsultados(
+            lambda nombre: (v.get("Name", "") for v in self.api.volumes(filters={"name": nombre}).get("Volumes") or [])
+        )
+        self.redes = _NombresConsultados(
+            lambda nombre: (r.get("Name", "") for r in self.api.networks(names=[nombre]))
+        )
+
+    def _consultar(self, clave: Tuple, funcion: Callable):
+        """Ejecuta una consulta a Docker solo la primera vez"""
+        if clave not in self._cache:
+            self._cache[clave] = funcion()
+        return self._cache[clave]
+
+    def _tags_por_imagen(self, contenedores: List[Dict]) -> Dict[str, frozenset]:
+        """Tags de las imágenes (solo se listan si algún contenedor no trae su tag)"""
+        if self._tags_imagenes is None:
+            if not any(str(c.get("Image", "")).startswith("sha256:") for c in contenedores):
+                return {}
+            self._tags_imagenes = {
+                imagen.get("Id", ""): frozenset(imagen.get("RepoTags") or [])
+                for imagen in self.api.images()
+            }
+        return self._tags_imagenes
+
+    def _contenedores(self, todos: bool, filtros: Dict) -> List[ContenedorInfo]:
+        """GET /containers/json con filtros, convertido a ContenedorInfo"""
+        clave = ("contenedores", todos, json.dumps(filtros, sort_keys=True))
+
+        def listar():
+            datos = self.api.containers(all=todos, filters=filtros)
+            tags = self._tags_por_imagen(datos)
+            return [ContenedorInfo.desde_api(d, tags) for d in datos]
+
+        return self._consultar(clave, listar)
+
+    def contenedor(self, nombre: str) -> Optional[ContenedorInfo]:
+        """Busca un contenedor por nombre"""
+        patron = f"^/?{re.escape(nombre)}$"
+        for info in self._contenedores(True, {"name": [patron]}):
+            if info.nombre == nombre:
+                return info
+        return None
+
+    def contenedores_en_ejecucion(self) -> List[ContenedorInfo]:
+        """Lista los contenedores que están corriendo"""
+        return [c for c in self._contenedores(False, {}) if c.en_ejecucion]
+
+    def contenedores_con_imagen(self, referencia: str) -> List[ContenedorInfo]:
+        """Contenedores creados desde una imagen (por tag o repositorio)"""
+        return self._contenedores(True, {"ancestor": [referencia]})
+
+    def contenedores_en_red(self, red: str) -> List[ContenedorInfo]:
+        """Contenedores conectados a una red"""
+        return [c for c in self._contenedores(True, {"network": [red]}) if red in c.redes]
+
+    def puerto_host_publicado(self, puerto: int) -> bool:
+        """True si algún contenedor en ejecución publica el puerto en el host"""
+        return any(
+            c.en_ejecucion and any(p[0] == puerto for p in c.puertos)
+            for c in self._contenedores(False, {"publish": [str(puerto)]})
+        )
+
+    def tiene_imagen(self, tag: str) -> bool:
+        """True si existe una imagen local con el tag indicado"""
+        tag = _normalizar_imagen(tag)
+        imagenes = self._consultar(("imagen", tag), lambda: self.api.images(filters={"reference": [tag]}))
+        return any(tag in (imagen.get("RepoTags") or []) for imagen in imagenes)
+
+
+class DockerEventsWatcher:
+    """
+    Componente opcional que mantiene un DockerStateSnapshot actualizado
+    aplicando los eventos de 'docker_client.events()' en segundo plano.
+    Al (re)conectarse hace una resincronización completa.
+    """
+
+    # Acciones de contenedor que cambian su estado, puertos o redes
+    ACCIONES_CONTENEDOR = {
+        "create", "start", "restart", "die", "stop", "kill", "pause",
+        "unpause", "rename", "update", "destroy"
+    }
+    ACCIONES_IMAGEN = {"pull", "tag", "untag", "delete", "import", "load"}
+
+    def __init__(self, docker_client, on_cambio: Optional[Callable[[Dict], None]] = None,
+                 reintento: float = 2.0):
+        """
+        Args:
+            docker_client: Cliente de Docker (docker.DockerClient)
+            on_cambio: Callback opcional invocado tras aplicar cada evento
+            reintento: Segundos de espera antes de reconectar tras un error
+        """
+        self.docker_client = docker_client
+        self.on_cambio = on_cambio
+        self.reintento = reintento
+        self.lock = threading.RLock()
+        self.estado = DockerStateSnapshot()
+        self.version = 0
+        self.sincronizado = threading.Event()
+        self._detener = threading.Event()
+        self._stream = None
+        self._hilo: Optional[threading.Thread] = None
+
+    def iniciar(self) -> None:
+        """Inicia el hilo que escucha los eventos de Docker"""
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ejecutar, name="docker-events", daemon=True)
+        self._hilo.start()
+
+    def detener(self) -> None:
+        """Detiene el hilo y cierra el stream de eventos"""
+        self._detener.set()
+        self.sincronizado.clear()
+        stream = self._stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    def _ejecutar(self) -> None:
+        """Bucle principal: suscribirse, resincronizar y aplicar eventos"""
+        while not self._detener.is_set():
+            try:
+                # Suscribirse antes de la foto para no perder eventos intermedios;
+                # aplicarlos de nuevo es idempotente.
+                desde = int(time.time())
+                self._stream = self.docker_client.events(decode=True, since=desde)
+                self.resincronizar()
+                for evento in self._stream:
+                    if self._detener.is_set():
+                        break
+                    self.aplicar_evento(evento)
+            except Exception as e:
+                if self._detener.is_set():
+                    break
+                print(f"⚠️  Stream de eventos Docker interrumpido: {e}")
+            finally:
+                self.sincronizado.clear()
+                self._stream = None
+            self._detener.wait(self.reintento)
+
+    def resincronizar(self) -> None:
+        """Reemplaza el estado con una foto completa del daemon"""
+        estado = DockerStateSnapshot.capturar(self.docker_client)
+        with self.lock:
+            self.estado = estado
+            self.version += 1
+        self.sincronizado.set()
+        self._notificar({"Type": "resync"})
+
+    def aplicar_evento(self, evento: Dict) -> None:
+        """
+        Aplica un evento de Docker al estado en memoria.
+        
+        Args:
+            evento: Evento decodificado de GET /events
+        """
+        tipo = evento.get("Type")
+        accion = (evento.get("Action") or evento.get("status") or "").split(":", 1)[0]
+        actor = evento.get("Actor") or {}
+        actor_id = actor.get("ID") or evento.get("id", "")
+        atributos = actor.get("Attributes") or {}
+        api = self.docker_client.api
+        
+        if tipo == "container" and accion in self.ACCIONES_CONTENEDOR:
+            if accion == "destroy":
+                with self.lock:
+                    self.estado.quitar_contenedor(actor_id)
+            else:
+                self._refrescar_contenedor(actor_id)
+        
+        elif tipo == "image" and accion in self.ACCIONES_IMAGEN:
+            imagenes = api.images()
+            with self.lock:
+                for image_id in list(self.estado.imagenes):
+                    self.estado.quitar_imagen(image_id)
+                for imagen in imagenes:
+                    self.estado.agregar_imagen(imagen.get("Id", ""), imagen.get("RepoTags") or [])
+        
+        elif tipo == "volume" and accion in ("create", "destroy"):
+            with self.lock:
+                if accion == "create":
+                    self.estado.volumenes.add(actor_id)
+                else:
+                    self.estado.volumenes.discard(actor_id)
+        
+        elif tipo == "network" and accion in ("create", "destroy"):
+            nombre = atributos.get("name", actor_id)
+            with self.lock:
+                if accion == "create":
+                    self.estado.redes.add(nombre)
+                else:
+                    self.estado.redes.discard(nombre)
+        
+        elif tipo == "network" and accion in ("connect", "disconnect"):
+            if atributos.get("container"):
+                self._refrescar_contenedor(atributos["container"])
+        
+        else:
+            return
+        
+        with self.lock:
+            self.version += 1
+        self._notificar(evento)
+
+    def _refrescar_contenedor(self, container_id: str) -> None:
+        """Vuelve a consultar un único contenedor y actualiza el estado"""
+        datos = self.docker_client.api.containers(all=True, filters={"id": container_id})
+        with self.lock:
+            if datos:
+                self.estado.agregar_contenedor(ContenedorInfo.desde_api(datos[0], self.estado.imagenes))
+            else:
+                self.estado.quitar_contenedor(container_id)
+
+    def _notificar(self, evento: Dict) -> None:
+        """Invoca el callback de cambios sin propagar sus errores"""
+        if self.on_cambio is None:
+            return
+        try:
+            self.on_cambio(evento)
+        except Exception as e:
+            print(f"⚠️  Error en callback de eventos Docker: {e}")
+
+
 class DockerChallenge:
     """
     Clase principal que gestiona el sistema de retos de Docker.
     Maneja la configuración, verificación de retos y progreso del usuario.
     """
 
-    def __init__(self):
-        """Inicializa la configuración del sistema de retos"""
+    def __init__(self, pack_path: Optional[str] = None,
+                 progress_store: Optional[ProgressStore] = None):
+        """
+        Inicializa la configuración del sistema de retos
+        
+        Args:
+            pack_path: Pack de retos a cargar (por defecto DOCKER_CTF_PACK o el incluido)
+            progress_store: Backend de progreso (por defecto el configurado en
+                DOCKER_CTF_PROGRESS_BACKEND, ver progress_store.py)
+        """
         self.home_dir = Path.home()
         self.progress_file = self.home_dir / ".docker_ctf_progress.json"
         self.config_file = self.home_dir / ".docker_ctf_configured"
         
-        # Cargar progreso existente
-        self.progress = self._cargar_progreso()
+        # Cargar pack de retos compilado (retos inmutables + verificadores)
+        self.pack = cargar_pack(pack_path)
+        self.retos = self.pack.retos
+        self.retos_por_id = self.pack.por_id
+        
+        # Revisión del progreso: aumenta con cada cambio (documento, retos
+        # completados o cambios traídos de otros procesos) para invalidar cachés
+        self.revision_progreso = 0
+        
+        # Índice de flags del estudiante (se reconstruye al cambiar el documento)
+        self._flag_a_reto: Dict[str, int] = {}
+        self._reto_a_flag: Dict[int, str] = {}
+        self._documento_estudiante = ""
+        
+        # Cargar progreso existente (JSON con diario de eventos o SQLite)
+        self.progress_store = progress_store or crear_progress_store(self.progress_file)
+        self._cargar_progreso()
         self.documento_estudiante = self.progress.get("documento_estudiante", "")
         
-        # Inicializar cliente Docker
-        try:
-            self.docker_client = docker.from_env()
-        except Exception as e:
-            print(f"⚠️  Advertencia: No se pudo conectar a Docker: {e}")
-            self.docker_client = None
+        # Cliente Docker (se crea bajo demanda, ver la propiedad docker_client)
+        self._docker_client = None
+        self._docker_inicializado = False
         
         # Configuración MQTT (configurable)
         self.mqtt_config = {
@@ -63,330 +603,144 @@ class DockerChallenge:
             "password": os.getenv("MQTT_PASSWORD", "aiot123")
         }
         
-        # Cliente MQTT
-        self.mqtt_client = None
-        if MQTT_AVAILABLE and self.mqtt_config["enabled"]:
-            self._init_mqtt()
-        
-        # Definir retos
-        self.retos = [
-            {
-                "id": 1,
-                "nombre": "🐳 Primer Contenedor",
-                "descripcion": "Ejecuta tu primer contenedor usando la imagen 'hello-world'",
-                "pista": "Usa 'docker run hello-world'. El sistema verificará que el contenedor se haya ejecutado.",
-                "flag": "FLAG{primer_contenedor}",
-                "puntos": 10,
-                "dificultad": "Principiante",
-                "categoria": "Comandos Básicos",
-                "preguntas": [
-                    {
-                        "pregunta": "El comando básico para ejecutar un contenedor es 'docker ***'",
-                        "respuesta": "run"
-                    },
-                    {
-                        "pregunta": "Cuando ejecutas 'docker run', Docker primero *** la imagen si no está disponible localmente",
-                        "respuesta": "descarga"
-                    }
-                ]
-            },
-            {
-                "id": 2,
-                "nombre": "🔍 Inspector de Imágenes",
-                "descripcion": "Descarga la imagen 'nginx:alpine' y encuentra su tamaño",
-                "pista": "Usa 'docker pull nginx:alpine' y luego 'docker images' para ver el tamaño.",
-                "flag": "FLAG{imagen_descargada}",
-                "puntos": 10,
-                "dificultad": "Principiante",
-                "categoria": "Imágenes",
-                "preguntas": [
-                    {
-                        "pregunta": "El comando para descargar una imagen sin ejecutarla es 'docker ***'",
-                        "respuesta": "pull"
-                    },
-                    {
-                        "pregunta": "Para ver todas las imágenes descargadas localmente usas 'docker ***'",
-                        "respuesta": "images"
-                    }
-                ]
-            },
-            {
-                "id": 3,
-                "nombre": "🚀 Contenedor en Background",
-                "descripcion": "Ejecuta un contenedor nginx en modo detached (background) con nombre 'webserver'",
-                "pista": "Usa 'docker run -d --name webserver nginx:alpine'. Verifica con 'docker ps'.",
-                "flag": "FLAG{contenedor_background}",
-                "puntos": 15,
-                "dificultad": "Principiante",
-                "categoria": "Ejecución",
-                "preguntas": [
-                    {
-                        "pregunta": "La opción '***' (detached) ejecuta el contenedor en segundo plano",
-                        "respuesta": "-d"
-                    },
-                    {
-                        "pregunta": "Para asignar un nombre personalizado al contenedor usas la opción '*** nombre'",
-                        "respuesta": "--name"
-                    }
-                ]
-            },
-            {
-                "id": 4,
-                "nombre": "🔌 Mapeo de Puertos",
-                "descripcion": "Ejecuta un contenedor nginx mapeando el puerto 8080 del host al puerto 80 del contenedor con nombre 'webserver-port'",
-                "pista": "Usa 'docker run -d -p 8080:80 --name webserver-port nginx:alpine'",
-                "flag": "FLAG{puerto_mapeado}",
-                "puntos": 15,
-                "dificultad": "Intermedio",
-                "categoria": "Redes",
-                "preguntas": [
-                    {
-                        "pregunta": "La opción '***' se usa para mapear puertos del host al contenedor",
-                        "respuesta": "-p"
-                    },
-                    {
-                        "pregunta": "En el mapeo '8080:80', el puerto *** es del host y el 80 es del contenedor",
-                        "respuesta": "8080"
-                    }
-                ]
-            },
-            {
-                "id": 5,
-                "nombre": "💾 Volúmenes Persistentes",
-                "descripcion": "Crea un volumen llamado 'datos_importantes' y úsalo en un contenedor",
-                "pista": "Usa 'docker volume create datos_importantes' y luego móntalo con -v en un contenedor",
-                "flag": "FLAG{volumen_creado}",
-                "puntos": 20,
-                "dificultad": "Intermedio",
-                "categoria": "Volúmenes",
-                "preguntas": [
-                    {
-                        "pregunta": "Los volúmenes en Docker permiten persistir *** incluso cuando el contenedor se elimina",
-                        "respuesta": "datos"
-                    },
-                    {
-                        "pregunta": "Para crear un volumen usas el comando 'docker volume ***'",
-                        "respuesta": "create"
-                    }
-                ]
-            },
-            {
-                "id": 6,
-                "nombre": "🌐 Red Personalizada",
-                "descripcion": "Crea una red bridge personalizada llamada 'mi_red_ctf'",
-                "pista": "Usa 'docker network create --driver bridge mi_red_ctf'",
-                "flag": "FLAG{red_creada}",
-                "puntos": 20,
-                "dificultad": "Intermedio",
-                "categoria": "Redes",
-                "preguntas": [
-                    {
-                        "pregunta": "El comando 'docker *** create' se usa para crear redes personalizadas",
-                        "respuesta": "network"
-                    },
-                    {
-                        "pregunta": "El driver de red más común que conecta contenedores en el mismo host es '***'",
-                        "respuesta": "bridge"
-                    }
-                ]
-            },
-            {
-                "id": 7,
-                "nombre": "🔗 Conectando Contenedores",
-                "descripcion": "Crea dos contenedores (alpine) en la red 'mi_red_ctf' con nombres 'contenedor1' y 'contenedor2' que puedan comunicarse",
-                "pista": "Usa --network mi_red_ctf al crear los contenedores. Prueba la conexión con ping.",
-                "flag": "FLAG{contenedores_conectados}",
-                "puntos": 25,
-                "dificultad": "Avanzado",
-                "categoria": "Redes",
-                "preguntas": [
-                    {
-                        "pregunta": "Para conectar un contenedor a una red específica usas la opción '*** red_nombre'",
-                        "respuesta": "--network"
-                    },
-                    {
-                        "pregunta": "Los contenedores en la misma red pueden comunicarse usando sus *** como hostname",
-                        "respuesta": "nombres"
-                    }
-                ]
-            },
-            {
-                "id": 8,
-                "nombre": "🔐 SSH en Contenedor",
-                "descripcion": "Despliega un contenedor con SSH habilitado (usa una imagen apropiada y configura el puerto 2222)",
-                "pista": "Puedes usar imágenes como 'linuxserver/openssh-server' o crear tu propio Dockerfile",
-                "flag": "FLAG{ssh_configurado}",
-                "puntos": 30,
-                "dificultad": "Avanzado",
-                "categoria": "Servicios",
-                "preguntas": [
-                    {
-                        "pregunta": "SSH es un protocolo de acceso *** que cifra la comunicación entre cliente y servidor",
-                        "respuesta": "remoto"
-                    },
-                    {
-                        "pregunta": "El puerto estándar de SSH es el ***, pero puedes usar cualquier puerto disponible",
-                        "respuesta": "22"
-                    }
-                ]
-            },
-            {
-                "id": 9,
-                "nombre": "📡 Telnet Antiguo",
-                "descripcion": "Despliega un contenedor con servicio Telnet en el puerto 2323",
-                "pista": "Busca imágenes con telnet o crea un Dockerfile basado en ubuntu/alpine con telnetd instalado",
-                "flag": "FLAG{telnet_activo}",
-                "puntos": 30,
-                "dificultad": "Avanzado",
-                "categoria": "Servicios",
-                "preguntas": [
-                    {
-                        "pregunta": "Telnet es un protocolo NO *** que envía datos en texto plano",
-                        "respuesta": "cifrado"
-                    },
-                    {
-                        "pregunta": "El puerto estándar de Telnet es el ***",
-                        "respuesta": "23"
-                    }
-                ]
-            },
-            {
-                "id": 10,
-                "nombre": "🏭 SCADA Industrial",
-                "descripcion": "Despliega un contenedor con OpenPLC o similar sistema SCADA en el puerto 8000",
-                "pista": "Usa 'docker run -d -p 8000:8080 --name scada-server openplc/openplc:latest' o similar",
-                "flag": "FLAG{scada_desplegado}",
-                "puntos": 35,
-                "dificultad": "Experto",
-                "categoria": "Aplicaciones",
-                "preguntas": [
-                    {
-                        "pregunta": "SCADA significa Supervisory Control and Data ***",
-                        "respuesta": "Acquisition"
-                    },
-                    {
-                        "pregunta": "Los sistemas SCADA se usan principalmente en entornos ***",
-                        "respuesta": "industriales"
-                    }
-                ]
-            },
-            {
-                "id": 11,
-                "nombre": "🖥️ Escritorio Remoto VNC",
-                "descripcion": "Despliega un contenedor con escritorio gráfico accesible por VNC en puerto 5900",
-                "pista": "Usa imágenes como 'dorowu/ubuntu-desktop-lxde-vnc' en puerto 5900 o 6080 para web",
-                "flag": "FLAG{vnc_funcionando}",
-                "puntos": 35,
-                "dificultad": "Experto",
-                "categoria": "Aplicaciones",
-                "preguntas": [
-                    {
-                        "pregunta": "VNC significa Virtual Network ***",
-                        "respuesta": "Computing"
-                    },
-                    {
-                        "pregunta": "VNC permite acceder a un escritorio *** de forma remota",
-                        "respuesta": "gráfico"
-                    }
-                ]
-            },
-            {
-                "id": 12,
-                "nombre": "🏗️ Dockerfile Personalizado",
-                "descripcion": "Crea un Dockerfile que instale python3 y flask, construye la imagen como 'mi-app:v1'",
-                "pista": "FROM python:3.11-slim, RUN pip install flask, luego 'docker build -t mi-app:v1 .'",
-                "flag": "FLAG{dockerfile_creado}",
-                "puntos": 30,
-                "dificultad": "Avanzado",
-                "categoria": "Construcción",
-                "preguntas": [
-                    {
-                        "pregunta": "Un Dockerfile contiene las *** para construir una imagen de Docker",
-                        "respuesta": "instrucciones"
-                    },
-                    {
-                        "pregunta": "El comando 'docker ***' se usa para construir una imagen desde un Dockerfile",
-                        "respuesta": "build"
-                    }
-                ]
-            },
-            {
-                "id": 13,
-                "nombre": "📦 Docker Compose Multi-Servicio",
-                "descripcion": "Crea un docker-compose.yml con al menos 2 servicios (nginx y redis) y levántalos",
-                "pista": "Define services con nginx y redis, luego ejecuta 'docker-compose up -d'",
-                "flag": "FLAG{compose_desplegado}",
-                "puntos": 40,
-                "dificultad": "Experto",
-                "categoria": "Orquestación",
-                "preguntas": [
-                    {
-                        "pregunta": "Docker Compose permite definir aplicaciones con *** servicios en un solo archivo",
-                        "respuesta": "múltiples"
-                    },
-                    {
-                        "pregunta": "El archivo de configuración de Docker Compose se llama docker-compose.***",
-                        "respuesta": "yml"
-                    }
-                ]
-            },
-            {
-                "id": 14,
-                "nombre": "🔍 Inspección Avanzada",
-                "descripcion": "Inspecciona un contenedor y encuentra su dirección IP interna",
-                "pista": "Usa 'docker inspect <contenedor>' y busca el campo NetworkSettings.IPAddress",
-                "flag": "FLAG{inspeccion_exitosa}",
-                "puntos": 25,
-                "dificultad": "Intermedio",
-                "categoria": "Diagnóstico",
-                "preguntas": [
-                    {
-                        "pregunta": "El comando 'docker ***' muestra información detallada de un contenedor en formato JSON",
-                        "respuesta": "inspect"
-                    },
-                    {
-                        "pregunta": "La dirección IP interna de un contenedor se encuentra en NetworkSettings.***",
-                        "respuesta": "IPAddress"
-                    }
-                ]
-            },
-            {
-                "id": 15,
-                "nombre": "🧹 Limpieza Maestra",
-                "descripcion": "Elimina todos los contenedores detenidos, todas las imágenes sin usar y todos los volúmenes huérfanos",
-                "pista": "Usa 'docker container prune', 'docker image prune -a', 'docker volume prune'",
-                "flag": "FLAG{limpieza_completa}",
-                "puntos": 20,
-                "dificultad": "Básico",
-                "categoria": "Mantenimiento",
-                "preguntas": [
-                    {
-                        "pregunta": "El comando 'docker system ***' elimina todos los recursos no utilizados de Docker",
-                        "respuesta": "prune"
-                    },
-                    {
-                        "pregunta": "Los volúmenes huérfanos son aquellos que no están asociados a ningún ***",
-                        "respuesta": "contenedor"
-                    }
-                ]
-            }
-        ]
+        # Watcher de eventos Docker (opcional, ver iniciar_watcher)
+        self.docker_watcher: Optional[DockerEventsWatcher] = None
+        
+        # Outbox MQTT: los eventos se encolan y un hilo los envía en segundo
+        # plano; sin conexión quedan en un spool en disco hasta reconectar
+        self.mqtt_spool_file = self.home_dir / ".docker_ctf_mqtt_spool.jsonl"
+        self._mqtt_outbox: Optional[MqttOutbox] = None
 
-    def _cargar_progreso(self) -> Dict:
-        """Carga el progreso sin inicializar self.progress (usado en __init__)"""
-        if self.progress_file.exists():
+    @property
+    def docker_client(self):
+        """
+        Cliente Docker creado bajo demanda: importar el SDK y conectar con
+        el daemon solo lo pagan los comandos que verifican retos.
+        """
+        if not self._docker_inicializado:
+            self._docker_inicializado = True
             try:
-                with open(self.progress_file, 'r') as f:
-                    return json.load(f)
-            except:
-                pass
+                import docker
+                self._docker_client = docker.from_env()
+            except Exception as e:
+                print(f"⚠️  Advertencia: No se pudo conectar a Docker: {e}")
+                self._docker_client = None
+        return self._docker_client
+
+    @docker_client.setter
+    def docker_client(self, cliente) -> None:
+        """Permite inyectar un cliente Docker ya creado"""
+        self._docker_client = cliente
+        self._docker_inicializado = True
+
+    @property
+    def mqtt_outbox(self) -> MqttOutbox:
+        """Outbox MQTT creado bajo demanda (la conexión la abre su hilo emisor)"""
+        if self._mqtt_outbox is None:
+            self._mqtt_outbox = MqttOutbox(
+                self.mqtt_config,
+                client_id=f"docker_ctf_{self.documento_estudiante or 'unknown'}",
+                spool_path=self.mqtt_spool_file,
+                capacidad=int(os.getenv("MQTT_OUTBOX_CAPACIDAD", "1000"))
+            )
+        return self._mqtt_outbox
+
+    def cerrar(self, timeout: Optional[float] = None) -> None:
+        """
+        Libera recursos al terminar: cierra el almacenamiento de progreso y
+        envía (acotado) los eventos MQTT pendientes; lo que no alcance a salir
+        queda en el spool.
+
+        Args:
+            timeout: Segundos máximos de espera (por defecto MQTT_FLUSH_TIMEOUT)
+        """
+        self.progress_store.cerrar()
+        if self._mqtt_outbox is None:
+            return
+        if timeout is None:
+            timeout = float(os.getenv("MQTT_FLUSH_TIMEOUT", "2"))
+        self._mqtt_outbox.cerrar(timeout)
+
+    @property
+    def documento_estudiante(self) -> str:
+        """Documento de identidad del estudiante actual"""
+        return self._documento_estudiante
+
+    @documento_estudiante.setter
+    def documento_estudiante(self, documento: str) -> None:
+        """Actualiza el documento y reconstruye el índice de flags si cambió"""
+        documento = documento or ""
+        if documento == self._documento_estudiante:
+            return
+        self._documento_estudiante = documento
+        self._construir_indice_flags()
+        self.revision_progreso += 1
+
+    def _construir_indice_flags(self) -> None:
+        """
+        Deriva una sola vez las flags del estudiante y construye el índice
+        flag -> reto_id y reto_id -> flag usado por submit, listados y API.
+        """
+        self._reto_a_flag = {}
+        self._flag_a_reto = {}
         
-        return {
-            "completados": [],
-            "puntos": 0,
-            "documento_estudiante": "",
-            "fecha_inicio": datetime.now().isoformat()
-        }
+        if not self._documento_estudiante:
+            return
+        
+        for reto_id, texto_base in self.pack.flag_bases.items():
+            flag = self.generar_flag_personalizada(reto_id, texto_base)
+            self._reto_a_flag[reto_id] = flag
+            self._flag_a_reto[flag] = reto_id
+
+    def obtener_flag(self, reto_id: int) -> str:
+        """
+        Obtiene la flag personalizada de un reto desde el índice.
+        
+        Args:
+            reto_id: ID del reto
+            
+        Returns:
+            Flag UUID del reto para el estudiante actual
+        """
+        flag = self._reto_a_flag.get(reto_id)
+        if flag is None:
+            flag = self.generar_flag_personalizada(reto_id, self.pack.flag_bases.get(reto_id, ""))
+        return flag
+
+    def buscar_reto_por_flag(self, flag: str) -> Optional[int]:
+        """
+        Busca en el índice el reto que corresponde a una flag.
+        
+        Args:
+            flag: Flag enviada por el estudiante
+            
+        Returns:
+            ID del reto o None si la flag no corresponde a ningún reto
+        """
+        return self._flag_a_reto.get(flag.strip())
+
+    @property
+    def progress(self) -> Dict:
+        """Progreso actual del estudiante (mantenido por el progress store)"""
+        return self.progress_store.progress
+
+    def _cargar_progreso(self) -> Dict:
+        """Carga el progreso desde el store (snapshot + diario)"""
+        return self.progress_store.cargar()
+
+    def refrescar_progreso(self) -> bool:
+        """
+        Trae los cambios de progreso escritos por otros procesos
+        (CLI, dashboard u otros workers).
+        
+        Returns:
+            True si el progreso cambió
+        """
+        cambio = self.progress_store.refrescar()
+        if cambio:
+            self.revision_progreso += 1
+            self.documento_estudiante = self.progress.get("documento_estudiante", "")
+        return cambio
 
     def solicitar_documento_estudiante(self) -> str:
         """
@@ -435,9 +789,8 @@ class DockerChallenge:
         
         # Generar UUID determinístico basado en documento + reto
         # Usamos namespace UUID5 con SHA1
-        namespace = uuid.UUID('6ba7b810-9dad-11d1-80b4-00c04fd430c8')  # Namespace estándar
         datos = f"{self.documento_estudiante}_{reto_id}_{texto_base}"
-        flag_uuid = uuid.uuid5(namespace, datos)
+        flag_uuid = uuid.uuid5(FLAG_NAMESPACE, datos)
         
         return str(flag_uuid)
 
@@ -452,8 +805,7 @@ class DockerChallenge:
             # Solicitar documento si no existe
             if not self.documento_estudiante:
                 self.documento_estudiante = self.solicitar_documento_estudiante()
-                self.progress["documento_estudiante"] = self.documento_estudiante
-                self.save_progress()
+                self.progress_store.registrar_documento(self.documento_estudiante)
                 print(f"\n✅ Tu documento '{self.documento_estudiante}' ha sido guardado.")
                 print("   Tus FLAGS serán únicas y personalizadas.\n")
             else:
@@ -480,7 +832,7 @@ class DockerChallenge:
             print("✅ ¡Entorno configurado exitosamente!")
             print(f"👤 Documento de estudiante: {self.documento_estudiante}")
             print(f"🎯 Total de retos: {len(self.retos)}")
-            print(f"🏆 Puntos totales disponibles: {sum(r['puntos'] for r in self.retos)}")
+            print(f"🏆 Puntos totales disponibles: {sum(r.puntos for r in self.retos)}")
             
             print(f"\n🔒 Tus FLAGS son personalizadas y únicas para tu documento.")
             print("\n💡 Usa './start.sh' para ver el menú principal")
@@ -493,97 +845,265 @@ class DockerChallenge:
             return False
 
     def save_progress(self) -> None:
-        """Guarda el progreso del usuario en el archivo JSON"""
+        """
+        Compacta el progreso en el archivo JSON. Los cambios ya se guardan
+        como eventos en el diario al registrarse; esto vuelca el snapshot.
+        """
         try:
-            with open(self.progress_file, 'w') as f:
-                json.dump(self.progress, f, indent=2)
+            self.progress_store.compactar()
         except Exception as e:
             print(f"⚠️  Error guardando progreso: {e}")
 
-    def submit_flag(self, flag: str) -> Tuple[bool, str, int]:
+    def identificar_flag(self, flag: str) -> ResultadoVerificacion:
+        """
+        Identifica el reto de una flag sin consultar a Docker.
+        
+        Args:
+            flag: La flag a identificar
+            
+        Returns:
+            ResultadoVerificacion; VERIFICACION_POR_VERIFICAR si la flag es
+            válida y solo faltan los requisitos Docker
+        """
+        self.refrescar_progreso()
+        
+        if not self.documento_estudiante:
+            return ResultadoVerificacion(VERIFICACION_SIN_DOCUMENTO)
+        
+        reto_id = self.buscar_reto_por_flag(flag)
+        reto = self.retos_por_id.get(reto_id)
+        if not reto:
+            return ResultadoVerificacion(VERIFICACION_FLAG_INVALIDA)
+        
+        if reto_id in self.progress["completados"]:
+            return ResultadoVerificacion(VERIFICACION_YA_COMPLETADO, reto_id, reto)
+        
+        return ResultadoVerificacion(VERIFICACION_POR_VERIFICAR, reto_id, reto)
+
+    def verificar_flag(self, flag: str) -> ResultadoVerificacion:
+        """
+        Identifica el reto de una flag y verifica sus requisitos Docker
+        sin registrar el progreso.
+        
+        Args:
+            flag: La flag a verificar
+            
+        Returns:
+            ResultadoVerificacion con el estado, el id y los datos del reto
+        """
+        resultado = self.identificar_flag(flag)
+        if resultado.estado != VERIFICACION_POR_VERIFICAR:
+            return resultado
+        
+        if not self._verificar_reto_especifico(resultado.reto_id):
+            return resultado._replace(estado=VERIFICACION_REQUISITOS_PENDIENTES)
+        
+        return resultado._replace(estado=VERIFICACION_EXITOSA)
+
+    def submit_flag(self, flag: str,
+                    verificacion: Optional[ResultadoVerificacion] = None) -> Tuple[bool, str, int]:
         """
         Verifica y registra una flag enviada por el usuario.
         
         Args:
             flag: La flag a verificar
+            verificacion: Resultado de verificar_flag(flag) ya obtenido
+                (evita repetir la consulta a Docker)
             
         Returns:
             Tupla (éxito, mensaje, id_reto)
         """
-        flag = flag.strip()
+        resultado = verificacion
+        if resultado is None or resultado.estado == VERIFICACION_POR_VERIFICAR:
+            resultado = self.verificar_flag(flag)
         
-        # Verificar que el estudiante esté registrado
-        if not self.documento_estudiante:
-            return False, "❌ Error: No hay documento registrado. Ejecuta 'setup' primero.", 0
-        
-        # Mapeo de retos a sus textos base de flags
-        flag_bases = {
-            1: "primer_contenedor",
-            2: "imagen_descargada",
-            3: "contenedor_background",
-            4: "puerto_mapeado",
-            5: "volumen_creado",
-            6: "red_creada",
-            7: "contenedores_conectados",
-            8: "ssh_configurado",
-            9: "telnet_activo",
-            10: "scada_desplegado",
-            11: "vnc_funcionando",
-            12: "dockerfile_creado",
-            13: "compose_desplegado",
-            14: "inspeccion_exitosa",
-            15: "limpieza_completa"
-        }
+        rechazo = self._mensaje_rechazo(resultado)
+        if rechazo:
+            return False, rechazo, resultado.reto_id or 0
         
-        # Buscar qué reto corresponde a la flag
-        for reto in self.retos:
-            flag_esperada = self.generar_flag_personalizada(reto["id"], flag_bases[reto["id"]])
+        reto_id = resultado.reto_id
+        reto = resultado.reto
+        
+        # Registrar completado (append al diario, fusionando con otros procesos)
+        try:
+            registrado = self.progress_store.registrar_completado(reto_id, reto.puntos)
+        except Exception as e:
+            return False, f"⚠️  Error guardando progreso: {e}", reto_id
+        
+        # Registrar también aplica los eventos de otros procesos: el progreso
+        # pudo cambiar aunque el reto ya estuviera completado
+        self.revision_progreso += 1
+        
+        if not registrado:
+            return False, MENSAJE_YA_COMPLETADO, reto_id
+        
+        # Publicar en MQTT
+        self._publish_mqtt("flag_submit", {
+            "reto_id": reto_id,
+            "reto_nombre": reto.nombre,
+            "puntos": reto.puntos,
+            "total_puntos": self.progress["puntos"],
+            "completados": len(self.progress["completados"])
+        })
+        
+        mensaje = (
+            "\n🎉 ¡CORRECTO! 🎉\n"
+            f"Reto {reto_id}: {reto.nombre}\n"
+            f"+{reto.puntos} puntos\n"
+            f"Total: {self.progress['puntos']} puntos\n"
+            f"Completados: {len(self.progress['completados'])}/{len(self.retos)}\n"
+        )
+        return True, mensaje, reto_id
+
+    @staticmethod
+    def _mensaje_rechazo(resultado: ResultadoVerificacion) -> str:
+        """Mensaje para el estudiante si la flag no se puede registrar ("" si sí)"""
+        if resultado.estado == VERIFICACION_SIN_DOCUMENTO:
+            return "❌ Error: No hay documento registrado. Ejecuta 'setup' primero."
+        if resultado.estado == VERIFICACION_FLAG_INVALIDA:
+            return "❌ Flag incorrecta. Verifica que hayas completado el reto correctamente."
+        if resultado.estado == VERIFICACION_YA_COMPLETADO:
+            return MENSAJE_YA_COMPLETADO
+        if resultado.estado == VERIFICACION_REQUISITOS_PENDIENTES:
+            return "⚠️  Flag correcta, pero no cumples los requisitos del reto. Verifica tu configuración."
+        return ""
+
+    def verificar_flags(self, flags: List[str]) -> List[ResultadoVerificacion]:
+        """
+        Verifica varias flags sin registrar el progreso; los requisitos Docker
+        de todos los retos se verifican contra una sola foto del estado.
+        
+        Returns:
+            Un ResultadoVerificacion por flag, en el mismo orden
+        """
+        identificaciones = [self.identificar_flag(flag) for flag in flags]
+        cumplidos = self.verificar_retos({
+            r.reto_id for r in identificaciones if r.estado == VERIFICACION_POR_VERIFICAR
+        })
+        return [
+            r._replace(estado=VERIFICACION_EXITOSA if cumplidos[r.reto_id] else VERIFICACION_REQUISITOS_PENDIENTES)
+            if r.estado == VERIFICACION_POR_VERIFICAR else r
+            for r in identificaciones
+        ]
+
+    def submit_flags(self, flags: List[str],
+                     verificaciones: Optional[List[ResultadoVerificacion]] = None) -> List[ResultadoEnvio]:
+        """
+        Verifica y registra varias flags de una vez: una sola foto del estado
+        de Docker, una sola escritura del progreso y un solo evento MQTT
+        (flag_submit_batch).
+        
+        Args:
+            flags: Flags a enviar (en el orden del estudiante)
+            verificaciones: Resultado de verificar_flags(flags) ya obtenido
+                (evita repetir la consulta a Docker)
             
-            if flag_esperada == flag:
-                reto_id = reto["id"]
-                
-                # Verificar si ya fue completado
-                if reto_id in self.progress["completados"]:
-                    return False, f"❌ Este reto ya fue completado anteriormente", reto_id
-                
-                # Verificación adicional según el reto
-                verificacion_exitosa = self._verificar_reto_especifico(reto_id)
-                
-                if not verificacion_exitosa:
-                    return False, f"⚠️  Flag correcta, pero no cumples los requisitos del reto. Verifica tu configuración.", reto_id
-                
-                # Registrar completado
-                self.progress["completados"].append(reto_id)
-                self.progress["puntos"] += reto["puntos"]
-                self.progress[f"reto_{reto_id}_fecha"] = datetime.now().isoformat()
-                self.save_progress()
-                
-                # Publicar en MQTT
-                self._publish_mqtt("flag_submit", {
-                    "reto_id": reto_id,
-                    "reto_nombre": reto["nombre"],
-                    "puntos": reto["puntos"],
-                    "total_puntos": self.progress["puntos"],
-                    "completados": len(self.progress["completados"])
-                })
-                
-                mensaje = (
-                    "\n🎉 ¡CORRECTO! 🎉\n"
-                    f"Reto {reto_id}: {reto['nombre']}\n"
-                    f"+{reto['puntos']} puntos\n"
-                    f"Total: {self.progress['puntos']} puntos\n"
-                    f"Completados: {len(self.progress['completados'])}/{len(self.retos)}\n"
-                )
-                return True, mensaje, reto_id
+        Returns:
+            Un ResultadoEnvio por flag, en el mismo orden
+        """
+        if verificaciones is None or any(r.estado == VERIFICACION_POR_VERIFICAR for r in verificaciones):
+            verificaciones = self.verificar_flags(flags)
+        
+        resultados: List[Optional[ResultadoEnvio]] = [None] * len(flags)
+        aceptados: List[Tuple[int, ResultadoVerificacion]] = []
+        vistos: Set[int] = set()
+        for i, (flag, resultado) in enumerate(zip(flags, verificaciones)):
+            rechazo = self._mensaje_rechazo(resultado)
+            if rechazo:
+                resultados[i] = ResultadoEnvio(flag, False, rechazo, resultado.reto_id or 0)
+            elif resultado.reto_id in vistos:
+                resultados[i] = ResultadoEnvio(flag, False, "❌ Flag repetida en el lote", resultado.reto_id)
+            else:
+                vistos.add(resultado.reto_id)
+                aceptados.append((i, resultado))
+        
+        registrados: Set[int] = set()
+        if aceptados:
+            try:
+                registrados = set(self.progress_store.registrar_completados(
+                    [(r.reto_id, r.reto.puntos) for _, r in aceptados]
+                ))
+            except Exception as e:
+                for i, resultado in aceptados:
+                    resultados[i] = ResultadoEnvio(flags[i], False, f"⚠️  Error guardando progreso: {e}",
+                                                   resultado.reto_id)
+                return resultados
+            self.revision_progreso += 1
+        
+        for i, resultado in aceptados:
+            reto = resultado.reto
+            if reto.id in registrados:
+                resultados[i] = ResultadoEnvio(flags[i], True,
+                                               f"🎉 ¡CORRECTO! Reto {reto.id}: {reto.nombre} (+{reto.puntos} puntos)",
+                                               reto.id)
+            else:
+                resultados[i] = ResultadoEnvio(flags[i], False, MENSAJE_YA_COMPLETADO, reto.id)
         
-        return False, "❌ Flag incorrecta. Verifica que hayas completado el reto correctamente.", 0
+        if registrados:
+            retos = [r.reto for _, r in aceptados if r.reto_id in registrados]
+            self._publish_mqtt("flag_submit_batch", {
+                "retos": [
+                    {"reto_id": reto.id, "reto_nombre": reto.nombre, "puntos": reto.puntos}
+                    for reto in retos
+                ],
+                "puntos": sum(reto.puntos for reto in retos),
+                "total_puntos": self.progress["puntos"],
+                "completados": len(self.progress["completados"])
+            })
+        
+        return resultados
+
+    def capturar_estado_docker(self) -> DockerStateSnapshot:
+        """Captura una foto del estado de Docker para verificar retos"""
+        return DockerStateSnapshot.capturar(self.docker_client)
 
-    def _verificar_reto_especifico(self, reto_id: int) -> bool:
+    def iniciar_watcher(self, on_cambio: Optional[Callable[[Dict], None]] = None) -> Optional[DockerEventsWatcher]:
+        """
+        Inicia el watcher de eventos Docker para que las verificaciones
+        consulten el estado en memoria en lugar de consultar al daemon.
+        
+        Args:
+            on_cambio: Callback opcional invocado tras cada cambio de estado
+            
+        Returns:
+            El watcher iniciado, o None si Docker no está disponible
+        """
+        if not self.docker_client:
+            return None
+        if self.docker_watcher is None:
+            self.docker_watcher = DockerEventsWatcher(self.docker_client, on_cambio)
+        self.docker_watcher.iniciar()
+        return self.docker_watcher
+
+    @contextmanager
+    def _estado_docker(self, dirigido: bool = False):
+        """
+        Entrega el estado de Docker a verificar: el del watcher si está
+        sincronizado (bajo su lock) o, si no, una foto recién capturada.
+        
+        Args:
+            dirigido: Sin watcher, consultar solo lo que pida la verificación
+                (DockerStateConsulta) en lugar de capturar todo el host; es
+                lo conveniente para un solo reto
+        """
+        watcher = self.docker_watcher
+        if watcher is not None and watcher.sincronizado.is_set():
+            with watcher.lock:
+                yield watcher.estado
+        elif dirigido:
+            yield DockerStateConsulta(self.docker_client)
+        else:
+            yield self.capturar_estado_docker()
+
+    def _verificar_reto_especifico(self, reto_id: int,
+                                   estado: Optional[DockerStateSnapshot] = None) -> bool:
         """
         Verifica requisitos específicos del reto usando Docker API
         
         Args:
             reto_id: ID del reto a verificar
+            estado: Foto de Docker ya capturada (si no se indica se usa la del
+                watcher o se consulta a Docker solo lo que necesita el reto)
             
         Returns:
             True si cumple los requisitos, False si no
@@ -592,127 +1112,49 @@ class DockerChallenge:
             # Si Docker no está disponible, aceptar la flag (modo desarrollo)
             return True
         
-        try:
-            if reto_id == 1:
-                # Verificar que hello-world se haya ejecutado
-                containers = self.docker_client.containers.list(all=True, filters={"ancestor": "hello-world"})
-                return len(containers) > 0
-            
-            elif reto_id == 2:
-                # Verificar que nginx:alpine existe
-                try:
-                    self.docker_client.images.get("nginx:alpine")
-                    return True
-                except:
-                    return False
-            
-            elif reto_id == 3:
-                # Verificar contenedor 'webserver' en ejecución
-                try:
-                    container = self.docker_client.containers.get("webserver")
-                    return container.status == "running"
-                except:
-                    return False
-            
-            elif reto_id == 4:
-                # Verificar contenedor con puerto 8080 mapeado
-                try:
-                    container = self.docker_client.containers.get("webserver-port")
-                    ports = container.attrs['NetworkSettings']['Ports']
-                    return '80/tcp' in ports and any('8080' in str(p) for p in ports['80/tcp'] or [])
-                except:
-                    return False
-            
-            elif reto_id == 5:
-                # Verificar volumen 'datos_importantes'
-                volumes = self.docker_client.volumes.list(filters={"name": "datos_importantes"})
-                return len(volumes) > 0
-            
-            elif reto_id == 6:
-                # Verificar red 'mi_red_ctf'
-                networks = self.docker_client.networks.list(names=["mi_red_ctf"])
-                return len(networks) > 0
-            
-            elif reto_id == 7:
-                # Verificar dos contenedores en mi_red_ctf
-                try:
-                    c1 = self.docker_client.containers.get("contenedor1")
-                    c2 = self.docker_client.containers.get("contenedor2")
-                    
-                    # Verificar que ambos están en la red
-                    net1 = 'mi_red_ctf' in c1.attrs['NetworkSettings']['Networks']
-                    net2 = 'mi_red_ctf' in c2.attrs['NetworkSettings']['Networks']
-                    
-                    return net1 and net2 and c1.status == "running" and c2.status == "running"
-                except:
-                    return False
-            
-            elif reto_id == 8:
-                # Verificar contenedor con SSH (puerto 2222)
-                containers = self.docker_client.containers.list()
-                for container in containers:
-                    ports = container.attrs['NetworkSettings']['Ports']
-                    if any('2222' in str(p) for port_list in (ports.values() or []) for p in (port_list or [])):
-                        return True
-                return False
-            
-            elif reto_id == 9:
-                # Verificar contenedor con Telnet (puerto 2323)
-                containers = self.docker_client.containers.list()
-                for container in containers:
-                    ports = container.attrs['NetworkSettings']['Ports']
-                    if any('2323' in str(p) for port_list in (ports.values() or []) for p in (port_list or [])):
-                        return True
-                return False
-            
-            elif reto_id == 10:
-                # Verificar contenedor SCADA en puerto 8000
-                containers = self.docker_client.containers.list()
-                for container in containers:
-                    ports = container.attrs['NetworkSettings']['Ports']
-                    if any('8000' in str(p) for port_list in (ports.values() or []) for p in (port_list or [])):
-                        return True
-                return False
-            
-            elif reto_id == 11:
-                # Verificar contenedor VNC en puerto 5900 o 6080
-                containers = self.docker_client.containers.list()
-                for container in containers:
-                    ports = container.attrs['NetworkSettings']['Ports']
-                    if any(p in str(ports) for p in ['5900', '6080']):
-                        return True
-                return False
-            
-            elif reto_id == 12:
-                # Verificar imagen mi-app:v1
-                try:
-                    self.docker_client.images.get("mi-app:v1")
-                    return True
-                except:
-                    return False
-            
-            elif reto_id == 13:
-                # Verificar docker-compose con nginx y redis
-                containers = self.docker_client.containers.list()
-                nginx_found = any('nginx' in c.image.tags[0] if c.image.tags else '' for c in containers)
-                redis_found = any('redis' in c.image.tags[0] if c.image.tags else '' for c in containers)
-                return nginx_found and redis_found
-            
-            elif reto_id == 14:
-                # Verificar que hay al menos un contenedor para inspeccionar
-                containers = self.docker_client.containers.list()
-                return len(containers) > 0
-            
-            elif reto_id == 15:
-                # Verificación simbólica de limpieza (difícil de verificar)
-                return True
-            
+        if not self.pack.verificadores.get(reto_id):
             return True
+        
+        try:
+            if estado is not None:
+                return self.pack.verificar(reto_id, estado)
+            with self._estado_docker(dirigido=True) as estado:
+                return self.pack.verificar(reto_id, estado)
             
         except Exception as e:
             print(f"⚠️  Error en verificación: {e}")
             return False
 
+    def verificar_retos(self, reto_ids: Iterable[int]) -> Dict[int, bool]:
+        """
+        Verifica los requisitos Docker de varios retos con una sola foto.
+        
+        Returns:
+            Diccionario reto_id -> True si cumple los requisitos
+        """
+        reto_ids = list(reto_ids)
+        if not self.docker_client or not reto_ids:
+            return {reto_id: True for reto_id in reto_ids}
+        
+        try:
+            with self._estado_docker() as estado:
+                return {
+                    reto_id: self._verificar_reto_especifico(reto_id, estado)
+                    for reto_id in reto_ids
+                }
+        except Exception as e:
+            print(f"⚠️  Error en verificación: {e}")
+            return {reto_id: False for reto_id in reto_ids}
+
+    def verify_all(self) -> Dict[int, bool]:
+        """
+        Verifica los requisitos Docker de todos los retos con una sola foto.
+        
+        Returns:
+            Diccionario reto_id -> True si cumple los requisitos
+        """
+        return self.verificar_retos(reto.id for reto in self.retos)
+
     def mostrar_retos(self) -> None:
         """Muestra todos los retos disponibles con su estado"""
         print("\n" + "=" * 80)
@@ -720,23 +1162,23 @@ class DockerChallenge:
         print("=" * 80)
         print(f"\n👤 Estudiante: {self.documento_estudiante}")
         print(f"📊 Progreso: {len(self.progress['completados'])}/{len(self.retos)} retos completados")
-        print(f"🏆 Puntos: {self.progress['puntos']}/{sum(r['puntos'] for r in self.retos)}")
+        print(f"🏆 Puntos: {self.progress['puntos']}/{sum(r.puntos for r in self.retos)}")
         print("\n" + "-" * 80)
         
         for reto in self.retos:
-            completado = reto["id"] in self.progress["completados"]
+            completado = reto.id in self.progress["completados"]
             estado = "✅" if completado else "❌"
             
-            print(f"\n{estado} Reto {reto['id']}: {reto['nombre']}")
-            print(f"   📝 {reto['descripcion']}")
-            print(f"   🎯 Dificultad: {reto['dificultad']} | Puntos: {reto['puntos']} | Categoría: {reto['categoria']}")
+            print(f"\n{estado} Reto {reto.id}: {reto.nombre}")
+            print(f"   📝 {reto.descripcion}")
+            print(f"   🎯 Dificultad: {reto.dificultad} | Puntos: {reto.puntos} | Categoría: {reto.categoria}")
             
             if completado:
-                fecha = self.progress.get(f"reto_{reto['id']}_fecha", "")
+                fecha = self.progress.get(f"reto_{reto.id}_fecha", "")
                 if fecha:
                     print(f"   🕐 Completado: {fecha[:19]}")
             else:
-                flag_generada = self.generar_flag_personalizada(reto["id"], reto["flag"].split("{")[1].split("}")[0])
+                flag_generada = self.obtener_flag(reto.id)
                 print(f"   🚩 Flag a enviar: {flag_generada}")
             
             print("   " + "-" * 76)
@@ -748,15 +1190,15 @@ class DockerChallenge:
 
     def mostrar_hint(self, reto_id: int) -> None:
         """Muestra la pista de un reto específico"""
-        reto = next((r for r in self.retos if r["id"] == reto_id), None)
+        reto = self.retos_por_id.get(reto_id)
         
         if not reto:
             print(f"❌ Reto {reto_id} no encontrado")
             return
         
-        print(f"\n💡 PISTA - Reto {reto_id}: {reto['nombre']}")
+        print(f"\n💡 PISTA - Reto {reto_id}: {reto.nombre}")
         print("=" * 60)
-        print(f"\n{reto['pista']}\n")
+        print(f"\n{reto.pista}\n")
         print("=" * 60 + "\n")
 
     def mostrar_estado(self) -> None:
@@ -767,16 +1209,16 @@ class DockerChallenge:
         print(f"\n👤 Estudiante: {self.documento_estudiante}")
         print(f"📅 Fecha inicio: {self.progress.get('fecha_inicio', '')[:19]}")
         print(f"\n🎯 Retos completados: {len(self.progress['completados'])}/{len(self.retos)}")
-        print(f"🏆 Puntos totales: {self.progress['puntos']}/{sum(r['puntos'] for r in self.retos)}")
+        print(f"🏆 Puntos totales: {self.progress['puntos']}/{sum(r.puntos for r in self.retos)}")
         
         # Estadísticas por categoría
         categorias = {}
         for reto in self.retos:
-            cat = reto['categoria']
+            cat = reto.categoria
             if cat not in categorias:
                 categorias[cat] = {"total": 0, "completados": 0}
             categorias[cat]["total"] += 1
-            if reto["id"] in self.progress["completados"]:
+            if reto.id in self.progress["completados"]:
                 categorias[cat]["completados"] += 1
         
         print("\n📈 Por Categoría:")
@@ -790,69 +1232,145 @@ class DockerChallenge:
         
         print("\n" + "=" * 60 + "\n")
 
-    def cleanup_containers(self) -> None:
-        """Limpia contenedores de prueba del CTF"""
+    def planificar_limpieza(self) -> PlanLimpieza:
+        """
+        Descubre los recursos del laboratorio a eliminar: los que tienen la
+        etiqueta ETIQUETA_LAB y los nombrados por el pack de retos.
+        
+        Returns:
+            PlanLimpieza con contenedores, volúmenes, redes e imágenes
+        """
+        api = self.docker_client.api
+        recursos = self.pack.recursos
+        estado = DockerStateSnapshot.capturar(self.docker_client)
+        filtro = {"label": ETIQUETA_LAB}
+        
+        imagenes = {_normalizar_imagen(tag) for tag in recursos.imagenes}
+        imagenes.update(
+            tag
+            for imagen in api.images(filters=filtro)
+            for tag in imagen.get("RepoTags") or []
+            if tag != "<none>:<none>"
+        )
+        imagenes = {tag for tag in imagenes if estado.tiene_imagen(tag)}
+        
+        # Contenedores por nombre, etiqueta o imagen del laboratorio
+        origenes = imagenes | {_normalizar_imagen(i) for i in recursos.imagenes_origen}
+        contenedores = [
+            c for c in estado.contenedores.values()
+            if c.nombre in recursos.contenedores
+            or ETIQUETA_LAB in c.labels
+            or c.tags & origenes
+        ]
+        
+        volumenes = {v for v in recursos.volumenes if v in estado.volumenes}
+        volumenes.update(v.get("Name", "") for v in api.volumes(filters=filtro).get("Volumes") or [])
+        
+        redes = {r for r in recursos.redes if r in estado.redes}
+        redes.update(r.get("Name", "") for r in api.networks(filters=filtro))
+        redes -= REDES_PREDETERMINADAS
+        
+        return PlanLimpieza(
+            contenedores=sorted(contenedores, key=lambda c: c.nombre),
+            volumenes=sorted(volumenes),
+            redes=sorted(redes),
+            imagenes=sorted(imagenes),
+        )
+
+    def cleanup_containers(self, dry_run: bool = False, timeout: Optional[int] = None,
+                           workers: Optional[int] = None) -> Optional[Dict]:
+        """
+        Limpia los recursos del CTF (contenedores, volúmenes, redes e imágenes)
+        en paralelo: primero se detienen y eliminan los contenedores, después
+        el resto de recursos que dependían de ellos.
+        
+        Args:
+            dry_run: Solo mostrar lo que se eliminaría
+            timeout: Segundos de gracia al detener cada contenedor
+                (por defecto DOCKER_CTF_CLEANUP_TIMEOUT; 0 = forzar)
+            workers: Operaciones simultáneas (por defecto DOCKER_CTF_CLEANUP_WORKERS)
+        
+        Returns:
+            Reporte {"eliminados": [...], "errores": [...]} o None si Docker no
+            está disponible
+        """
         if not self.docker_client:
             print("❌ Docker no está disponible")
-            return
+            return None
+        
+        if timeout is None:
+            timeout = int(os.getenv("DOCKER_CTF_CLEANUP_TIMEOUT", "3"))
+        if workers is None:
+            workers = int(os.getenv("DOCKER_CTF_CLEANUP_WORKERS", "8"))
+        
+        inicio = time.monotonic()
+        plan = self.planificar_limpieza()
         
-        print("\n🧹 Limpiando contenedores de prueba...")
+        if dry_run:
+            print("\n🧹 Limpieza (simulación) - se eliminarían:\n")
+            for c in plan.contenedores:
+                print(f"   🐳 Contenedor: {c.nombre} ({c.estado}, {c.imagen})")
+            for nombre in plan.volumenes:
+                print(f"   💾 Volumen: {nombre}")
+            for nombre in plan.redes:
+                print(f"   🌐 Red: {nombre}")
+            for tag in plan.imagenes:
+                print(f"   📦 Imagen: {tag}")
+            if plan.vacio:
+                print("   (nada que limpiar)")
+            print()
+            return {"eliminados": [], "errores": [], "plan": plan}
         
-        nombres_ctf = [
-            "webserver", "webserver-port", "contenedor1", "contenedor2",
-            "scada-server", "vnc-desktop", "ssh-server", "telnet-server"
+        print(f"\n🧹 Limpiando recursos del laboratorio ({workers} en paralelo)...")
+        
+        api = self.docker_client.api
+        
+        def eliminar_contenedor(c: ContenedorInfo) -> None:
+            if c.en_ejecucion and timeout > 0:
+                api.stop(c.id, timeout=timeout)
+            api.remove_container(c.id, force=True)
+        
+        # (tipo, nombre, operación) en dos fases: contenedores y luego el resto
+        fases = [
+            [("Contenedor", c.nombre, partial(eliminar_contenedor, c)) for c in plan.contenedores],
+            [("Volumen", v, partial(api.remove_volume, v)) for v in plan.volumenes]
+            + [("Red", r, partial(api.remove_network, r)) for r in plan.redes]
+            + [("Imagen", i, partial(api.remove_image, i)) for i in plan.imagenes],
         ]
         
-        cleaned = 0
-        for nombre in nombres_ctf:
-            try:
-                container = self.docker_client.containers.get(nombre)
-                container.stop()
-                container.remove()
-                print(f"   ✅ Eliminado: {nombre}")
-                cleaned += 1
-            except:
-                pass
+        eliminados = []
+        errores = []
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for tareas in fases:
+                futuros = {executor.submit(operacion): (tipo, nombre) for tipo, nombre, operacion in tareas}
+                for futuro in as_completed(futuros):
+                    tipo, nombre = futuros[futuro]
+                    try:
+                        futuro.result()
+                        eliminados.append((tipo, nombre))
+                        print(f"   ✅ Eliminado: {tipo.lower()} {nombre}")
+                    except Exception as e:
+                        if getattr(getattr(e, "response", None), "status_code", None) == 404:
+                            # Ya no existía: el objetivo se cumple igual
+                            eliminados.append((tipo, nombre))
+                            continue
+                        errores.append((tipo, nombre, str(e)))
+                        print(f"   ⚠️  {tipo} {nombre}: {e}")
         
-        print(f"\n✅ Limpieza completada: {cleaned} contenedores eliminados\n")
-
-    def _init_mqtt(self) -> None:
-        """Inicializa el cliente MQTT"""
-        try:
-            self.mqtt_client = mqtt.Client(client_id=f"docker_ctf_{self.documento_estudiante or 'unknown'}")
-            
-            # Configurar credenciales si existen
-            if self.mqtt_config["username"]:
-                self.mqtt_client.username_pw_set(
-                    self.mqtt_config["username"],
-                    self.mqtt_config["password"]
-                )
-            
-            # Conectar
-            self.mqtt_client.connect(
-                self.mqtt_config["broker"],
-                self.mqtt_config["port"],
-                60
-            )
-            
-            # Iniciar loop en background
-            self.mqtt_client.loop_start()
-            
-            print(f"✅ MQTT conectado a {self.mqtt_config['broker']}")
-            
-        except Exception as e:
-            print(f"⚠️  Error conectando MQTT: {e}")
-            self.mqtt_client = None
+        duracion = time.monotonic() - inicio
+        print(f"\n✅ Limpieza completada: {len(eliminados)} recursos eliminados, "
+              f"{len(errores)} errores ({duracion:.1f}s)\n")
+        return {"eliminados": eliminados, "errores": errores, "plan": plan}
 
     def _publish_mqtt(self, event_type: str, data: dict) -> None:
         """
-        Publica evento en MQTT
+        Publica evento en MQTT (no bloquea: se encola en el outbox)
         
         Args:
             event_type: Tipo de evento (progress, connection, flag_submit)
             data: Datos del evento
         """
-        if not self.mqtt_client or not self.mqtt_config["enabled"]:
+        if not self.mqtt_config["enabled"]:
             return
         
         try:
@@ -865,7 +1383,7 @@ class DockerChallenge:
                 **data
             }
             
-            self.mqtt_client.publish(topic, json.dumps(payload), qos=1)
+            self.mqtt_outbox.enviar(topic, payload, qos=1)
             
         except Exception as e:
             print(f"⚠️  Error publicando MQTT: {e}")
@@ -895,28 +1413,36 @@ class DockerChallenge:
         })
 
 
-def main():
-    """Función principal del CLI"""
-    challenge = DockerChallenge()
+# Comandos que puede atender el daemon del laboratorio (lab_daemon.py);
+# setup (interactivo) y cleanup siempre se ejecutan en el proceso del CLI
+COMANDOS_DAEMON = {"start", "submit", "status", "hint"}
+
+
+def leer_flags(ruta: str) -> List[str]:
+    """
+    Lee flags de un archivo, una por línea ('-' para la entrada estándar).
+    Las líneas vacías y las que empiezan con '#' se ignoran.
+    """
+    if ruta == "-":
+        lineas = sys.stdin.read().splitlines()
+    else:
+        lineas = Path(ruta).read_text(encoding="utf-8").splitlines()
+    return [linea.strip() for linea in lineas if linea.strip() and not linea.strip().startswith("#")]
+
+
+def ejecutar_comando(challenge: DockerChallenge, args: List[str]) -> int:
+    """
+    Ejecuta un comando del CLI sobre una instancia de DockerChallenge.
+    Lo usan tanto el CLI como el daemon del laboratorio.
     
-    if len(sys.argv) < 2:
-        mensaje_ayuda = (
-            "\n🐳 Docker CTF Lab - Sistema de Retos Capture The Flag\n\n"
-            "Uso:\n"
-            "    python3 docker_challenge.py setup              - Configurar entorno\n"
-            "    python3 docker_challenge.py start              - Ver todos los retos\n"
-            "    python3 docker_challenge.py submit <flag>      - Enviar una flag\n"
-            "    python3 docker_challenge.py status             - Ver tu progreso\n"
-            "    python3 docker_challenge.py hint <numero>      - Ver pista de un reto\n"
-            "    python3 docker_challenge.py cleanup            - Limpiar contenedores\n\n"
-            "Ejemplos:\n"
-            "    python3 docker_challenge.py submit FLAG{primer_contenedor_ABC12345}\n"
-            "    python3 docker_challenge.py hint 1\n"
-        )
-        print(mensaje_ayuda)
-        sys.exit(1)
+    Args:
+        challenge: Instancia sobre la que se ejecuta el comando
+        args: Argumentos del comando (sin el nombre del script)
     
-    comando = sys.argv[1].lower()
+    Returns:
+        Código de salida del comando
+    """
+    comando = args[0].lower()
     
     if comando == "setup":
         challenge.setup_environment()
@@ -925,21 +1451,45 @@ def main():
         challenge.mostrar_retos()
     
     elif comando == "submit":
-        if len(sys.argv) < 3:
+        if "--file" in args[1:]:
+            try:
+                flags = leer_flags(args[args.index("--file") + 1])
+            except IndexError:
+                print("❌ --file requiere la ruta de un archivo (o '-' para leer de la entrada estándar)")
+                return 1
+            except OSError as e:
+                print(f"❌ No se pudo leer el archivo de flags: {e}")
+                return 1
+        else:
+            flags = args[1:]
+        
+        if not flags:
             print("❌ Debes proporcionar una flag")
-            print("Uso: python3 docker_challenge.py submit FLAG{...}")
-            sys.exit(1)
+            print("Uso: python3 docker_challenge.py submit FLAG{...} [FLAG{...} ...]")
+            print("     python3 docker_challenge.py submit --file flags.txt")
+            return 1
         
-        flag = sys.argv[2]
-        exito, mensaje, reto_id = challenge.submit_flag(flag)
-        print(mensaje)
+        if len(flags) == 1:
+            exito, mensaje, reto_id = challenge.submit_flag(flags[0])
+            print(mensaje)
+        else:
+            resultados = challenge.submit_flags(flags)
+            print(f"\n📨 Enviando {len(flags)} flags\n")
+            for resultado in resultados:
+                print(f"   {resultado.flag}")
+                print(f"      {resultado.mensaje}")
+            aceptadas = sum(1 for r in resultados if r.exito)
+            exito = aceptadas > 0
+            print(f"\n✅ {aceptadas}/{len(resultados)} flags aceptadas")
+            print(f"   Total: {challenge.progress['puntos']} puntos - "
+                  f"Completados: {len(challenge.progress['completados'])}/{len(challenge.retos)}\n")
         
         if exito and len(challenge.progress["completados"]) == len(challenge.retos):
             print("\n" + "=" * 70)
             print("🏆 ¡FELICIDADES! 🏆".center(70))
             print("=" * 70)
             print("\n   Has completado todos los retos del Docker CTF Lab")
-            print(f"   Puntuación final: {challenge.progress['puntos']}/{sum(r['puntos'] for r in challenge.retos)} puntos")
+            print(f"   Puntuación final: {challenge.progress['puntos']}/{sum(r.puntos for r in challenge.retos)} puntos")
             print("\n   ¡Eres un verdadero maestro de Docker! 🐳🎉\n")
             print("=" * 70 + "\n")
     
@@ -947,24 +1497,88 @@ def main():
         challenge.mostrar_estado()
     
     elif comando == "hint":
-        if len(sys.argv) < 3:
+        if len(args) < 2:
             print("❌ Debes proporcionar el número del reto")
             print("Uso: python3 docker_challenge.py hint <numero>")
-            sys.exit(1)
+            return 1
         
         try:
-            reto_id = int(sys.argv[2])
+            reto_id = int(args[1])
             challenge.mostrar_hint(reto_id)
         except ValueError:
             print("❌ El número de reto debe ser un número entero")
     
     elif comando == "cleanup":
-        challenge.cleanup_containers()
+        opciones = {"dry_run": "--dry-run" in args[1:]}
+        try:
+            for opcion in ("timeout", "workers"):
+                if f"--{opcion}" in args:
+                    opciones[opcion] = int(args[args.index(f"--{opcion}") + 1])
+        except (IndexError, ValueError):
+            print("❌ --timeout y --workers requieren un número entero")
+            print("Uso: python3 docker_challenge.py cleanup [--dry-run] [--timeout N] [--workers N]")
+            return 1
+        
+        challenge.cleanup_containers(**opciones)
     
     else:
         print(f"❌ Comando desconocido: {comando}")
         print("Usa 'python3 docker_challenge.py' sin argumentos para ver la ayuda")
+        return 1
+    
+    return 0
+
+
+def main():
+    """Función principal del CLI"""
+    if len(sys.argv) < 2:
+        mensaje_ayuda = (
+            "\n🐳 Docker CTF Lab - Sistema de Retos Capture The Flag\n\n"
+            "Uso:\n"
+            "    python3 docker_challenge.py setup              - Configurar entorno\n"
+            "    python3 docker_challenge.py start              - Ver todos los retos\n"
+            "    python3 docker_challenge.py submit <flag>      - Enviar una flag\n"
+            "    python3 docker_challenge.py submit --file F    - Enviar varias flags (una por línea)\n"
+            "    python3 docker_challenge.py status             - Ver tu progreso\n"
+            "    python3 docker_challenge.py hint <numero>      - Ver pista de un reto\n"
+            "    python3 docker_challenge.py cleanup            - Limpiar recursos del laboratorio\n"
+            "        [--dry-run] [--timeout N] [--workers N]\n\n"
+            "Ejemplos:\n"
+            "    python3 docker_challenge.py submit FLAG{primer_contenedor_ABC12345}\n"
+            "    python3 docker_challenge.py hint 1\n"
+        )
+        print(mensaje_ayuda)
         sys.exit(1)
+    
+    comando = sys.argv[1].lower()
+    args = sys.argv[1:]
+    
+    # El archivo de flags se lee aquí: el daemon no comparte el directorio
+    # de trabajo ni la entrada estándar del CLI
+    if comando == "submit" and "--file" in args:
+        try:
+            args = ["submit"] + leer_flags(args[args.index("--file") + 1])
+        except (IndexError, OSError):
+            pass  # ejecutar_comando informa el error
+    
+    # Si el daemon del laboratorio está corriendo, él atiende el comando con
+    # su instancia ya inicializada; si no, se ejecuta en este proceso
+    if comando in COMANDOS_DAEMON:
+        from lab_daemon import enviar_comando
+        codigo = enviar_comando(args)
+        if codigo is not None:
+            sys.exit(codigo)
+    
+    # Docker y MQTT se inicializan bajo demanda solo en los comandos que los usan
+    challenge = DockerChallenge()
+    
+    try:
+        codigo = ejecutar_comando(challenge, args)
+    finally:
+        # Enviar (acotado) los eventos MQTT pendientes antes de salir
+        challenge.cerrar()
+    
+    sys.exit(codigo)
 
 
 if __name__ == "__main__":
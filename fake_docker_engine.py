@@ -0,0 +1,877 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Docker CTF Lab - Docker Engine Simulado
+Servidor HTTP sobre un socket unix que imita la API de Docker Engine que
+usa el laboratorio, con fixtures sintéticos del tamaño que se quiera y
+latencia configurable. Sirve para medir cómo escalan los verificadores
+en un host con miles de contenedores sin un daemon real.
+
+Endpoints: _ping, version, info, containers/json (con filtros),
+containers/{id}/json, containers/{id}/stop, DELETE containers/{id},
+images/json, images/{nombre}/json, DELETE images/{nombre}, volumes,
+DELETE volumes/{nombre}, networks, DELETE networks/{id}, events y system/df.
+
+Uso:
+    python3 fake_docker_engine.py [--socket ruta] [--contenedores N]
+        [--imagenes N] [--redes N] [--volumenes N] [--latencia-ms N]
+        [--jitter-ms N] [--churn N]
+    DOCKER_HOST=unix:///tmp/fake_docker.sock python3 docker_challenge.py status
+"""
+
+import fnmatch
+import hashlib
+import json
+import queue
+import random
+import re
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+# Versión de la API que se anuncia al SDK
+API_VERSION = "1.43"
+
+# Socket por defecto
+SOCKET_POR_DEFECTO = "/tmp/fake_docker.sock"
+
+# Eventos recientes que se conservan para 'since'
+HISTORIAL_EVENTOS = 1000
+
+
+def _id(texto: str) -> str:
+    """ID determinista de 64 caracteres hexadecimales"""
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def _normalizar_imagen(referencia: str) -> str:
+    """Agrega ':latest' a una referencia de imagen sin tag"""
+    if ":" not in referencia.rsplit("/", 1)[-1]:
+        return f"{referencia}:latest"
+    return referencia
+
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+def generar_fixture(contenedores: int = 100, imagenes: int = 20, redes: int = 5,
+                    volumenes: int = 10, semilla: int = 0, incluir_lab: bool = True) -> Dict:
+    """
+    Genera el estado de un host Docker sintético.
+
+    Args:
+        contenedores: Contenedores de relleno
+        imagenes: Imágenes de relleno
+        redes: Redes de relleno (además de bridge, host y none)
+        volumenes: Volúmenes de relleno
+        semilla: Semilla del generador (mismo valor = mismo fixture)
+        incluir_lab: Agregar los recursos que cumplen los retos del laboratorio
+
+    Returns:
+        {"contenedores": [...], "imagenes": [...], "redes": [...], "volumenes": [...]}
+        con los campos de la API de Docker
+    """
+    aleatorio = random.Random(semilla)
+    ahora = int(time.time())
+
+    fixture = {"contenedores": [], "imagenes": [], "redes": [], "volumenes": []}
+
+    def agregar_imagen(tag: str, labels: Optional[Dict] = None) -> Dict:
+        imagen = {
+            "Id": f"sha256:{_id('imagen/' + tag)}",
+            "RepoTags": [tag],
+            "RepoDigests": [],
+            "Created": ahora - aleatorio.randint(0, 10 ** 7),
+            "Size": aleatorio.randint(5, 900) * 1024 * 1024,
+            "SharedSize": -1,
+            "Labels": labels or {},
+            "Containers": -1,
+        }
+        fixture["imagenes"].append(imagen)
+        return imagen
+
+    def agregar_red(nombre: str) -> None:
+        fixture["redes"].append({
+            "Name": nombre,
+            "Id": _id("red/" + nombre),
+            "Driver": "bridge" if nombre not in ("host", "none") else nombre,
+            "Scope": "local",
+            "Labels": {},
+        })
+
+    def agregar_volumen(nombre: str) -> None:
+        fixture["volumenes"].append({
+            "Name": nombre,
+            "Driver": "local",
+            "Mountpoint": f"/var/lib/docker/volumes/{nombre}/_data",
+            "Labels": {},
+            "Scope": "local",
+        })
+
+    def agregar_contenedor(nombre: str, imagen: str, estado: str = "running",
+                           puertos=(), redes_contenedor=("bridge",), labels=None) -> None:
+        fixture["contenedores"].append({
+            "Id": _id("contenedor/" + nombre),
+            "Names": [f"/{nombre}"],
+            "Image": imagen,
+            "ImageID": f"sha256:{_id('imagen/' + _normalizar_imagen(imagen))}",
+            "Command": "/entrypoint.sh",
+            "Created": ahora - aleatorio.randint(0, 10 ** 6),
+            "State": estado,
+            "Status": "Up 5 minutes" if estado == "running" else "Exited (0) 5 minutes ago",
+            "Ports": [
+                {"IP": "0.0.0.0", "PrivatePort": privado, "PublicPort": host, "Type": "tcp"}
+                for host, privado in puertos
+            ],
+            "Labels": labels or {},
+            "NetworkSettings": {"Networks": {
+                red: {"NetworkID": _id("red/" + red), "IPAddress": f"172.18.{i}.{aleatorio.randint(2, 250)}"}
+                for i, red in enumerate(redes_contenedor)
+            }},
+            "Mounts": [],
+        })
+
+    for red in ("bridge", "host", "none"):
+        agregar_red(red)
+
+    if incluir_lab:
+        for tag in ("hello-world:latest", "nginx:alpine", "alpine:latest", "redis:alpine",
+                    "mi-app:v1", "ssh-custom:latest"):
+            agregar_imagen(tag)
+        agregar_red("mi_red_ctf")
+        agregar_volumen("datos_importantes")
+        agregar_contenedor("hola", "hello-world", estado="exited")
+        agregar_contenedor("webserver", "nginx:alpine")
+        agregar_contenedor("webserver-port", "nginx:alpine", puertos=[(8080, 80)])
+        agregar_contenedor("contenedor1", "alpine", redes_contenedor=("mi_red_ctf",))
+        agregar_contenedor("contenedor2", "alpine", redes_contenedor=("mi_red_ctf",))
+        agregar_contenedor("ssh-server", "ssh-custom", puertos=[(2222, 22)])
+        agregar_contenedor("telnet-server", "alpine", puertos=[(2323, 23)])
+        agregar_contenedor("scada-server", "alpine", puertos=[(8000, 8000)])
+        agregar_contenedor("vnc-desktop", "alpine", puertos=[(5900, 5900), (6080, 80)])
+        agregar_contenedor("app-web", "nginx:alpine")
+        agregar_contenedor("app-cache", "redis:alpine")
+
+    tags_relleno = [agregar_imagen(f"relleno/app{i}:v{aleatorio.randint(1, 9)}")["RepoTags"][0]
+                    for i in range(imagenes)] or ["alpine:latest"]
+    redes_relleno = [f"red_{i}" for i in range(redes)]
+    for red in redes_relleno:
+        agregar_red(red)
+    for i in range(volumenes):
+        agregar_volumen(f"volumen_{i}")
+
+    # Puertos altos sin chocar con los del laboratorio
+    puertos_libres = iter(range(20000, 65000))
+    for i in range(contenedores):
+        puertos = [(next(puertos_libres), 80)] if aleatorio.random() < 0.3 else []
+        agregar_contenedor(
+            f"relleno_{i}",
+            aleatorio.choice(tags_relleno),
+            estado="running" if aleatorio.random() < 0.6 else "exited",
+            puertos=puertos,
+            redes_contenedor=(aleatorio.choice(redes_relleno),) if redes_relleno else ("bridge",),
+        )
+
+    return fixture
+
+
+# ============================================================================
+# ESTADO DEL ENGINE
+# ============================================================================
+
+def _valores_filtro(filtros: Dict, nombre: str) -> List[str]:
+    """Valores de un filtro (la API acepta lista o {valor: true})"""
+    valores = filtros.get(nombre)
+    if isinstance(valores, dict):
+        return [v for v, activo in valores.items() if activo]
+    return list(valores or [])
+
+
+def _coincide_label(labels: Dict, condiciones: List[str]) -> bool:
+    """Filtro 'label': todas las condiciones 'clave' o 'clave=valor' deben cumplirse"""
+    for condicion in condiciones:
+        clave, _, valor = condicion.partition("=")
+        if clave not in labels or ("=" in condicion and labels[clave] != valor):
+            return False
+    return True
+
+
+class EstadoEngine:
+    """Contenedores, imágenes, redes y volúmenes del engine, con su bus de eventos"""
+
+    def __init__(self, fixture: Dict):
+        self.lock = threading.RLock()
+        self.contenedores: Dict[str, Dict] = {c["Id"]: c for c in fixture["contenedores"]}
+        self.imagenes: Dict[str, Dict] = {i["Id"]: i for i in fixture["imagenes"]}
+        self.redes: Dict[str, Dict] = {r["Id"]: r for r in fixture["redes"]}
+        self.volumenes: Dict[str, Dict] = {v["Name"]: v for v in fixture["volumenes"]}
+        self.version = 0
+        self._cache: Dict[str, tuple] = {}
+        self._suscriptores: List[queue.Queue] = []
+        self._historial = deque(maxlen=HISTORIAL_EVENTOS)
+
+    # ------------------------------------------------------------------
+    # Eventos
+    # ------------------------------------------------------------------
+
+    def emitir(self, tipo: str, accion: str, actor_id: str, atributos: Dict) -> None:
+        """Publica un evento a los suscriptores de /events"""
+        ahora = time.time_ns()
+        evento = {
+            "Type": tipo,
+            "Action": accion,
+            "Actor": {"ID": actor_id, "Attributes": atributos},
+            "scope": "local",
+            "time": ahora // 10 ** 9,
+            "timeNano": ahora,
+        }
+        if tipo == "container":
+            evento.update({"status": accion, "id": actor_id, "from": atributos.get("image", "")})
+        with self.lock:
+            self.version += 1
+            self._historial.append(evento)
+            for cola in self._suscriptores:
+                cola.put(evento)
+
+    def suscribir(self, since: Optional[int]) -> queue.Queue:
+        """Cola con los eventos desde 'since' (del historial) y los siguientes"""
+        cola = queue.Queue()
+        with self.lock:
+            if since is not None:
+                for evento in self._historial:
+                    if evento["time"] >= since:
+                        cola.put(evento)
+            self._suscriptores.append(cola)
+        return cola
+
+    def desuscribir(self, cola: queue.Queue) -> None:
+        with self.lock:
+            if cola in self._suscriptores:
+                self._suscriptores.remove(cola)
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def cache(self, clave: str, generar) -> bytes:
+        """Cuerpo JSON serializado de una consulta sin filtros (por versión)"""
+        with self.lock:
+            guardado = self._cache.get(clave)
+            if guardado and guardado[0] == self.version:
+                return guardado[1]
+            cuerpo = json.dumps(generar()).encode("utf-8")
+            self._cache[clave] = (self.version, cuerpo)
+            return cuerpo
+
+    def buscar_contenedor(self, referencia: str) -> Optional[Dict]:
+        """Contenedor por id, prefijo de id o nombre"""
+        if referencia in self.contenedores:
+            return self.contenedores[referencia]
+        for contenedor in self.contenedores.values():
+            if contenedor["Id"].startswith(referencia) or f"/{referencia}" in contenedor["Names"]:
+                return contenedor
+        return None
+
+    def buscar_imagen(self, referencia: str) -> Optional[Dict]:
+        """Imagen por id, prefijo de id o tag"""
+        etiqueta = _normalizar_imagen(referencia)
+        for imagen in self.imagenes.values():
+            if (imagen["Id"] == referencia or imagen["Id"].startswith(f"sha256:{referencia}")
+                    or etiqueta in imagen["RepoTags"]):
+                return imagen
+        return None
+
+    def buscar_red(self, referencia: str) -> Optional[Dict]:
+        """Red por id, prefijo de id o nombre"""
+        for red in self.redes.values():
+            if red["Id"].startswith(referencia) or red["Name"] == referencia:
+                return red
+        return None
+
+    def listar_contenedores(self, todos: bool, filtros: Dict) -> List[Dict]:
+        """GET /containers/json"""
+        ids = _valores_filtro(filtros, "id")
+        nombres = _valores_filtro(filtros, "name")
+        labels = _valores_filtro(filtros, "label")
+        estados = _valores_filtro(filtros, "status")
+        ancestros = _valores_filtro(filtros, "ancestor")
+        redes = _valores_filtro(filtros, "network")
+        publicados = [p.split("/") for p in _valores_filtro(filtros, "publish")]
+
+        # Búsqueda directa por id completo (la usa el watcher por cada evento)
+        if len(ids) == 1 and ids[0] in self.contenedores:
+            candidatos = [self.contenedores[ids[0]]]
+        else:
+            candidatos = self.contenedores.values()
+
+        resultado = []
+        for c in candidatos:
+            if not todos and c["State"] != "running" and not estados:
+                continue
+            if ids and not any(c["Id"].startswith(i) for i in ids):
+                continue
+            if nombres and not any(re.search(n, c["Names"][0].lstrip("/")) for n in nombres):
+                continue
+            if labels and not _coincide_label(c["Labels"], labels):
+                continue
+            if estados and c["State"] not in estados:
+                continue
+            if ancestros and not any(
+                    _normalizar_imagen(c["Image"]) == _normalizar_imagen(a) or c["ImageID"] == a
+                    for a in ancestros):
+                continue
+            if redes and not set(redes) & set(c["NetworkSettings"]["Networks"]):
+                continue
+            if publicados and not any(
+                    str(p.get("PublicPort")) == publicado[0] and publicado[-1] in (publicado[0], p["Type"])
+                    for p in c["Ports"] for publicado in publicados):
+                continue
+            resultado.append(c)
+        return resultado
+
+    def inspeccionar_contenedor(self, c: Dict) -> Dict:
+        """GET /containers/{id}/json"""
+        puertos = {}
+        for p in c["Ports"]:
+            puertos.setdefault(f"{p['PrivatePort']}/{p['Type']}", []).append(
+                {"HostIp": p.get("IP", "0.0.0.0"), "HostPort": str(p["PublicPort"])})
+        return {
+            "Id": c["Id"],
+            "Name": c["Names"][0],
+            "Created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(c["Created"])),
+            "Image": c["ImageID"],
+            "State": {
+                "Status": c["State"],
+                "Running": c["State"] == "running",
+                "Paused": False,
+                "ExitCode": 0,
+            },
+            "Config": {"Image": c["Image"], "Labels": c["Labels"], "Cmd": [c["Command"]]},
+            "HostConfig": {"PortBindings": puertos},
+            "NetworkSettings": {"Ports": puertos, "Networks": c["NetworkSettings"]["Networks"]},
+            "Mounts": c["Mounts"],
+        }
+
+    def listar_imagenes(self, filtros: Dict) -> List[Dict]:
+        """GET /images/json"""
+        labels = _valores_filtro(filtros, "label")
+        referencias = _valores_filtro(filtros, "reference")
+        resultado = []
+        for imagen in self.imagenes.values():
+            if labels and not _coincide_label(imagen["Labels"], labels):
+                continue
+            if referencias and not any(
+                    fnmatch.fnmatch(tag, r) or fnmatch.fnmatch(tag, _normalizar_imagen(r))
+                    for tag in imagen["RepoTags"] for r in referencias):
+                continue
+            resultado.append(imagen)
+        return resultado
+
+    def listar_volumenes(self, filtros: Dict) -> List[Dict]:
+        """GET /volumes"""
+        nombres = _valores_filtro(filtros, "name")
+        labels = _valores_filtro(filtros, "label")
+        return [
+            v for v in self.volumenes.values()
+            if (not nombres or any(n in v["Name"] for n in nombres))
+            and (not labels or _coincide_label(v["Labels"], labels))
+        ]
+
+    def listar_redes(self, filtros: Dict) -> List[Dict]:
+        """GET /networks"""
+        nombres = _valores_filtro(filtros, "name")
+        labels = _valores_filtro(filtros, "label")
+        ids = _valores_filtro(filtros, "id")
+        return [
+            r for r in self.redes.values()
+            if (not nombres or any(n in r["Name"] for n in nombres))
+            and (not labels or _coincide_label(r["Labels"], labels))
+            and (not ids or any(r["Id"].startswith(i) for i in ids))
+        ]
+
+    def uso_disco(self) -> Dict:
+        """GET /system/df"""
+        return {
+            "LayersSize": sum(i["Size"] for i in self.imagenes.values()),
+            "Images": list(self.imagenes.values()),
+            "Containers": [dict(c, SizeRw=0, SizeRootFs=0) for c in self.contenedores.values()],
+            "Volumes": [dict(v, UsageData={"Size": 0, "RefCount": 0}) for v in self.volumenes.values()],
+            "BuildCache": [],
+        }
+
+    # ------------------------------------------------------------------
+    # Cambios (emiten eventos como el daemon real)
+    # ------------------------------------------------------------------
+
+    def _atributos(self, c: Dict) -> Dict:
+        return {"name": c["Names"][0].lstrip("/"), "image": c["Image"], **c["Labels"]}
+
+    def detener_contenedor(self, c: Dict) -> bool:
+        with self.lock:
+            if c["State"] != "running":
+                return False
+            c["State"] = "exited"
+            c["Status"] = "Exited (0) Less than a second ago"
+        self.emitir("container", "die", c["Id"], self._atributos(c))
+        self.emitir("container", "stop", c["Id"], self._atributos(c))
+        return True
+
+    def iniciar_contenedor(self, c: Dict) -> bool:
+        with self.lock:
+            if c["State"] == "running":
+                return False
+            c["State"] = "running"
+            c["Status"] = "Up Less than a second"
+        self.emitir("container", "start", c["Id"], self._atributos(c))
+        return True
+
+    def eliminar_contenedor(self, c: Dict) -> None:
+        with self.lock:
+            self.contenedores.pop(c["Id"], None)
+        self.emitir("container", "destroy", c["Id"], self._atributos(c))
+
+    def eliminar_imagen(self, imagen: Dict) -> None:
+        with self.lock:
+            self.imagenes.pop(imagen["Id"], None)
+        for tag in imagen["RepoTags"]:
+            self.emitir("image", "untag", imagen["Id"], {"name": tag})
+        self.emitir("image", "delete", imagen["Id"], {"name": imagen["Id"]})
+
+    def eliminar_volumen(self, nombre: str) -> None:
+        with self.lock:
+            self.volumenes.pop(nombre, None)
+        self.emitir("volume", "destroy", nombre, {"driver": "local"})
+
+    def eliminar_red(self, red: Dict) -> None:
+        with self.lock:
+            self.redes.pop(red["Id"], None)
+        self.emitir("network", "destroy", red["Id"], {"name": red["Name"], "type": red["Driver"]})
+
+
+# ============================================================================
+# SERVIDOR HTTP
+# ============================================================================
+
+class _ErrorApi(Exception):
+    """Error con el formato de la API ({"message": ...})"""
+
+    def __init__(self, estado: int, mensaje: str):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+class _ManejadorApi(BaseHTTPRequestHandler):
+    """Traduce las peticiones HTTP de la API de Docker al EstadoEngine"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeDocker/" + API_VERSION
+
+    # Rutas: (método, expresión) -> nombre del método manejador
+    RUTAS = [
+        ("GET", r"/_ping", "_ping"),
+        ("HEAD", r"/_ping", "_ping"),
+        ("GET", r"/version", "_version"),
+        ("GET", r"/info", "_info"),
+        ("GET", r"/containers/json", "_contenedores"),
+        ("GET", r"/containers/(?P<ref>[^/]+)/json", "_inspeccionar_contenedor"),
+        ("POST", r"/containers/(?P<ref>[^/]+)/stop", "_detener_contenedor"),
+        ("POST", r"/containers/(?P<ref>[^/]+)/start", "_iniciar_contenedor"),
+        ("DELETE", r"/containers/(?P<ref>[^/]+)", "_eliminar_contenedor"),
+        ("GET", r"/images/json", "_imagenes"),
+        ("GET", r"/images/(?P<ref>.+)/json", "_inspeccionar_imagen"),
+        ("DELETE", r"/images/(?P<ref>.+)", "_eliminar_imagen"),
+        ("GET", r"/volumes", "_volumenes"),
+        ("DELETE", r"/volumes/(?P<ref>[^/]+)", "_eliminar_volumen"),
+        ("GET", r"/networks", "_redes"),
+        ("DELETE", r"/networks/(?P<ref>[^/]+)", "_eliminar_red"),
+        ("GET", r"/events", "_eventos"),
+        ("GET", r"/system/df", "_uso_disco"),
+    ]
+    _RUTAS_COMPILADAS = [(m, re.compile(f"^{r}$"), h) for m, r, h in RUTAS]
+
+    # Sin registro por petición y sin dirección remota (socket unix)
+    def log_message(self, formato, *args) -> None:
+        pass
+
+    def address_string(self) -> str:
+        return "unix"
+
+    @property
+    def estado(self) -> EstadoEngine:
+        return self.server.estado
+
+    def do_GET(self):
+        self._despachar("GET")
+
+    def do_HEAD(self):
+        self._despachar("HEAD")
+
+    def do_POST(self):
+        self._despachar("POST")
+
+    def do_DELETE(self):
+        self._despachar("DELETE")
+
+    def _despachar(self, metodo: str) -> None:
+        url = urlparse(self.path)
+        # Quitar el prefijo de versión (/v1.43/...)
+        ruta = re.sub(r"^/v[\d.]+", "", unquote(url.path))
+        self.query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        # Descartar el cuerpo de la petición si lo hay
+        longitud = int(self.headers.get("Content-Length") or 0)
+        if longitud:
+            self.rfile.read(longitud)
+
+        self.server.esperar_latencia()
+
+        for metodo_ruta, expresion, manejador in self._RUTAS_COMPILADAS:
+            coincidencia = expresion.match(ruta)
+            if metodo_ruta == metodo and coincidencia:
+                try:
+                    getattr(self, manejador)(**coincidencia.groupdict())
+                except _ErrorApi as e:
+                    self._json({"message": str(e)}, e.estado)
+                return
+        self._json({"message": f"page not found: {metodo} {ruta}"}, 404)
+
+    def _filtros(self) -> Dict:
+        try:
+            return json.loads(self.query.get("filters") or "{}")
+        except ValueError:
+            raise _ErrorApi(400, "invalid filters")
+
+    def _responder(self, cuerpo: bytes, estado: int = 200, tipo: str = "application/json") -> None:
+        self.send_response(estado)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Api-Version", API_VERSION)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(cuerpo)
+
+    def _json(self, datos, estado: int = 200) -> None:
+        self._responder(json.dumps(datos).encode("utf-8"), estado)
+
+    def _sin_contenido(self) -> None:
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    # ------------------------------------------------------------------
+    # Sistema
+    # ------------------------------------------------------------------
+
+    def _ping(self):
+        self._responder(b"OK", tipo="text/plain")
+
+    def _version(self):
+        self._json({
+            "Version": "24.0.0-fake",
+            "ApiVersion": API_VERSION,
+            "MinAPIVersion": "1.12",
+            "Os": "linux",
+            "Arch": "amd64",
+            "GoVersion": "go1.20",
+        })
+
+    def _info(self):
+        with self.estado.lock:
+            contenedores = list(self.estado.contenedores.values())
+        self._json({
+            "ID": "fake-docker-engine",
+            "Containers": len(contenedores),
+            "ContainersRunning": sum(c["State"] == "running" for c in contenedores),
+            "Images": len(self.estado.imagenes),
+            "ServerVersion": "24.0.0-fake",
+            "Name": "fake-docker",
+        })
+
+    def _uso_disco(self):
+        with self.estado.lock:
+            datos = self.estado.uso_disco()
+        self._json(datos)
+
+    # ------------------------------------------------------------------
+    # Contenedores
+    # ------------------------------------------------------------------
+
+    def _contenedor(self, ref: str) -> Dict:
+        contenedor = self.estado.buscar_contenedor(ref)
+        if contenedor is None:
+            raise _ErrorApi(404, f"No such container: {ref}")
+        return contenedor
+
+    def _contenedores(self):
+        todos = self.query.get("all") in ("1", "true", "True")
+        filtros = self._filtros()
+        estado = self.estado
+        with estado.lock:
+            if not filtros:
+                cuerpo = estado.cache(f"containers:{todos}", lambda: estado.listar_contenedores(todos, {}))
+            else:
+                cuerpo = json.dumps(estado.listar_contenedores(todos, filtros)).encode("utf-8")
+        self._responder(cuerpo)
+
+    def _inspeccionar_contenedor(self, ref: str):
+        with self.estado.lock:
+            datos = self.estado.inspeccionar_contenedor(self._contenedor(ref))
+        self._json(datos)
+
+    def _detener_contenedor(self, ref: str):
+        if self.estado.detener_contenedor(self._contenedor(ref)):
+            self._sin_contenido()
+        else:
+            self._responder(b"", 304)
+
+    def _iniciar_contenedor(self, ref: str):
+        if self.estado.iniciar_contenedor(self._contenedor(ref)):
+            self._sin_contenido()
+        else:
+            self._responder(b"", 304)
+
+    def _eliminar_contenedor(self, ref: str):
+        contenedor = self._contenedor(ref)
+        forzar = self.query.get("force") in ("1", "true", "True")
+        if contenedor["State"] == "running":
+            if not forzar:
+                raise _ErrorApi(409, f"You cannot remove a running container {contenedor['Id']}")
+            self.estado.detener_contenedor(contenedor)
+        self.estado.eliminar_contenedor(contenedor)
+        self._sin_contenido()
+
+    # ------------------------------------------------------------------
+    # Imágenes, volúmenes y redes
+    # ------------------------------------------------------------------
+
+    def _imagenes(self):
+        filtros = self._filtros()
+        estado = self.estado
+        with estado.lock:
+            if not filtros:
+                cuerpo = estado.cache("images", lambda: estado.listar_imagenes({}))
+            else:
+                cuerpo = json.dumps(estado.listar_imagenes(filtros)).encode("utf-8")
+        self._responder(cuerpo)
+
+    def _inspeccionar_imagen(self, ref: str):
+        with self.estado.lock:
+            imagen = self.estado.buscar_imagen(ref)
+            if imagen is None:
+                raise _ErrorApi(404, f"No such image: {ref}")
+            datos = dict(imagen, Config={"Labels": imagen["Labels"]})
+        self._json(datos)
+
+    def _eliminar_imagen(self, ref: str):
+        imagen = self.estado.buscar_imagen(ref)
+        if imagen is None:
+            raise _ErrorApi(404, f"No such image: {ref}")
+        with self.estado.lock:
+            en_uso = any(c["ImageID"] == imagen["Id"] for c in self.estado.contenedores.values())
+        if en_uso and self.query.get("force") not in ("1", "true", "True"):
+            raise _ErrorApi(409, f"conflict: unable to remove {ref} (image is being used)")
+        self.estado.eliminar_imagen(imagen)
+        self._json([{"Untagged": tag} for tag in imagen["RepoTags"]] + [{"Deleted": imagen["Id"]}])
+
+    def _volumenes(self):
+        filtros = self._filtros()
+        with self.estado.lock:
+            datos = {"Volumes": self.estado.listar_volumenes(filtros), "Warnings": []}
+        self._json(datos)
+
+    def _eliminar_volumen(self, ref: str):
+        if ref not in self.estado.volumenes:
+            raise _ErrorApi(404, f"get {ref}: no such volume")
+        self.estado.eliminar_volumen(ref)
+        self._sin_contenido()
+
+    def _redes(self):
+        filtros = self._filtros()
+        with self.estado.lock:
+            datos = self.estado.listar_redes(filtros)
+        self._json(datos)
+
+    def _eliminar_red(self, ref: str):
+        red = self.estado.buscar_red(ref)
+        if red is None:
+            raise _ErrorApi(404, f"network {ref} not found")
+        self.estado.eliminar_red(red)
+        self._sin_contenido()
+
+    # ------------------------------------------------------------------
+    # Eventos (respuesta chunked que queda abierta)
+    # ------------------------------------------------------------------
+
+    def _eventos(self):
+        since = self.query.get("since")
+        until = self.query.get("until")
+        tipos = _valores_filtro(self._filtros(), "type")
+        cola = self.estado.suscribir(int(float(since)) if since else None)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.close_connection = True
+
+        limite = float(until) if until else None
+        try:
+            while not self.server.detenido.is_set():
+                if limite is not None and time.time() >= limite:
+                    break
+                try:
+                    evento = cola.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if tipos and evento["Type"] not in tipos:
+                    continue
+                datos = json.dumps(evento).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(datos):x}\r\n".encode("ascii") + datos + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            # El cliente cerró el stream
+            pass
+        finally:
+            self.estado.desuscribir(cola)
+
+
+class FakeDockerEngine(socketserver.ThreadingUnixStreamServer):
+    """
+    Docker Engine simulado sobre un socket unix.
+
+    Ejemplo:
+        engine = FakeDockerEngine("/tmp/fake.sock", generar_fixture(contenedores=10000))
+        engine.iniciar()
+        cliente = docker.DockerClient(base_url=engine.base_url)
+    """
+
+    daemon_threads = True
+
+    def __init__(self, ruta: str = SOCKET_POR_DEFECTO, fixture: Optional[Dict] = None,
+                 latencia_ms: float = 0.0, jitter_ms: float = 0.0):
+        """
+        Args:
+            ruta: Ruta del socket unix
+            fixture: Estado inicial (por defecto generar_fixture())
+            latencia_ms: Latencia fija agregada a cada petición
+            jitter_ms: Variación aleatoria adicional (0..jitter_ms)
+        """
+        self.ruta = Path(ruta)
+        if self.ruta.exists():
+            self.ruta.unlink()
+        self.estado = EstadoEngine(fixture or generar_fixture())
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.detenido = threading.Event()
+        self._hilos: List[threading.Thread] = []
+        super().__init__(str(self.ruta), _ManejadorApi)
+
+    @property
+    def base_url(self) -> str:
+        """URL para DOCKER_HOST o docker.DockerClient(base_url=...)"""
+        return f"unix://{self.ruta}"
+
+    def esperar_latencia(self) -> None:
+        """Aplica la latencia configurada a una petición"""
+        demora = self.latencia_ms + (random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if demora > 0:
+            time.sleep(demora / 1000)
+
+    def iniciar(self, churn: float = 0.0) -> "FakeDockerEngine":
+        """
+        Atiende peticiones en un hilo de fondo.
+
+        Args:
+            churn: Eventos sintéticos por segundo (contenedores de relleno
+                que se detienen y arrancan)
+        """
+        hilo = threading.Thread(target=self.serve_forever, name="fake-docker", daemon=True)
+        hilo.start()
+        self._hilos.append(hilo)
+        if churn > 0:
+            hilo = threading.Thread(target=self._generar_churn, args=(churn,), name="fake-docker-churn", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+        return self
+
+    def detener(self) -> None:
+        """Detiene el servidor y elimina el socket"""
+        self.detenido.set()
+        self.shutdown()
+        self.server_close()
+        try:
+            self.ruta.unlink()
+        except OSError:
+            pass
+
+    def _generar_churn(self, por_segundo: float) -> None:
+        """Detiene/arranca contenedores de relleno al azar"""
+        aleatorio = random.Random(1)
+        with self.estado.lock:
+            relleno = [c for c in self.estado.contenedores.values() if c["Names"][0].startswith("/relleno_")]
+        while relleno and not self.detenido.wait(1.0 / por_segundo):
+            contenedor = aleatorio.choice(relleno)
+            if contenedor["State"] == "running":
+                self.estado.detener_contenedor(contenedor)
+            else:
+                self.estado.iniciar_contenedor(contenedor)
+
+
+def _opcion(args: List[str], nombre: str, defecto: str) -> str:
+    """Valor de una opción '--nombre valor' de la línea de comandos"""
+    if nombre in args and args.index(nombre) + 1 < len(args):
+        return args[args.index(nombre) + 1]
+    return defecto
+
+
+def main():
+    """Inicia el engine simulado en primer plano"""
+    args = sys.argv[1:]
+    if "-h" in args or "--help" in args:
+        print(__doc__)
+        sys.exit(0)
+
+    try:
+        ruta = _opcion(args, "--socket", SOCKET_POR_DEFECTO)
+        fixture = generar_fixture(
+            contenedores=int(_opcion(args, "--contenedores", "100")),
+            imagenes=int(_opcion(args, "--imagenes", "20")),
+            redes=int(_opcion(args, "--redes", "5")),
+            volumenes=int(_opcion(args, "--volumenes", "10")),
+            semilla=int(_opcion(args, "--semilla", "0")),
+        )
+        latencia = float(_opcion(args, "--latencia-ms", "0"))
+        jitter = float(_opcion(args, "--jitter-ms", "0"))
+        churn = float(_opcion(args, "--churn", "0"))
+    except ValueError as e:
+        print(f"❌ Parámetro inválido: {e}")
+        sys.exit(1)
+
+    engine = FakeDockerEngine(ruta, fixture, latencia, jitter)
+    print(f"🐳 Docker Engine simulado: {len(fixture['contenedores'])} contenedores, "
+          f"{len(fixture['imagenes'])} imágenes, {len(fixture['redes'])} redes, "
+          f"{len(fixture['volumenes'])} volúmenes")
+    print(f"   Latencia: {latencia} ms (+{jitter} ms) | Churn: {churn} eventos/s")
+    print(f"\n   export DOCKER_HOST={engine.base_url}\n")
+
+    engine.iniciar(churn)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.detener()
+        print("\n👋 Engine detenido")
+
+
+if __name__ == "__main__":
+    main()
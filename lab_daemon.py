@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Docker CTF Lab - Daemon del Laboratorio
+Proceso residente (opcional) que mantiene un DockerChallenge ya inicializado
+(cliente Docker, watcher de eventos, sesión MQTT y pack compilado) y atiende
+los comandos del CLI por un socket unix.
+
+Protocolo: una línea JSON por petición y por respuesta.
+    -> {"args": ["submit", "FLAG{...}"]}
+    <- {"codigo": 0, "salida": "..."}
+"""
+
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional
+
+# Socket por defecto (uno por usuario)
+SOCKET_POR_DEFECTO = Path.home() / ".docker_ctf_lab.sock"
+
+# Tamaño máximo de una petición (una línea JSON)
+MAX_PETICION = 64 * 1024
+
+
+def ruta_socket() -> Path:
+    """Ruta del socket del daemon (configurable con DOCKER_CTF_DAEMON_SOCKET)"""
+    return Path(os.getenv("DOCKER_CTF_DAEMON_SOCKET") or SOCKET_POR_DEFECTO)
+
+
+# ============================================================================
+# CLIENTE (usado por docker_challenge.py)
+# ============================================================================
+
+def _conectar(ruta: Path, timeout: Optional[float]) -> Optional[socket.socket]:
+    """Conecta con el daemon; None si no está corriendo"""
+    if not ruta.exists():
+        return None
+    conexion = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    conexion.settimeout(timeout)
+    try:
+        conexion.connect(str(ruta))
+        return conexion
+    except OSError:
+        # Socket huérfano de un daemon que ya no corre
+        conexion.close()
+        return None
+
+
+def _peticion(conexion: socket.socket, datos: dict) -> dict:
+    """Envía una petición y lee la respuesta (una línea JSON cada una)"""
+    conexion.sendall(json.dumps(datos).encode("utf-8") + b"\n")
+    with conexion.makefile("rb") as f:
+        linea = f.readline()
+    if not linea:
+        raise ConnectionError("el daemon cerró la conexión")
+    return json.loads(linea)
+
+
+def enviar_comando(args: List[str], ruta=None, timeout: Optional[float] = 120.0) -> Optional[int]:
+    """
+    Ejecuta un comando del CLI en el daemon, si está corriendo.
+
+    Args:
+        args: Argumentos del comando (ej: ["submit", "FLAG{...}"])
+        ruta: Socket del daemon (por defecto ruta_socket())
+        timeout: Segundos máximos de espera de la respuesta
+
+    Returns:
+        Código de salida del comando, o None si el daemon no está disponible
+        (el CLI debe ejecutarlo en su propio proceso)
+    """
+    if os.getenv("DOCKER_CTF_DAEMON", "true").lower() != "true":
+        return None
+
+    conexion = _conectar(Path(ruta or ruta_socket()), timeout)
+    if conexion is None:
+        return None
+
+    try:
+        respuesta = _peticion(conexion, {"args": list(args)})
+    except (OSError, ValueError) as e:
+        # La petición ya pudo ejecutarse: no se repite en el proceso local
+        print(f"❌ Error comunicándose con el daemon del laboratorio: {e}")
+        return 1
+    finally:
+        conexion.close()
+
+    if "error" in respuesta:
+        print(f"❌ {respuesta['error']}")
+        return 1
+
+    sys.stdout.write(respuesta.get("salida", ""))
+    sys.stdout.flush()
+    return int(respuesta.get("codigo", 0))
+
+
+# ============================================================================
+# SERVIDOR
+# ============================================================================
+
+class SalidaPorHilo(io.TextIOBase):
+    """
+    Reemplazo de sys.stdout que envía lo impreso por cada hilo a su propio
+    destino: la salida de un comando va a la respuesta de su cliente, y lo
+    que imprimen otros hilos (watcher de eventos, outbox MQTT, otras
+    conexiones) sigue yendo a la salida del daemon.
+    """
+
+    def __init__(self, original):
+        self.original = original
+        self._local = threading.local()
+
+    def _destino(self):
+        destino = getattr(self._local, "destino", None)
+        return self.original if destino is None else destino
+
+    @property
+    def encoding(self) -> str:
+        return getattr(self.original, "encoding", None) or "utf-8"
+
+    def isatty(self) -> bool:
+        return self._destino().isatty()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, texto: str) -> int:
+        return self._destino().write(texto)
+
+    def flush(self) -> None:
+        self._destino().flush()
+
+    @contextmanager
+    def capturar(self, destino):
+        """Envía a 'destino' lo que imprima el hilo actual dentro del bloque"""
+        self._local.destino = destino
+        try:
+            yield destino
+        finally:
+            self._local.destino = None
+
+
+class _ManejadorComandos(socketserver.StreamRequestHandler):
+    """Atiende las peticiones (una línea JSON cada una) de una conexión"""
+
+    def handle(self) -> None:
+        while True:
+            linea = self.rfile.readline(MAX_PETICION)
+            if not linea:
+                return
+            peticion = {}
+            try:
+                peticion = json.loads(linea)
+                if not isinstance(peticion, dict):
+                    raise ValueError(peticion)
+                respuesta = self.server.atender(peticion)
+            except ValueError:
+                respuesta = {"error": "Petición inválida"}
+            except Exception as e:
+                # Cualquier otro error también se responde: el cliente no queda esperando
+                respuesta = {"error": f"Error interno del daemon: {e}"}
+            try:
+                self.wfile.write(json.dumps(respuesta, ensure_ascii=False).encode("utf-8") + b"\n")
+                self.wfile.flush()
+            except OSError:
+                return  # El cliente se desconectó
+
+            if respuesta.get("codigo") == 0 and peticion.get("op") == "detener":
+                self.server.detener()
+                return
+
+
+class LabDaemon(socketserver.ThreadingUnixStreamServer):
+    """
+    Servidor del daemon: cada conexión se atiende en su hilo, pero los
+    comandos se ejecutan de a uno (comparten la instancia). Lo que imprime
+    cada comando se captura por hilo con SalidaPorHilo.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, ruta: Path, challenge, ejecutar_comando, comandos):
+        """
+        Args:
+            ruta: Ruta del socket unix
+            challenge: Instancia de DockerChallenge ya inicializada
+            ejecutar_comando: Función (challenge, args) -> código de salida
+            comandos: Comandos permitidos
+        """
+        self.ruta = Path(ruta)
+        self.challenge = challenge
+        self.ejecutar_comando = ejecutar_comando
+        self.comandos = comandos
+        self.lock = threading.Lock()
+
+        # Instalado una sola vez: sys.stdout no se reemplaza en cada petición
+        if isinstance(sys.stdout, SalidaPorHilo):
+            self.salida = sys.stdout
+        else:
+            self.salida = sys.stdout = SalidaPorHilo(sys.stdout)
+
+        # Socket accesible solo por el usuario dueño
+        mascara = os.umask(0o077)
+        try:
+            super().__init__(str(self.ruta), _ManejadorComandos)
+        finally:
+            os.umask(mascara)
+
+    def detener(self) -> None:
+        """Deja de aceptar clientes (el CLI vuelve a ejecutar en su proceso) y termina"""
+        try:
+            self.ruta.unlink()
+        except OSError:
+            pass
+        threading.Thread(target=self.shutdown, daemon=True).start()
+
+    def atender(self, peticion: dict) -> dict:
+        """Ejecuta una petición y devuelve la respuesta"""
+        if peticion.get("op") == "ping":
+            return {"codigo": 0, "pid": os.getpid(), "documento": self.challenge.documento_estudiante}
+
+        if peticion.get("op") == "detener":
+            # El manejador detiene el servidor después de responder
+            return {"codigo": 0}
+
+        args = peticion.get("args")
+        if not isinstance(args, list) or not args or not all(isinstance(a, str) for a in args):
+            return {"error": "Petición inválida"}
+        if args[0].lower() not in self.comandos:
+            return {"error": f"Comando no soportado por el daemon: {args[0]}"}
+
+        salida = io.StringIO()
+        with self.lock:
+            # Traer cambios de otros procesos (setup, dashboard) antes de responder
+            self.challenge.refrescar_progreso()
+            with self.salida.capturar(salida):
+                try:
+                    codigo = self.ejecutar_comando(self.challenge, args)
+                except Exception as e:
+                    print(f"❌ Error ejecutando el comando: {e}")
+                    codigo = 1
+        return {"codigo": codigo, "salida": salida.getvalue()}
+
+
+def _socket_en_uso(ruta: Path) -> bool:
+    """True si hay otro daemon atendiendo en el socket"""
+    conexion = _conectar(ruta, 1.0)
+    if conexion is None:
+        return False
+    conexion.close()
+    return True
+
+
+def iniciar_daemon(ruta=None) -> int:
+    """
+    Inicia el daemon en primer plano hasta recibir SIGINT/SIGTERM.
+
+    Returns:
+        Código de salida
+    """
+    from docker_challenge import COMANDOS_DAEMON, DockerChallenge, ejecutar_comando
+
+    ruta = Path(ruta or ruta_socket())
+    if _socket_en_uso(ruta):
+        print(f"⚠️  El daemon ya está corriendo en {ruta}")
+        return 1
+    if ruta.exists():
+        ruta.unlink()
+
+    print("🚀 Iniciando daemon del Docker CTF Lab...")
+    challenge = DockerChallenge()
+
+    # Calentar Docker (cliente + watcher de eventos) y la sesión MQTT
+    if challenge.docker_client and os.getenv("DOCKER_CTF_WATCHER", "true").lower() == "true":
+        challenge.iniciar_watcher()
+    if challenge.mqtt_config["enabled"] and challenge.documento_estudiante:
+        challenge.send_heartbeat()
+
+    servidor = LabDaemon(ruta, challenge, ejecutar_comando, COMANDOS_DAEMON)
+
+    def _terminar(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, _terminar)
+
+    print(f"✅ Daemon escuchando en {ruta} (PID {os.getpid()})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        try:
+            ruta.unlink()
+        except OSError:
+            pass
+        if challenge.docker_watcher is not None:
+            challenge.docker_watcher.detener()
+        challenge.cerrar()
+        print("\n👋 Daemon detenido")
+    return 0
+
+
+def main():
+    """CLI del daemon"""
+    accion = sys.argv[1].lower() if len(sys.argv) > 1 else "iniciar"
+    ruta = ruta_socket()
+
+    if accion == "iniciar":
+        sys.exit(iniciar_daemon(ruta))
+
+    conexion = _conectar(ruta, 5.0)
+    if conexion is None:
+        print("⚪ El daemon no está corriendo")
+        sys.exit(1 if accion == "detener" else 0)
+
+    try:
+        if accion == "estado":
+            respuesta = _peticion(conexion, {"op": "ping"})
+            print(f"🟢 Daemon activo (PID {respuesta.get('pid')}) en {ruta}")
+            print(f"👤 Estudiante: {respuesta.get('documento') or '(sin configurar)'}")
+        elif accion == "detener":
+            _peticion(conexion, {"op": "detener"})
+            print("✅ Daemon detenido")
+        else:
+            print("Uso: python3 lab_daemon.py [iniciar|estado|detener]")
+            sys.exit(1)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error comunicándose con el daemon: {e}")
+        sys.exit(1)
+    finally:
+        conexion.close()
+
+
+if __name__ == "__main__":
+    main()
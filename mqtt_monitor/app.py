@@ -13,13 +13,22 @@ Características que debe incluir:
 """
 
 from flask import Flask, render_template, jsonify, request
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 import paho.mqtt.client as mqtt
-import json
+import atexit
 import os
+import threading
+import time
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
+from event_log import EventLog
+from event_store import EventStore
+from fanout import ROOM_OVERVIEW, ROOM_STUDENT_PREFIX, FanoutHub, valid_room
+from ingestion import IngestionPipeline
+from presence import PresenceScheduler
+from stats import ClassStats
+
 # Cargar variables de entorno
 load_dotenv()
 
@@ -28,15 +37,46 @@ MQTT_BROKER = os.getenv('MQTT_BROKER', 'broker.hivemq.com')
 MQTT_PORT = int(os.getenv('MQTT_PORT', 1883))
 MQTT_TOPIC = os.getenv('MQTT_TOPIC', 'docker_ctf_lab/+/+')
 HEARTBEAT_TIMEOUT = int(os.getenv('HEARTBEAT_TIMEOUT', 90))
+PRESENCE_TICK = float(os.getenv('PRESENCE_TICK', 1.0))
+FANOUT_INTERVAL = float(os.getenv('FANOUT_INTERVAL', 0.25))
+INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', 10000))
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 500))
+EVENT_LOG_SIZE = int(os.getenv('EVENT_LOG_SIZE', 100000))
+EVENTS_MAX_LIMIT = 1000
+# Puntaje máximo del ranking: los puntos de los heartbeats se acotan a este valor
+MAX_POINTS = int(os.getenv('MAX_POINTS', 1000))
+
+# Persistencia: 'sqlite' guarda eventos y snapshots; 'memory' no guarda nada
+DATABASE_TYPE = os.getenv('DATABASE_TYPE', 'sqlite').lower()
+DATABASE_PATH = os.getenv('DATABASE_PATH', './monitor.db')
+EVENT_RETENTION_HOURS = float(os.getenv('EVENT_RETENTION_HOURS', 72))
+SNAPSHOT_EVERY = int(os.getenv('SNAPSHOT_EVERY', 5000))
 
 # Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
 socketio = SocketIO(app, cors_allowed_origins="*")
 
-# Almacenamiento en memoria (implementar persistencia según especificaciones)
+# Estado en memoria; con DATABASE_TYPE=sqlite se reconstruye al iniciar
+# desde el último snapshot más los eventos posteriores (ver restore_state)
 students_data = {}
-recent_events = []
+event_log = EventLog(EVENT_LOG_SIZE)
+event_store = EventStore(DATABASE_PATH, EVENT_RETENTION_HOURS) if DATABASE_TYPE == 'sqlite' else None
+_snapshot_state = {'pending': 0}
+
+# Agregados y ranking mantenidos evento a evento (ver stats.py)
+class_stats = ClassStats(MAX_POINTS)
+
+# Plazos de heartbeat de los estudiantes online: un tick en segundo plano
+# pasa a offline a los vencidos y lo avisa en los lotes WebSocket (ver presence.py)
+presence = PresenceScheduler(HEARTBEAT_TIMEOUT)
+
+# Actualizaciones a los clientes WebSocket: se agrupan por sala y se envían
+# en un lote cada FANOUT_INTERVAL segundos (ver fanout.py y fanout_loop)
+fanout = FanoutHub()
+
+# El hilo de ingesta modifica el estado mientras las rutas lo leen
+state_lock = threading.RLock()
 
 
 # ============================================================================
@@ -54,43 +94,160 @@ def on_mqtt_connect(client, userdata, flags, rc):
 
 
 def on_mqtt_message(client, userdata, msg):
-    """Callback cuando llega un mensaje MQTT"""
+    """
+    Callback cuando llega un mensaje MQTT: solo lo encola. El hilo de ingesta
+    lo decodifica y procesa (ver process_events) sin frenar la red de paho.
+    """
+    ingestion.submit(msg.topic, msg.payload)
+
+
+def process_events(events):
+    """
+    Aplica un lote de eventos decodificados por el pipeline de ingesta y lo
+    guarda en el event store en una sola transacción.
+    """
+    stored = []
+    for event in events:
+        try:
+            stored.append(process_event(event))
+        except Exception as e:
+            print(f"❌ Error procesando mensaje MQTT: {e}")
+    
+    if event_store is None or not stored:
+        return
     try:
-        topic_parts = msg.topic.split('/')
-        documento = topic_parts[1]
-        event_type = topic_parts[2]
-        
-        payload = json.loads(msg.payload.decode())
-        
-        # Agregar a eventos recientes
-        event = {
-            'timestamp': datetime.now().isoformat(),
-            'documento': documento,
-            'type': event_type,
-            'data': payload
-        }
-        recent_events.insert(0, event)
-        
-        # Mantener solo los últimos 100 eventos
-        if len(recent_events) > 100:
-            recent_events.pop()
-        
-        # Procesar según tipo de evento
-        if event_type == 'heartbeat':
-            handle_heartbeat(documento, payload)
-        elif event_type == 'progress':
-            handle_progress(documento, payload)
-        elif event_type == 'flag_submit':
-            handle_flag_submit(documento, payload)
-        
-        # Emitir evento via WebSocket
-        socketio.emit(event_type, event, broadcast=True)
-        
+        event_store.append_batch(stored)
     except Exception as e:
-        print(f"❌ Error procesando mensaje MQTT: {e}")
+        print(f"❌ Error guardando eventos: {e}")
+        return
+    
+    _snapshot_state['pending'] += len(stored)
+    if _snapshot_state['pending'] >= SNAPSHOT_EVERY:
+        save_snapshot()
+
+
+def process_event(event):
+    """Procesa un evento MQTT ya decodificado"""
+    with state_lock:
+        # Agregar al registro de eventos (le asigna su seq)
+        event = event_log.append(event)
+        apply_event(event)
+    
+    # Acumular para el próximo lote WebSocket
+    fanout.event(event)
+    fanout.student_changed(event['documento'])
+    return event
+
+
+def apply_event(event, live=True):
+    """
+    Actualiza el estado de los estudiantes según el tipo de evento (con
+    state_lock tomado). Con live=False (reconstrucción al iniciar) no se
+    emiten notificaciones ni se imprime nada.
+    """
+    documento = event['documento']
+    payload = event['data']
+    timestamp = event['timestamp']
+    event_type = event['type']
+    
+    if event_type == 'heartbeat':
+        handle_heartbeat(documento, payload, timestamp, live)
+    elif event_type == 'progress':
+        handle_progress(documento, payload, timestamp, live)
+    elif event_type == 'flag_submit':
+        handle_flag_submit(documento, payload, timestamp, live)
+    elif event_type == 'flag_submit_batch':
+        handle_flag_submit_batch(documento, payload, timestamp, live)
+    
+    record = students_data.get(documento)
+    if record is not None:
+        if event_type == 'heartbeat':
+            came_online = presence.touch(documento, datetime.fromisoformat(timestamp).timestamp())
+            class_stats.update(documento, record, online=True)
+            if came_online and live:
+                fanout.status_change(documento, _status_change(documento, record))
+        else:
+            class_stats.update(documento, record)
+
+
+def _status_change(documento, record):
+    """Cambio online/offline (status_changes del lote) con los contadores actualizados"""
+    total = len(students_data)
+    return {
+        'documento': documento,
+        'status': record['status'],
+        'last_seen': record.get('last_seen'),
+        'online_students': len(presence),
+        'offline_students': total - len(presence),
+        'timestamp': datetime.now().isoformat()
+    }
 
 
-def handle_heartbeat(documento, payload):
+def expire_presence(live=True):
+    """
+    Pasa a offline a los estudiantes sin heartbeat en HEARTBEAT_TIMEOUT
+    segundos y agrega cada cambio al próximo lote WebSocket (si live).
+    """
+    with state_lock:
+        for documento in presence.expire(time.time()):
+            record = students_data[documento]
+            record['status'] = 'offline'
+            class_stats.set_online(documento, False)
+            if live:
+                fanout.status_change(documento, _status_change(documento, record))
+
+
+def presence_loop():
+    """Tick en segundo plano de la detección de offline"""
+    while True:
+        socketio.sleep(PRESENCE_TICK)
+        try:
+            expire_presence()
+        except Exception as e:
+            print(f"❌ Error actualizando estados online/offline: {e}")
+
+
+def fanout_loop():
+    """Envía cada FANOUT_INTERVAL segundos los cambios acumulados de cada sala"""
+    while True:
+        socketio.sleep(FANOUT_INTERVAL)
+        try:
+            for room, payload in build_batches(fanout.take()).items():
+                socketio.emit('batch', payload, to=room)
+        except Exception as e:
+            print(f"❌ Error enviando actualizaciones WebSocket: {e}")
+
+
+def build_batches(pending):
+    """
+    Arma el lote de cada sala: filas de los estudiantes que cambiaron (con su
+    último estado), estadísticas, notificaciones, cambios online/offline y,
+    en la sala de un estudiante, sus eventos.
+    """
+    if not pending:
+        return {}
+    batches = {}
+    with state_lock:
+        stats = dict(class_stats.summary(), total_events=event_log.last_seq)
+        for room, changes in pending.items():
+            batch = {
+                'students': [
+                    _student_row(doc, students_data[doc])
+                    for doc in changes.students if doc in students_data
+                ],
+                'notifications': list(changes.notifications),
+                'status_changes': list(changes.status_changes)
+            }
+            if room == ROOM_OVERVIEW:
+                batch['stats'] = stats
+            else:
+                batch['events'] = list(changes.events)
+                batch['rank'] = class_stats.rank(room[len(ROOM_STUDENT_PREFIX):])
+            batches[room] = batch
+    return batches
+
+
+def handle_heartbeat(documento, payload, timestamp, live=True):
     """Procesa un evento de heartbeat"""
     # TODO: Implementar lógica de heartbeat
     # - Actualizar last_seen
@@ -100,61 +257,139 @@ def handle_heartbeat(documento, payload):
     if documento not in students_data:
         students_data[documento] = {
             'documento': documento,
-            'first_seen': datetime.now().isoformat(),
+            'first_seen': timestamp,
             'completados': [],
             'events': []
         }
     
     students_data[documento].update({
-        'last_seen': datetime.now().isoformat(),
+        'last_seen': timestamp,
         'status': 'online',
         'completados_count': payload.get('completados', 0),
         'puntos': payload.get('puntos', 0)
     })
     
-    print(f"💓 Heartbeat de {documento}: {payload.get('completados', 0)} retos, {payload.get('puntos', 0)} pts")
+    if live:
+        print(f"💓 Heartbeat de {documento}: {payload.get('completados', 0)} retos, {payload.get('puntos', 0)} pts")
 
 
-def handle_progress(documento, payload):
+def handle_progress(documento, payload, timestamp, live=True):
     """Procesa un evento de progreso completo"""
     # TODO: Implementar lógica de progreso
     # - Actualizar retos completados
     # - Calcular estadísticas
-    # - Guardar en base de datos
     
     if documento in students_data:
         students_data[documento].update({
-            'last_progress': datetime.now().isoformat(),
+            'last_progress': timestamp,
             'completados': payload.get('retos_completados', []),
             'progreso_porcentaje': payload.get('progreso_porcentaje', 0)
         })
     
-    print(f"📊 Progreso de {documento}: {payload.get('progreso_porcentaje', 0)}%")
+    if live:
+        print(f"📊 Progreso de {documento}: {payload.get('progreso_porcentaje', 0)}%")
 
 
-def handle_flag_submit(documento, payload):
+def handle_flag_submit(documento, payload, timestamp, live=True):
     """Procesa un evento de flag enviada"""
     # TODO: Implementar lógica de flag submit
     # - Registrar reto completado
     # - Actualizar estadísticas
-    # - Emitir notificación
+    
+    if not live:
+        return
     
     reto_nombre = payload.get('reto_nombre', 'Unknown')
     puntos = payload.get('puntos_ganados', 0)
     
-    # Emitir notificación
+    # Notificación en el próximo lote WebSocket
     notification = {
         'type': 'flag_submitted',
         'documento': documento,
         'reto': reto_nombre,
         'puntos': puntos,
-        'timestamp': datetime.now().isoformat()
+        'timestamp': timestamp
     }
-    socketio.emit('notification', notification, broadcast=True)
+    fanout.notification(documento, notification)
     
     print(f"🎯 {documento} completó '{reto_nombre}' (+{puntos} pts)")
 
 
+def handle_flag_submit_batch(documento, payload, timestamp, live=True):
+    """Procesa un envío en lote: un solo evento con varios retos completados"""
+    for reto in payload.get('retos', []):
+        handle_flag_submit(documento, {
+            'reto_nombre': reto.get('reto_nombre', 'Unknown'),
+            'puntos_ganados': reto.get('puntos', 0)
+        }, timestamp, live)
+
+
+# ============================================================================
+# PERSISTENCIA
+# ============================================================================
+
+def save_snapshot():
+    """Guarda el estado de los estudiantes y aplica la retención de eventos"""
+    if event_store is None:
+        return
+    with state_lock:
+        seq = event_log.last_seq
+        state = {doc: dict(data) for doc, data in students_data.items()}
+        _snapshot_state['pending'] = 0
+    try:
+        event_store.save_snapshot(seq, state)
+        purged = event_store.purge()
+        if purged:
+            print(f"🧹 {purged} eventos anteriores a la retención eliminados")
+    except Exception as e:
+        print(f"❌ Error guardando snapshot: {e}")
+
+
+def restore_state():
+    """
+    Reconstruye el estado al iniciar: último snapshot + eventos posteriores,
+    y recarga el registro de eventos con los más recientes.
+    """
+    if event_store is None:
+        return
+    seq, state = event_store.latest_snapshot()
+    replayed = 0
+    with state_lock:
+        students_data.clear()
+        students_data.update(state or {})
+        class_stats.reset()
+        presence.clear()
+        for documento, record in students_data.items():
+            class_stats.update(documento, record, online=False)
+            if record.get('last_seen'):
+                presence.touch(documento, datetime.fromisoformat(record['last_seen']).timestamp())
+                record['status'] = 'online'
+                class_stats.set_online(documento, True)
+        for event in event_store.events_after(seq):
+            apply_event(event, live=False)
+            replayed += 1
+        for event in event_store.last_events(EVENT_LOG_SIZE):
+            event_log.append(event)
+        event_log.resume(event_store.last_seq())
+        _snapshot_state['pending'] = replayed
+    # Los que se desconectaron mientras el monitor estaba apagado
+    expire_presence(live=False)
+    print(f"💾 Estado restaurado: {len(students_data)} estudiantes "
+          f"(snapshot #{seq} + {replayed} eventos)")
+
+
+def shutdown():
+    """Procesa lo pendiente, guarda un snapshot y cierra la base"""
+    ingestion.stop()
+    if event_store is not None and _snapshot_state['pending']:
+        save_snapshot()
+    if event_store is not None:
+        event_store.close()
+
+
+# Pipeline de ingesta: cola acotada + hilo procesador por lotes
+ingestion = IngestionPipeline(process_events, max_queue=INGEST_QUEUE_SIZE, batch_size=INGEST_BATCH_SIZE)
+
 # Inicializar cliente MQTT
 mqtt_client = mqtt.Client()
 mqtt_client.on_connect = on_mqtt_connect
@@ -171,39 +406,32 @@ def index():
     return render_template('dashboard.html')
 
 
+def _student_row(documento, data):
+    """Fila de un estudiante para la tabla del dashboard"""
+    return {
+        'documento': documento,
+        'status': data.get('status', 'offline'),
+        'completados': data.get('completados_count', 0),
+        'puntos': data.get('puntos', 0),
+        'last_seen': data.get('last_seen'),
+        'progreso_porcentaje': data.get('progreso_porcentaje', 0)
+    }
+
+
 @app.route('/api/students')
 def get_students():
     """Obtener lista de todos los estudiantes"""
-    # TODO: Implementar lógica completa
-    # - Calcular estado online/offline
-    # - Ordenar por actividad reciente
-    # - Incluir estadísticas
-    
-    students = []
-    now = datetime.now()
-    
-    for doc, data in students_data.items():
-        last_seen = datetime.fromisoformat(data.get('last_seen', datetime.now().isoformat()))
-        is_online = (now - last_seen).total_seconds() < HEARTBEAT_TIMEOUT
-        
-        students.append({
-            'documento': doc,
-            'status': 'online' if is_online else 'offline',
-            'completados': data.get('completados_count', 0),
-            'puntos': data.get('puntos', 0),
-            'last_seen': data.get('last_seen'),
-            'progreso_porcentaje': data.get('progreso_porcentaje', 0)
-        })
+    with state_lock:
+        students = [_student_row(doc, data) for doc, data in students_data.items()]
     
     return jsonify(students)
 
 
 @app.route('/api/students/online')
 def get_online_students():
-    """Obtener solo estudiantes activos"""
-    # TODO: Filtrar solo estudiantes online
-    students = get_students().json
-    online = [s for s in students if s['status'] == 'online']
+    """Obtener solo estudiantes activos (el heartbeat más reciente primero)"""
+    with state_lock:
+        online = [_student_row(doc, students_data[doc]) for doc in presence.online()]
     return jsonify(online)
 
 
@@ -215,60 +443,123 @@ def get_student_detail(documento):
     # - Gráficos de progreso
     # - Tiempos promedio
     
-    if documento not in students_data:
-        return jsonify({'error': 'Student not found'}), 404
-    
-    return jsonify(students_data[documento])
+    with state_lock:
+        if documento not in students_data:
+            return jsonify({'error': 'Student not found'}), 404
+        
+        return jsonify(dict(students_data[documento], rank=class_stats.rank(documento)))
 
 
 @app.route('/api/statistics')
 def get_statistics():
-    """Obtener estadísticas globales"""
-    # TODO: Implementar cálculo de estadísticas
-    # - Total de estudiantes
-    # - Promedio de progreso
-    # - Distribución de completados
-    
-    total = len(students_data)
-    online = sum(1 for s in students_data.values() 
-                 if (datetime.now() - datetime.fromisoformat(s.get('last_seen', datetime.now().isoformat()))).total_seconds() < HEARTBEAT_TIMEOUT)
-    
-    stats = {
-        'total_students': total,
-        'online_students': online,
-        'offline_students': total - online,
-        'avg_progress': sum(s.get('progreso_porcentaje', 0) for s in students_data.values()) / total if total > 0 else 0,
-        'total_events': len(recent_events)
-    }
+    """
+    Obtener estadísticas globales: total, online/offline, promedio de
+    progreso e histograma de retos completados (mantenidos evento a evento)
+    """
+    with state_lock:
+        stats = class_stats.summary()
+    stats['total_events'] = event_log.last_seq
     
     return jsonify(stats)
 
 
 @app.route('/api/leaderboard')
 def get_leaderboard():
-    """Obtener ranking de estudiantes por puntos"""
-    # TODO: Implementar ranking
-    students = list(students_data.values())
-    students.sort(key=lambda x: x.get('puntos', 0), reverse=True)
+    """
+    Obtener ranking de estudiantes por puntos
     
-    leaderboard = [
-        {
-            'rank': i + 1,
-            'documento': s['documento'],
-            'puntos': s.get('puntos', 0),
-            'completados': s.get('completados_count', 0)
-        }
-        for i, s in enumerate(students)
-    ]
+    Query params:
+        limit: Cantidad de posiciones (100 por defecto, 1000 como máximo)
+        offset: Posición desde la que empezar (0 por defecto)
+    """
+    limit = min(max(request.args.get('limit', 100, type=int), 0), EVENTS_MAX_LIMIT)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    
+    with state_lock:
+        leaderboard = [
+            {
+                'rank': rank,
+                'documento': documento,
+                'puntos': puntos,
+                'completados': students_data[documento].get('completados_count', 0)
+            }
+            for rank, documento, puntos in class_stats.top(limit, offset)
+        ]
     
     return jsonify(leaderboard)
 
 
+@app.route('/api/leaderboard/<documento>')
+def get_student_rank(documento):
+    """Posición de un estudiante en el ranking"""
+    with state_lock:
+        rank = class_stats.rank(documento)
+        if rank is None:
+            return jsonify({'error': 'Student not found'}), 404
+        
+        return jsonify({
+            'rank': rank,
+            'documento': documento,
+            'puntos': class_stats.leaderboard.points(documento),
+            'total_students': len(class_stats.leaderboard)
+        })
+
+
+def _events_filters():
+    """Límite y filtros comunes de las rutas de eventos"""
+    limit = min(max(request.args.get('limit', 50, type=int), 0), EVENTS_MAX_LIMIT)
+    return limit, request.args.get('documento'), request.args.get('type')
+
+
 @app.route('/api/events/recent')
 def get_recent_events():
-    """Obtener eventos recientes"""
-    limit = request.args.get('limit', 50, type=int)
-    return jsonify(recent_events[:limit])
+    """Obtener eventos recientes (del más nuevo al más viejo)"""
+    limit, documento, event_type = _events_filters()
+    return jsonify(event_log.query(limit=limit, documento=documento, event_type=event_type))
+
+
+@app.route('/api/events')
+def get_events():
+    """
+    Historial de eventos paginado por cursor.
+    
+    Query params:
+        after_seq: Eventos posteriores a esta secuencia, en orden creciente
+        before_seq: Eventos anteriores a esta secuencia, del más nuevo al más viejo
+        limit: Máximo de eventos (50 por defecto, 1000 como máximo)
+        documento: Solo eventos de este estudiante
+        type: Solo eventos de este tipo (heartbeat, progress, flag_submit...)
+    """
+    limit, documento, event_type = _events_filters()
+    after_seq = request.args.get('after_seq', type=int)
+    before_seq = request.args.get('before_seq', type=int)
+    events = event_log.query(after_seq=after_seq, before_seq=before_seq, limit=limit,
+                             documento=documento, event_type=event_type)
+    
+    response = {'events': events, 'last_seq': event_log.last_seq}
+    if after_seq is not None:
+        # Para seguir el registro: pedir después del último devuelto
+        response['next_after_seq'] = events[-1]['seq'] if events else after_seq
+    elif len(events) == limit:
+        # Para retroceder en el historial
+        response['next_before_seq'] = events[-1]['seq']
+    return jsonify(response)
+
+
+@app.route('/api/events/stats')
+def get_events_stats():
+    """Tamaño del registro de eventos y rango de secuencias disponible"""
+    return jsonify(event_log.stats())
+
+
+@app.route('/api/ingestion/stats')
+def get_ingestion_stats():
+    """Profundidad de la cola de ingesta MQTT y mensajes descartados"""
+    stats = ingestion.stats()
+    stats['fanout'] = fanout.stats()
+    if event_store is not None:
+        stats['store'] = event_store.stats()
+    return jsonify(stats)
 
 
 # ============================================================================
@@ -285,15 +576,56 @@ def handle_connect():
 @socketio.on('disconnect')
 def handle_disconnect():
     """Cliente WebSocket desconectado"""
+    fanout.drop(request.sid)
     print(f"🔌 Cliente WebSocket desconectado: {request.sid}")
 
 
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    """
+    Suscribe al cliente a una vista: {'room': 'overview'} o
+    {'room': 'student:<documento>'}. Responde con 'snapshot' (el estado
+    completo de la vista); luego recibe 'batch' con los cambios.
+    """
+    room = (data or {}).get('room', '')
+    if not valid_room(room):
+        emit('error', {'message': f'Sala inválida: {room}'})
+        return
+    
+    join_room(room)
+    fanout.join(request.sid, room)
+    
+    with state_lock:
+        if room == ROOM_OVERVIEW:
+            snapshot = {
+                'students': [_student_row(doc, data) for doc, data in students_data.items()],
+                'stats': dict(class_stats.summary(), total_events=event_log.last_seq)
+            }
+        else:
+            documento = room[len(ROOM_STUDENT_PREFIX):]
+            record = students_data.get(documento)
+            snapshot = {
+                'student': dict(record, rank=class_stats.rank(documento)) if record else None,
+                'events': event_log.query(limit=50, documento=documento)
+            }
+    emit('snapshot', dict(snapshot, room=room))
+
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data):
+    """Deja de recibir los lotes de una vista"""
+    room = (data or {}).get('room', '')
+    leave_room(room)
+    fanout.leave(request.sid, room)
+
+
 # ============================================================================
 # MAIN
 # ============================================================================
 
 def start_mqtt():
     """Iniciar cliente MQTT en background"""
+    ingestion.start()
     try:
         mqtt_client.connect(MQTT_BROKER, MQTT_PORT, 60)
         mqtt_client.loop_start()
@@ -310,13 +642,21 @@ if __name__ == '__main__':
     print(f"🌐 Web Server: http://0.0.0.0:{os.getenv('FLASK_PORT', 5001)}")
     print("="*60)
     
-    # Iniciar MQTT
-    start_mqtt()
+    debug = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
+    
+    # Con debug, el reloader ejecuta este bloque en dos procesos: solo el hijo
+    # (el que atiende) reconstruye el estado, escribe la base y escucha MQTT
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        restore_state()
+        atexit.register(shutdown)
+        start_mqtt()
+        socketio.start_background_task(presence_loop)
+        socketio.start_background_task(fanout_loop)
     
     # Iniciar Flask con SocketIO
     socketio.run(
         app,
         host=os.getenv('FLASK_HOST', '0.0.0.0'),
         port=int(os.getenv('FLASK_PORT', 5001)),
-        debug=os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
+        debug=debug
     )
@@ -0,0 +1,211 @@
+"""
+Registro de eventos del monitor.
+
+Buffer circular de capacidad fija: cada evento recibe un número de secuencia
+creciente (`seq`) y, al llenarse, el nuevo evento ocupa el lugar del más
+antiguo en O(1). Índices secundarios por documento y por tipo permiten
+recorrer el historial de un estudiante sin escanear todo el buffer, con
+paginación por cursor (`after_seq` / `before_seq`).
+"""
+
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional
+
+
+class _SeqIndex:
+    """Secuencias en orden creciente; se descartan por el principio"""
+
+    __slots__ = ('seqs', 'start')
+
+    def __init__(self):
+        self.seqs: List[int] = []
+        self.start = 0
+
+    def __len__(self) -> int:
+        return len(self.seqs) - self.start
+
+    def append(self, seq: int) -> None:
+        self.seqs.append(seq)
+
+    def pop_oldest(self) -> None:
+        self.start += 1
+        # Compactar de vez en cuando: el costo se amortiza entre las descartadas
+        if self.start >= 1024 and self.start * 2 >= len(self.seqs):
+            del self.seqs[:self.start]
+            self.start = 0
+
+    def after(self, seq: int, limit: int) -> List[int]:
+        """Hasta `limit` secuencias mayores que `seq`, en orden creciente"""
+        i = bisect_right(self.seqs, seq, self.start)
+        return self.seqs[i:i + limit]
+
+    def before(self, seq: Optional[int], limit: int) -> List[int]:
+        """Hasta `limit` secuencias menores que `seq` (las últimas si es None), de la más nueva a la más vieja"""
+        fin = len(self.seqs) if seq is None else bisect_left(self.seqs, seq, self.start)
+        return self.seqs[max(fin - limit, self.start):fin][::-1]
+
+
+class EventLog:
+    """Buffer circular de eventos con secuencias e índices por documento y tipo"""
+
+    def __init__(self, capacity: int = 100000):
+        """
+        Args:
+            capacity: Máximo de eventos que se conservan
+        """
+        self.capacity = capacity
+        self._slots: List[Optional[Dict]] = [None] * capacity
+        self._next_seq = 1
+        # Primera secuencia guardada (al restaurar desde el event store no empieza en 1)
+        self._floor = 1
+        self._by_documento: Dict[str, _SeqIndex] = {}
+        self._by_type: Dict[str, _SeqIndex] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._next_seq - self._first_seq()
+
+    @property
+    def last_seq(self) -> int:
+        """Secuencia del último evento (0 si no hay eventos)"""
+        return self._next_seq - 1
+
+    def _first_seq(self) -> int:
+        return max(self._floor, self._next_seq - self.capacity)
+
+    def append(self, event: Dict) -> Dict:
+        """
+        Agrega un evento ({'documento', 'type', ...}) y le asigna su `seq`.
+        Si el evento ya trae `seq` (restaurado del event store) se conserva;
+        las secuencias que falten en el medio quedan vacías.
+
+        Returns:
+            El evento guardado (con `seq`)
+        """
+        with self._lock:
+            seq = event.get('seq') or self._next_seq
+            if seq < self._next_seq:
+                raise ValueError(f"seq {seq} ya fue asignada (siguiente: {self._next_seq})")
+            if self._next_seq == 1:
+                self._floor = seq
+            # Vaciar los lugares de las secuencias salteadas (como máximo todo el buffer)
+            for skipped in range(max(self._next_seq, seq - self.capacity), seq):
+                self._evict((skipped - 1) % self.capacity)
+            self._evict((seq - 1) % self.capacity)
+
+            event = dict(event, seq=seq)
+            self._slots[(seq - 1) % self.capacity] = event
+            self._by_documento.setdefault(event['documento'], _SeqIndex()).append(seq)
+            self._by_type.setdefault(event['type'], _SeqIndex()).append(seq)
+            self._next_seq = seq + 1
+        return event
+
+    def resume(self, last_seq: int) -> None:
+        """Continúa la numeración después de `last_seq` (solo con el registro vacío)"""
+        with self._lock:
+            if self._next_seq == 1 and last_seq > 0:
+                self._next_seq = self._floor = last_seq + 1
+
+    def _evict(self, slot: int) -> None:
+        """Vacía un lugar del buffer y quita su evento de los índices"""
+        old = self._slots[slot]
+        if old is not None:
+            self._slots[slot] = None
+            self._discard(self._by_documento, old['documento'])
+            self._discard(self._by_type, old['type'])
+
+    @staticmethod
+    def _discard(indexes: Dict[str, _SeqIndex], key: str) -> None:
+        """Quita la secuencia más vieja del índice (la del evento sobrescrito)"""
+        index = indexes[key]
+        index.pop_oldest()
+        if not index:
+            del indexes[key]
+
+    def _get(self, seq: int) -> Optional[Dict]:
+        event = self._slots[(seq - 1) % self.capacity]
+        return event if event is not None and event['seq'] == seq else None
+
+    def _candidates(self, documento: Optional[str], event_type: Optional[str]):
+        """
+        Índice más selectivo para el filtro (None si no hay filtro) y si
+        hace falta comprobar el otro filtro evento por evento.
+        """
+        indexes = []
+        if documento is not None:
+            indexes.append(self._by_documento.get(documento, _SeqIndex()))
+        if event_type is not None:
+            indexes.append(self._by_type.get(event_type, _SeqIndex()))
+        if not indexes:
+            return None, False
+        return min(indexes, key=len), len(indexes) > 1
+
+    def query(self, after_seq: Optional[int] = None, before_seq: Optional[int] = None,
+              limit: int = 50, documento: Optional[str] = None,
+              event_type: Optional[str] = None) -> List[Dict]:
+        """
+        Eventos paginados por cursor.
+
+        Con `after_seq` devuelve los eventos siguientes en orden creciente
+        (para seguir el registro); si no, los más recientes anteriores a
+        `before_seq` (o los últimos), del más nuevo al más viejo.
+
+        Args:
+            after_seq: Devolver eventos con seq mayor que este
+            before_seq: Devolver eventos con seq menor que este
+            limit: Máximo de eventos
+            documento: Solo eventos de este estudiante
+            event_type: Solo eventos de este tipo
+        """
+        if limit <= 0:
+            return []
+        with self._lock:
+            index, check = self._candidates(documento, event_type)
+            first, last = self._first_seq(), self.last_seq
+            if index is None:
+                # Recorrer secuencias hasta juntar `limit` eventos: las que
+                # quedaron vacías (huecos) no cuentan
+                if after_seq is not None:
+                    seqs = range(max(after_seq + 1, first), last + 1)
+                else:
+                    end = last if before_seq is None else min(before_seq - 1, last)
+                    seqs = range(end, first - 1, -1)
+                events = []
+                for seq in seqs:
+                    event = self._get(seq)
+                    if event is not None:
+                        events.append(event)
+                        if len(events) >= limit:
+                            break
+                return events
+
+            events = []
+            cursor = after_seq if after_seq is not None else before_seq
+            while len(events) < limit:
+                if after_seq is not None:
+                    seqs = index.after(cursor, limit - len(events))
+                else:
+                    seqs = index.before(cursor, limit - len(events))
+                if not seqs:
+                    break
+                for seq in seqs:
+                    event = self._get(seq)
+                    if not check or (event['documento'] == documento and event['type'] == event_type):
+                        events.append(event)
+                cursor = seqs[-1]
+            return events
+
+    def stats(self) -> Dict:
+        """Tamaño del registro y rango de secuencias disponible"""
+        with self._lock:
+            first = self._first_seq()
+            return {
+                'capacity': self.capacity,
+                'size': self._next_seq - first,
+                'first_seq': first if self._next_seq > 1 else 0,
+                'last_seq': self.last_seq,
+                'students': len(self._by_documento),
+                'types': len(self._by_type)
+            }
@@ -0,0 +1,190 @@
+"""
+Almacenamiento persistente de eventos del monitor (SQLite en modo WAL).
+
+El hilo de ingesta guarda cada lote de eventos en una sola transacción; cada
+tanto se guarda un snapshot del estado de los estudiantes. Al reiniciar, el
+estado se reconstruye desde el último snapshot más los eventos posteriores.
+Los eventos más viejos que la retención (y ya cubiertos por un snapshot) se
+eliminan.
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+SQL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    documento TEXT NOT NULL,
+    type TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events (timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_documento ON events (documento, seq);
+CREATE TABLE IF NOT EXISTS snapshots (
+    seq INTEGER PRIMARY KEY,
+    created TEXT NOT NULL,
+    state TEXT NOT NULL
+);
+"""
+
+
+class EventStore:
+    """Eventos y snapshots del monitor en una base SQLite (WAL)"""
+
+    def __init__(self, path, retention_hours: float = 72.0, keep_snapshots: int = 2):
+        """
+        Args:
+            path: Ruta de la base SQLite
+            retention_hours: Horas que se conservan los eventos
+            keep_snapshots: Snapshots que se conservan (el último y los anteriores)
+        """
+        self.path = Path(path)
+        self.retention = timedelta(hours=retention_hours)
+        self.keep_snapshots = keep_snapshots
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Conexión compartida (se abre al primer uso, bajo el lock)"""
+        if self._conn is None:
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # En WAL, NORMAL no pierde consistencia: a lo sumo los últimos lotes ante un corte de luz
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SQL_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def append_batch(self, events: List[Dict]) -> None:
+        """Guarda un lote de eventos (con su `seq`) en una sola transacción"""
+        if not events:
+            return
+        rows = [
+            (e['seq'], e['timestamp'], e['documento'], e['type'],
+             json.dumps(e['data'], separators=(',', ':')))
+            for e in events
+        ]
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany("INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?, ?)", rows)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def save_snapshot(self, seq: int, state: Dict) -> None:
+        """
+        Guarda el estado de los estudiantes tras aplicar el evento `seq` y
+        descarta los snapshots más viejos.
+        """
+        data = json.dumps(state, separators=(',', ':'))
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN")
+            try:
+                conn.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)",
+                             (seq, datetime.now().isoformat(), data))
+                conn.execute(
+                    "DELETE FROM snapshots WHERE seq NOT IN "
+                    "(SELECT seq FROM snapshots ORDER BY seq DESC LIMIT ?)",
+                    (self.keep_snapshots,)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def purge(self, now: Optional[datetime] = None) -> int:
+        """
+        Elimina los eventos más viejos que la retención. Nunca elimina
+        eventos posteriores al último snapshot (hacen falta para reconstruir).
+
+        Returns:
+            Cantidad de eventos eliminados
+        """
+        cutoff = ((now or datetime.now()) - self.retention).isoformat()
+        with self._lock:
+            conn = self._connection()
+            cursor = conn.execute(
+                "DELETE FROM events WHERE timestamp < ? AND seq <= "
+                "(SELECT COALESCE(MAX(seq), 0) FROM snapshots)",
+                (cutoff,)
+            )
+            return cursor.rowcount
+
+    def latest_snapshot(self) -> Tuple[int, Optional[Dict]]:
+        """Último snapshot: (seq, estado), o (0, None) si no hay"""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT seq, state FROM snapshots ORDER BY seq DESC LIMIT 1"
+            ).fetchone()
+        if row is None:
+            return 0, None
+        return row[0], json.loads(row[1])
+
+    def _rows(self, sql: str, params: Tuple) -> List[Dict]:
+        with self._lock:
+            rows = self._connection().execute(sql, params).fetchall()
+        return [
+            {'seq': seq, 'timestamp': timestamp, 'documento': documento,
+             'type': event_type, 'data': json.loads(data)}
+            for seq, timestamp, documento, event_type, data in rows
+        ]
+
+    def events_after(self, seq: int, batch: int = 5000) -> Iterator[Dict]:
+        """Eventos posteriores a `seq` en orden, leídos por bloques"""
+        while True:
+            rows = self._rows("SELECT * FROM events WHERE seq > ? ORDER BY seq LIMIT ?", (seq, batch))
+            yield from rows
+            if len(rows) < batch:
+                return
+            seq = rows[-1]['seq']
+
+    def last_events(self, limit: int) -> List[Dict]:
+        """Últimos `limit` eventos, en orden creciente"""
+        rows = self._rows("SELECT * FROM events ORDER BY seq DESC LIMIT ?", (limit,))
+        rows.reverse()
+        return rows
+
+    def last_seq(self) -> int:
+        """Secuencia del último evento o snapshot guardado (0 si la base está vacía)"""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT MAX(COALESCE((SELECT MAX(seq) FROM events), 0), "
+                "COALESCE((SELECT MAX(seq) FROM snapshots), 0))"
+            ).fetchone()
+        return row[0]
+
+    def stats(self) -> Dict:
+        """Eventos guardados y último snapshot"""
+        with self._lock:
+            conn = self._connection()
+            events, first_seq, last_seq = conn.execute(
+                "SELECT COUNT(*), MIN(seq), MAX(seq) FROM events"
+            ).fetchone()
+            snapshot = conn.execute(
+                "SELECT seq, created FROM snapshots ORDER BY seq DESC LIMIT 1"
+            ).fetchone()
+        return {
+            'path': str(self.path),
+            'events': events,
+            'first_seq': first_seq or 0,
+            'last_seq': last_seq or 0,
+            'snapshot_seq': snapshot[0] if snapshot else 0,
+            'snapshot_created': snapshot[1] if snapshot else None,
+            'retention_hours': self.retention.total_seconds() / 3600
+        }
+
+    def close(self) -> None:
+        """Cierra la conexión"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,141 @@
+"""
+Difusión agrupada de actualizaciones por WebSocket.
+
+En lugar de emitir a todos los clientes un mensaje por cada evento MQTT, los
+cambios se acumulan por sala y se envían como un solo lote cada intervalo
+(~250 ms). Cada vista se suscribe a su sala:
+- 'overview': filas de los estudiantes que cambiaron, estadísticas,
+  notificaciones y cambios online/offline.
+- 'student:<documento>': además, los eventos de ese estudiante.
+
+Los estudiantes que cambian varias veces en un intervalo se envían una sola
+vez (con su último estado), y a las salas sin suscriptores no se les acumula
+nada.
+"""
+
+import threading
+from collections import deque
+from typing import Dict, Optional, Set
+
+ROOM_OVERVIEW = 'overview'
+ROOM_STUDENT_PREFIX = 'student:'
+
+
+def student_room(documento: str) -> str:
+    return ROOM_STUDENT_PREFIX + documento
+
+
+def valid_room(room: str) -> bool:
+    """Salas permitidas: 'overview' y 'student:<documento>'"""
+    return room == ROOM_OVERVIEW or (room.startswith(ROOM_STUDENT_PREFIX) and len(room) > len(ROOM_STUDENT_PREFIX))
+
+
+class _Pending:
+    """Cambios acumulados de una sala durante un intervalo"""
+
+    __slots__ = ('students', 'events', 'notifications', 'status_changes')
+
+    def __init__(self, max_items: int):
+        self.students: Set[str] = set()
+        self.events = deque(maxlen=max_items)
+        self.notifications = deque(maxlen=max_items)
+        self.status_changes = deque(maxlen=max_items)
+
+
+class FanoutHub:
+    """Suscripciones por sala y cambios pendientes de enviar"""
+
+    def __init__(self, max_items: int = 200):
+        """
+        Args:
+            max_items: Máximo de eventos/notificaciones por sala y por lote
+                (si llegan más en un intervalo se envían los últimos)
+        """
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._rooms_by_sid: Dict[str, Set[str]] = {}
+        self._subscribers: Dict[str, int] = {}
+        self._pending: Dict[str, _Pending] = {}
+        self._stats = {'batches': 0, 'items': 0}
+
+    # ------------------------------------------------------------------
+    # Suscripciones
+    # ------------------------------------------------------------------
+
+    def join(self, sid: str, room: str) -> None:
+        with self._lock:
+            rooms = self._rooms_by_sid.setdefault(sid, set())
+            if room not in rooms:
+                rooms.add(room)
+                self._subscribers[room] = self._subscribers.get(room, 0) + 1
+
+    def leave(self, sid: str, room: str) -> None:
+        with self._lock:
+            rooms = self._rooms_by_sid.get(sid)
+            if rooms and room in rooms:
+                rooms.discard(room)
+                self._release(room)
+
+    def drop(self, sid: str) -> None:
+        """Olvida las suscripciones de un cliente desconectado"""
+        with self._lock:
+            for room in self._rooms_by_sid.pop(sid, ()):
+                self._release(room)
+
+    def _release(self, room: str) -> None:
+        self._subscribers[room] -= 1
+        if not self._subscribers[room]:
+            del self._subscribers[room]
+            self._pending.pop(room, None)
+
+    def _targets(self, documento: Optional[str]):
+        """Cambios pendientes de las salas con suscriptores afectadas (bajo el lock)"""
+        for room in (ROOM_OVERVIEW, student_room(documento) if documento else None):
+            if room is not None and room in self._subscribers:
+                pending = self._pending.get(room)
+                if pending is None:
+                    pending = self._pending[room] = _Pending(self.max_items)
+                yield room, pending
+
+    # ------------------------------------------------------------------
+    # Cambios
+    # ------------------------------------------------------------------
+
+    def student_changed(self, documento: str) -> None:
+        """El registro del estudiante cambió (se envía su último estado)"""
+        with self._lock:
+            for _, pending in self._targets(documento):
+                pending.students.add(documento)
+
+    def event(self, event: Dict) -> None:
+        """Evento MQTT del estudiante (solo para su sala)"""
+        with self._lock:
+            for room, pending in self._targets(event['documento']):
+                if room != ROOM_OVERVIEW:
+                    pending.events.append(event)
+
+    def notification(self, documento: str, notification: Dict) -> None:
+        with self._lock:
+            for _, pending in self._targets(documento):
+                pending.notifications.append(notification)
+
+    def status_change(self, documento: str, change: Dict) -> None:
+        with self._lock:
+            for _, pending in self._targets(documento):
+                pending.status_changes.append(change)
+                pending.students.add(documento)
+
+    def take(self) -> Dict[str, _Pending]:
+        """Saca los cambios acumulados de todas las salas"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._stats['batches'] += len(pending)
+            self._stats['items'] += sum(
+                len(p.students) + len(p.events) + len(p.notifications) + len(p.status_changes)
+                for p in pending.values()
+            )
+        return pending
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._stats, clients=len(self._rooms_by_sid), rooms=dict(self._subscribers))
@@ -0,0 +1,172 @@
+"""
+Ingesta de mensajes MQTT del monitor.
+
+El callback de paho solo encola el mensaje crudo (tópico, payload y hora de
+llegada) en una cola acotada; un hilo procesador la vacía por lotes, decodifica
+el JSON y entrega los eventos a la aplicación. Así un cliente WebSocket lento o
+una ráfaga de heartbeats no frena la lectura del broker.
+
+Política de descarte (load shedding):
+- Dentro de un lote, de varios heartbeats del mismo estudiante solo se procesa
+  el último: los anteriores quedan superados.
+- Con la cola por encima de `heartbeat_limit` se rechazan los heartbeats
+  nuevos (llegará otro en 30 s) para dejar lugar a progress y flag_submit.
+- Con la cola llena se descarta el mensaje entrante.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+
+class IngestionPipeline:
+    """Cola acotada + hilo procesador por lotes para los mensajes MQTT"""
+
+    def __init__(self, process_batch: Callable[[List[Dict]], None],
+                 max_queue: int = 10000, batch_size: int = 500,
+                 heartbeat_limit: Optional[int] = None):
+        """
+        Args:
+            process_batch: Función que aplica una lista de eventos decodificados
+                ({'timestamp', 'documento', 'type', 'data'}), en orden de llegada
+            max_queue: Máximo de mensajes en espera
+            batch_size: Máximo de mensajes por lote
+            heartbeat_limit: Profundidad a partir de la cual se rechazan los
+                heartbeats (80% de max_queue por defecto)
+        """
+        self.process_batch = process_batch
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.heartbeat_limit = heartbeat_limit if heartbeat_limit is not None else int(max_queue * 0.8)
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._stats = {
+            'received': 0,
+            'processed': 0,
+            'dropped_full': 0,
+            'dropped_heartbeat': 0,
+            'coalesced_heartbeats': 0,
+            'invalid': 0,
+            'errors': 0,
+            'batches': 0,
+            'last_batch_size': 0,
+            'max_depth': 0
+        }
+
+    def submit(self, topic: str, payload: bytes) -> bool:
+        """
+        Encola un mensaje crudo (se llama desde el hilo de red de paho).
+
+        Returns:
+            True si se encoló, False si se descartó
+        """
+        with self._cond:
+            self._stats['received'] += 1
+            depth = len(self._queue)
+            if depth >= self.max_queue:
+                self._stats['dropped_full'] += 1
+                return False
+            if depth >= self.heartbeat_limit and topic.endswith('/heartbeat'):
+                self._stats['dropped_heartbeat'] += 1
+                return False
+            self._queue.append((time.time(), topic, payload))
+            if depth + 1 > self._stats['max_depth']:
+                self._stats['max_depth'] = depth + 1
+            self._cond.notify()
+        return True
+
+    def start(self) -> None:
+        """Inicia el hilo procesador"""
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='mqtt-ingestion', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Procesa lo pendiente y detiene el hilo"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self) -> Dict:
+        """Profundidad de la cola y contadores de la ingesta"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['queue_depth'] = len(self._queue)
+        stats['queue_capacity'] = self.max_queue
+        stats['dropped'] = stats['dropped_full'] + stats['dropped_heartbeat']
+        return stats
+
+    def _take_batch(self) -> List:
+        """Espera mensajes y toma hasta batch_size (vacío al detenerse)"""
+        with self._cond:
+            while not self._queue and self._running:
+                self._cond.wait()
+            count = min(len(self._queue), self.batch_size)
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _run(self) -> None:
+        while True:
+            raw = self._take_batch()
+            if not raw:
+                return
+            events = self._decode(raw)
+            try:
+                self.process_batch(events)
+            except Exception as e:
+                print(f"❌ Error procesando lote MQTT: {e}")
+                with self._cond:
+                    self._stats['errors'] += 1
+            with self._cond:
+                self._stats['processed'] += len(events)
+                self._stats['batches'] += 1
+                self._stats['last_batch_size'] = len(raw)
+
+    def _decode(self, raw: List) -> List[Dict]:
+        """
+        Decodifica un lote y descarta los heartbeats superados por otro
+        posterior del mismo estudiante.
+        """
+        events = []
+        invalid = coalesced = 0
+        latest_heartbeat = set()
+        # Se recorre al revés para conservar el último heartbeat de cada estudiante
+        for received_at, topic, payload in reversed(raw):
+            topic_parts = topic.split('/')
+            if len(topic_parts) != 3:
+                invalid += 1
+                continue
+            documento, event_type = topic_parts[1], topic_parts[2]
+            if event_type == 'heartbeat' and documento in latest_heartbeat:
+                coalesced += 1
+                continue
+            try:
+                data = json.loads(payload)
+            except (ValueError, UnicodeDecodeError):
+                invalid += 1
+                continue
+            # Solo un heartbeat válido reemplaza a los anteriores
+            if event_type == 'heartbeat':
+                latest_heartbeat.add(documento)
+            events.append({
+                'timestamp': datetime.fromtimestamp(received_at).isoformat(),
+                'documento': documento,
+                'type': event_type,
+                'data': data
+            })
+        events.reverse()
+        if invalid or coalesced:
+            with self._cond:
+                self._stats['invalid'] += invalid
+                self._stats['coalesced_heartbeats'] += coalesced
+        return events
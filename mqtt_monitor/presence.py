@@ -0,0 +1,83 @@
+"""
+Detección de estudiantes offline con un heap de plazos.
+
+Cada heartbeat fija el plazo del estudiante (último heartbeat + timeout) y
+agrega una entrada al min-heap; las entradas que un heartbeat posterior dejó
+viejas se descartan al salir del heap (borrado perezoso). Un tick periódico
+saca las entradas vencidas: cada transición a offline cuesta O(log n)
+amortizado y no hace falta recorrer a toda la clase.
+"""
+
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+
+class PresenceScheduler:
+    """Plazos de heartbeat de los estudiantes online"""
+
+    def __init__(self, timeout: float):
+        """
+        Args:
+            timeout: Segundos sin heartbeat para pasar a offline
+        """
+        self.timeout = timeout
+        self._heap: List[Tuple[float, str]] = []
+        self._deadlines: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        """Estudiantes online"""
+        return len(self._deadlines)
+
+    def __contains__(self, documento: str) -> bool:
+        return documento in self._deadlines
+
+    def touch(self, documento: str, last_seen: float) -> bool:
+        """
+        Registra un heartbeat.
+
+        Args:
+            documento: Documento del estudiante
+            last_seen: Hora del heartbeat (epoch)
+
+        Returns:
+            True si el estudiante estaba offline (pasa a online)
+        """
+        deadline = last_seen + self.timeout
+        previous = self._deadlines.get(documento)
+        if previous is not None and previous >= deadline:
+            return False
+        self._deadlines[documento] = deadline
+        heapq.heappush(self._heap, (deadline, documento))
+        # Demasiadas entradas viejas (heartbeats muy seguidos): reconstruir
+        if len(self._heap) > 4 * len(self._deadlines) + 1024:
+            self._heap = [(d, doc) for doc, d in self._deadlines.items()]
+            heapq.heapify(self._heap)
+        return previous is None
+
+    def expire(self, now: float) -> List[str]:
+        """
+        Saca a los estudiantes cuyo plazo venció.
+
+        Returns:
+            Documentos que pasaron a offline
+        """
+        expired = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            deadline, documento = heapq.heappop(heap)
+            if self._deadlines.get(documento) == deadline:
+                del self._deadlines[documento]
+                expired.append(documento)
+        return expired
+
+    def deadline(self, documento: str) -> Optional[float]:
+        """Plazo del estudiante (None si está offline)"""
+        return self._deadlines.get(documento)
+
+    def online(self) -> List[str]:
+        """Estudiantes online, del heartbeat más reciente al más viejo"""
+        return sorted(self._deadlines, key=self._deadlines.__getitem__, reverse=True)
+
+    def clear(self) -> None:
+        self._heap.clear()
+        self._deadlines.clear()
@@ -0,0 +1,240 @@
+"""
+Estadísticas y ranking del monitor, mantenidos de forma incremental.
+
+Cada evento actualiza solo la contribución del estudiante que cambió, así las
+lecturas (/api/statistics, top-K del leaderboard, rank de un estudiante) no
+recorren a toda la clase:
+- ClassStats: total, online/offline, suma de progreso e histograma de retos
+  completados.
+- Leaderboard: árbol de Fenwick sobre los puntos (cuántos estudiantes tienen
+  más puntos que X en O(log P)) más un grupo ordenado por documento para
+  cada puntaje (desempate).
+
+Los valores llegan sin validar por MQTT: los que no son números finitos
+cuentan como 0, los puntos se acotan a `max_points` (el árbol nunca crece
+más allá) y el progreso a 0..100.
+"""
+
+import math
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+
+def _finite(value, low: float, high: float) -> float:
+    """Número finito acotado a low..high (0 si el valor no es un número)"""
+    try:
+        number = float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+    if not math.isfinite(number):
+        return 0.0
+    return min(max(number, low), high)
+
+
+class _Fenwick:
+    """Árbol de Fenwick de conteos sobre 0..size-1 (crece al duplicar)"""
+
+    def __init__(self, size: int = 1024):
+        self.size = size
+        self.tree = [0] * (size + 1)
+
+    def _grow(self, index: int) -> None:
+        counts = [self.prefix(i) - self.prefix(i - 1) for i in range(self.size)]
+        while self.size <= index:
+            self.size *= 2
+        self.tree = [0] * (self.size + 1)
+        for i, count in enumerate(counts):
+            if count:
+                self.add(i, count)
+
+    def add(self, index: int, delta: int) -> None:
+        if index >= self.size:
+            self._grow(index)
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, index: int) -> int:
+        """Suma de los conteos de 0..index"""
+        i = min(index, self.size - 1) + 1
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+
+class Leaderboard:
+    """Ranking por puntos (desc) y documento (asc) con rank y top-K en O(log n)"""
+
+    def __init__(self, max_points: int = 1000):
+        """
+        Args:
+            max_points: Puntaje máximo posible (los valores mayores se acotan)
+        """
+        self.max_points = max_points
+        self._points: Dict[str, int] = {}
+        self._groups: Dict[int, List[str]] = {}
+        self._scores: List[int] = []  # puntajes distintos presentes, en orden creciente
+        self._fenwick = _Fenwick()
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def update(self, documento: str, puntos: int) -> None:
+        """Agrega al estudiante o actualiza sus puntos"""
+        puntos = int(_finite(puntos, 0, self.max_points))
+        previous = self._points.get(documento)
+        if previous == puntos:
+            return
+        if previous is not None:
+            self._remove(documento, previous)
+        self._points[documento] = puntos
+        group = self._groups.get(puntos)
+        if group is None:
+            group = self._groups[puntos] = []
+            insort(self._scores, puntos)
+        insort(group, documento)
+        self._fenwick.add(puntos, 1)
+
+    def _remove(self, documento: str, puntos: int) -> None:
+        group = self._groups[puntos]
+        del group[bisect_left(group, documento)]
+        if not group:
+            del self._groups[puntos]
+            del self._scores[bisect_left(self._scores, puntos)]
+        self._fenwick.add(puntos, -1)
+
+    def rank(self, documento: str) -> Optional[int]:
+        """Posición (1 = primero) del estudiante, o None si no está"""
+        puntos = self._points.get(documento)
+        if puntos is None:
+            return None
+        above = len(self._points) - self._fenwick.prefix(puntos)
+        return above + bisect_left(self._groups[puntos], documento) + 1
+
+    def points(self, documento: str) -> Optional[int]:
+        return self._points.get(documento)
+
+    def top(self, limit: int, offset: int = 0) -> List[Tuple[int, str, int]]:
+        """Hasta `limit` entradas (rank, documento, puntos) a partir de la posición `offset`"""
+        entries = []
+        position = 0
+        for puntos in reversed(self._scores):
+            group = self._groups[puntos]
+            if position + len(group) <= offset:
+                position += len(group)
+                continue
+            for documento in group[max(offset - position, 0):]:
+                entries.append((offset + len(entries) + 1, documento, puntos))
+                if len(entries) >= limit:
+                    return entries
+            position += len(group)
+        return entries
+
+
+class ClassStats:
+    """Agregados de la clase actualizados por estudiante"""
+
+    def __init__(self, max_points: int = 1000, max_completados: int = 1000):
+        """
+        Args:
+            max_points: Puntaje máximo posible en el laboratorio
+            max_completados: Máximo de retos completados (acota el histograma)
+        """
+        self.max_points = max_points
+        self.max_completados = max_completados
+        self.leaderboard = Leaderboard(max_points)
+        # documento -> (progreso, completados, online)
+        self._students: Dict[str, Tuple[float, int, bool]] = {}
+        self._progress_sum = 0.0
+        self._online = 0
+        self._histogram: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def update(self, documento: str, record: Dict, online: Optional[bool] = None) -> None:
+        """
+        Actualiza la contribución de un estudiante a partir de su registro
+        en students_data.
+
+        Args:
+            documento: Documento del estudiante
+            record: Registro del estudiante (puntos, completados_count, progreso_porcentaje)
+            online: Nuevo estado de conexión (None: sin cambios)
+        """
+        progreso = _finite(record.get('progreso_porcentaje'), 0, 100)
+        completados = int(_finite(record.get('completados_count'), 0, self.max_completados))
+        with self._lock:
+            previous = self._students.get(documento)
+            if previous is not None:
+                old_progreso, old_completados, old_online = previous
+                self._progress_sum -= old_progreso
+                self._count(old_completados, -1)
+                self._online -= old_online
+            else:
+                old_online = False
+            if online is None:
+                online = old_online
+            self._students[documento] = (progreso, completados, online)
+            self._progress_sum += progreso
+            self._count(completados, 1)
+            self._online += online
+            self.leaderboard.update(documento, record.get('puntos', 0))
+
+    def set_online(self, documento: str, online: bool) -> bool:
+        """
+        Cambia el estado de conexión de un estudiante.
+
+        Returns:
+            True si el estado cambió
+        """
+        with self._lock:
+            previous = self._students.get(documento)
+            if previous is None or previous[2] == online:
+                return False
+            self._students[documento] = (previous[0], previous[1], online)
+            self._online += 1 if online else -1
+            return True
+
+    def is_online(self, documento: str) -> bool:
+        with self._lock:
+            previous = self._students.get(documento)
+            return bool(previous and previous[2])
+
+    def _count(self, completados: int, delta: int) -> None:
+        count = self._histogram.get(completados, 0) + delta
+        if count:
+            self._histogram[completados] = count
+        else:
+            del self._histogram[completados]
+
+    def reset(self) -> None:
+        """Olvida todo (antes de reconstruir desde un snapshot)"""
+        with self._lock:
+            self.leaderboard = Leaderboard(self.max_points)
+            self._students.clear()
+            self._progress_sum = 0.0
+            self._online = 0
+            self._histogram.clear()
+
+    def summary(self) -> Dict:
+        """Agregados de la clase (tiempo constante: el histograma tiene un valor por cantidad de retos)"""
+        with self._lock:
+            total = len(self._students)
+            return {
+                'total_students': total,
+                'online_students': self._online,
+                'offline_students': total - self._online,
+                'avg_progress': self._progress_sum / total if total else 0,
+                'completion_histogram': {str(k): v for k, v in sorted(self._histogram.items())}
+            }
+
+    def top(self, limit: int, offset: int = 0) -> List[Tuple[int, str, int]]:
+        with self._lock:
+            return self.leaderboard.top(limit, offset)
+
+    def rank(self, documento: str) -> Optional[int]:
+        with self._lock:
+            return self.leaderboard.rank(documento)
@@ -0,0 +1,282 @@
+"""
+Pruebas de las estructuras de datos del monitor (sin broker ni Flask).
+
+Uso:
+    cd mqtt_monitor && python3 -m pytest -q test_structures.py
+"""
+
+import json
+import random
+
+from event_log import EventLog
+from fanout import ROOM_OVERVIEW, FanoutHub, student_room, valid_room
+from ingestion import IngestionPipeline
+from presence import PresenceScheduler
+from stats import ClassStats, Leaderboard
+
+
+def _event(documento='a', event_type='heartbeat', seq=None):
+    event = {'timestamp': '2026-01-01T00:00:00', 'documento': documento, 'type': event_type, 'data': {}}
+    if seq is not None:
+        event['seq'] = seq
+    return event
+
+
+# ============================================================================
+# EventLog
+# ============================================================================
+
+def _available(log, seqs):
+    """Secuencias que el buffer todavía conserva"""
+    first = max(log._floor, log._next_seq - log.capacity)
+    return [seq for seq in seqs if seq >= first]
+
+
+def test_event_log_assigns_increasing_seq():
+    log = EventLog(capacity=4)
+    assert [log.append(_event())['seq'] for _ in range(3)] == [1, 2, 3]
+    assert log.last_seq == 3
+
+
+def test_event_log_pages_across_gaps():
+    # cap=11 y query(after_seq=47, limit=6): el caso reportado en la revisión
+    log = EventLog(capacity=11)
+    seqs = [40, 41, 43, 44, 47, 48, 50, 51, 52, 55, 56, 57]
+    for seq in seqs:
+        log.append(_event(seq=seq))
+    available = _available(log, seqs)
+    page = [e['seq'] for e in log.query(after_seq=47, limit=6)]
+    assert page == [s for s in available if s > 47][:6]
+    assert len(page) == 6
+
+
+def test_event_log_pagination_matches_brute_force():
+    rng = random.Random(1)
+    for _ in range(200):
+        log = EventLog(capacity=rng.randint(3, 20))
+        seqs, seq = [], 0
+        for _ in range(rng.randint(0, 60)):
+            seq += rng.choice([1, 1, 1, 2, 5])
+            documento = rng.choice('abc')
+            event_type = rng.choice(['heartbeat', 'progress'])
+            log.append(_event(documento, event_type, seq))
+            seqs.append((seq, documento, event_type))
+        available = set(_available(log, [s for s, _, _ in seqs]))
+        kept = [item for item in seqs if item[0] in available]
+        for _ in range(5):
+            cursor, limit = rng.randint(0, seq + 2), rng.randint(1, 8)
+            documento = rng.choice([None, 'a', 'b'])
+            event_type = rng.choice([None, 'heartbeat'])
+            expected = [s for s, d, t in kept
+                        if (documento is None or d == documento) and (event_type is None or t == event_type)]
+            after = log.query(after_seq=cursor, limit=limit, documento=documento, event_type=event_type)
+            assert [e['seq'] for e in after] == [s for s in expected if s > cursor][:limit]
+            before = log.query(before_seq=cursor, limit=limit, documento=documento, event_type=event_type)
+            assert [e['seq'] for e in before] == [s for s in reversed(expected) if s < cursor][:limit]
+
+
+def test_event_log_eviction_keeps_indexes_consistent():
+    log = EventLog(capacity=5)
+    for i in range(2000):
+        log.append(_event(documento='a' if i % 3 else 'b', event_type='heartbeat' if i % 2 else 'progress'))
+    kept = log.query(limit=100)
+    assert len(kept) == 5
+    by_documento = {doc: len(index) for doc, index in log._by_documento.items()}
+    by_type = {t: len(index) for t, index in log._by_type.items()}
+    assert sum(by_documento.values()) == sum(by_type.values()) == 5
+    for doc, count in by_documento.items():
+        assert count == sum(1 for e in kept if e['documento'] == doc)
+        assert len(log.query(limit=100, documento=doc)) == count
+    # Las listas de los índices se compactan: no crecen con todo el historial
+    assert all(len(index.seqs) < 2100 for index in log._by_documento.values())
+
+
+def test_event_log_restored_seq_and_resume():
+    log = EventLog(capacity=4)
+    log.resume(100)
+    assert log.append(_event())['seq'] == 101
+    # Un salto mayor que la capacidad desaloja lo anterior a la ventana
+    log.append(_event(seq=110))
+    assert [e['seq'] for e in log.query(after_seq=0)] == [110]
+    assert log.stats()['first_seq'] == 107
+
+
+# ============================================================================
+# Leaderboard / ClassStats
+# ============================================================================
+
+def _brute_ranking(points):
+    return sorted(points.items(), key=lambda item: (-item[1], item[0]))
+
+
+def test_leaderboard_rank_and_top_with_ties_and_offset():
+    board = Leaderboard(max_points=100)
+    points = {'d': 30, 'a': 30, 'c': 10, 'b': 50, 'e': 10, 'f': 0}
+    for documento, puntos in points.items():
+        board.update(documento, puntos)
+    ranking = _brute_ranking(points)
+    for position, (documento, _) in enumerate(ranking, start=1):
+        assert board.rank(documento) == position
+    for offset in range(len(ranking) + 1):
+        for limit in range(1, len(ranking) + 1):
+            expected = [(offset + i + 1, d, p) for i, (d, p) in enumerate(ranking[offset:offset + limit])]
+            assert board.top(limit, offset) == expected
+
+
+def test_leaderboard_matches_brute_force_after_updates():
+    rng = random.Random(2)
+    board, points = Leaderboard(max_points=5000), {}
+    for _ in range(2000):
+        documento = f"d{rng.randint(0, 200)}"
+        points[documento] = rng.randint(0, 5000)
+        board.update(documento, points[documento])
+    ranking = _brute_ranking(points)
+    assert board.top(20, 37) == [(38 + i, d, p) for i, (d, p) in enumerate(ranking[37:57])]
+    for position, (documento, _) in enumerate(ranking, start=1):
+        assert board.rank(documento) == position
+
+
+def test_leaderboard_fenwick_grows_up_to_max_points():
+    board = Leaderboard(max_points=5000)
+    board.update('a', 10)
+    board.update('b', 4000)  # más allá del tamaño inicial del árbol
+    assert board.rank('b') == 1 and board.rank('a') == 2
+    board.update('c', 10 ** 9)  # acotado a max_points: el árbol no crece
+    assert board.points('c') == 5000
+    assert board._fenwick.size <= 8192
+
+
+def test_class_stats_rejects_untrusted_values():
+    stats = ClassStats(max_points=100)
+    stats.update('a', {'progreso_porcentaje': float('nan'), 'completados_count': 'x', 'puntos': [1]})
+    stats.update('b', {'progreso_porcentaje': 250, 'completados_count': float('inf'), 'puntos': float('nan')})
+    summary = stats.summary()
+    json.dumps(summary, allow_nan=False)
+    assert summary['avg_progress'] == 50
+    assert summary['completion_histogram'] == {'0': 2}
+    # Un valor válido posterior reemplaza la contribución anterior
+    stats.update('a', {'progreso_porcentaje': 40, 'completados_count': 2, 'puntos': 20})
+    assert stats.summary()['avg_progress'] == 70
+    assert stats.top(2) == [(1, 'a', 20), (2, 'b', 0)]
+
+
+def test_class_stats_online_counts():
+    stats = ClassStats()
+    stats.update('a', {}, online=True)
+    stats.update('b', {})
+    assert stats.set_online('b', True)
+    assert not stats.set_online('b', True)
+    assert stats.set_online('a', False)
+    summary = stats.summary()
+    assert (summary['online_students'], summary['offline_students']) == (1, 1)
+
+
+# ============================================================================
+# PresenceScheduler
+# ============================================================================
+
+def test_presence_expire_after_retouch():
+    presence = PresenceScheduler(timeout=10)
+    assert presence.touch('a', 0)
+    assert not presence.touch('a', 5)  # ya estaba online: plazo 15
+    assert presence.touch('b', 1)
+    # La entrada vieja de 'a' (plazo 10) se descarta sin pasarlo a offline
+    assert presence.expire(12) == ['b']
+    assert 'a' in presence and presence.deadline('a') == 15
+    assert presence.expire(15) == ['a']
+    assert len(presence) == 0 and presence.expire(100) == []
+
+
+def test_presence_old_heartbeat_does_not_shorten_deadline():
+    presence = PresenceScheduler(timeout=10)
+    presence.touch('a', 20)
+    presence.touch('a', 5)
+    assert presence.deadline('a') == 30
+    assert presence.expire(29) == []
+
+
+def test_presence_heap_rebuild_keeps_deadlines():
+    presence = PresenceScheduler(timeout=10)
+    for t in range(5000):
+        presence.touch('a', t)
+    presence.touch('b', 0)
+    assert len(presence._heap) < 5000
+    assert presence.expire(4000) == ['b']
+    assert presence.online() == ['a']
+
+
+# ============================================================================
+# FanoutHub
+# ============================================================================
+
+def test_fanout_coalesces_students_per_room():
+    hub = FanoutHub()
+    hub.join('s1', ROOM_OVERVIEW)
+    hub.join('s2', student_room('a'))
+    for _ in range(50):
+        hub.student_changed('a')
+        hub.event(_event('a'))
+    hub.student_changed('b')  # sin sala de 'b': solo overview
+    pending = hub.take()
+    assert pending[ROOM_OVERVIEW].students == {'a', 'b'}
+    assert not pending[ROOM_OVERVIEW].events  # los eventos van a la sala del estudiante
+    assert pending[student_room('a')].students == {'a'}
+    assert len(pending[student_room('a')].events) == 50
+    assert hub.take() == {}
+
+
+def test_fanout_rooms_without_subscribers_accumulate_nothing():
+    hub = FanoutHub()
+    hub.join('s1', ROOM_OVERVIEW)
+    hub.join('s1', ROOM_OVERVIEW)  # repetido: una sola suscripción
+    hub.drop('s1')
+    hub.student_changed('a')
+    assert hub.take() == {}
+    assert hub.stats()['rooms'] == {}
+    assert valid_room('student:a') and not valid_room('student:') and not valid_room('otra')
+
+
+# ============================================================================
+# IngestionPipeline
+# ============================================================================
+
+def test_ingestion_keeps_last_valid_heartbeat():
+    pipeline = IngestionPipeline(lambda events: None)
+    events = pipeline._decode([
+        (1, 'lab/a/heartbeat', b'{"n": 1}'),
+        (2, 'lab/a/heartbeat', b'{"n": 2}'),
+        (3, 'lab/a/progress', b'{"p": 1}'),
+        (4, 'lab/a/heartbeat', b'{roto'),
+        (5, 'lab/b/heartbeat', b'{"n": 3}'),
+        (6, 'mal', b'{}'),
+    ])
+    assert [(e['documento'], e['type'], e['data']) for e in events] == [
+        ('a', 'heartbeat', {'n': 2}),
+        ('a', 'progress', {'p': 1}),
+        ('b', 'heartbeat', {'n': 3}),
+    ]
+    stats = pipeline.stats()
+    assert stats['invalid'] == 2 and stats['coalesced_heartbeats'] == 1
+
+
+def test_ingestion_sheds_heartbeats_before_other_events():
+    pipeline = IngestionPipeline(lambda events: None, max_queue=4, heartbeat_limit=2)
+    assert pipeline.submit('lab/a/heartbeat', b'{}')
+    assert pipeline.submit('lab/a/progress', b'{}')
+    assert not pipeline.submit('lab/a/heartbeat', b'{}')
+    assert pipeline.submit('lab/a/flag_submit', b'{}')
+    assert pipeline.submit('lab/a/progress', b'{}')
+    assert not pipeline.submit('lab/a/progress', b'{}')
+    stats = pipeline.stats()
+    assert (stats['dropped_heartbeat'], stats['dropped_full'], stats['queue_depth']) == (1, 1, 4)
+
+
+def test_ingestion_processes_in_batches():
+    batches = []
+    pipeline = IngestionPipeline(batches.append, batch_size=3)
+    for i in range(7):
+        pipeline.submit(f'lab/d{i}/progress', json.dumps({'i': i}).encode())
+    pipeline.start()
+    pipeline.stop()
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert [e['data']['i'] for batch in batches for e in batch] == list(range(7))
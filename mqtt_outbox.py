@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Docker CTF Lab - Outbox MQTT
+Cola de salida no bloqueante para los eventos MQTT del laboratorio:
+- Cola acotada en memoria vaciada por un hilo emisor en segundo plano
+- Heartbeats pendientes del mismo tópico se fusionan (solo el último)
+- Spool en disco para los eventos producidos sin conexión, que se envían
+  en orden al reconectar
+- flush acotado para que el CLI no pierda eventos al salir (lo que el hilo
+  emisor tenga en vuelo también se guarda en el spool; un evento puede
+  llegar dos veces, nunca perderse)
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Bloqueo advisory del spool entre procesos (solo POSIX)
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+    fcntl = None
+
+
+class MqttOutbox:
+    """
+    Outbox de eventos MQTT con envío en segundo plano y spool en disco.
+    Los mensajes se representan como diccionarios {"topic", "payload", "qos"}.
+    """
+
+    def __init__(self, config: Dict, client_id: str, spool_path, capacidad: int = 1000,
+                 timeout_publicacion: float = 5.0, reintento: float = 5.0):
+        """
+        Args:
+            config: Configuración MQTT (broker, port, username, password)
+            client_id: ID de cliente MQTT
+            spool_path: Archivo JSON lines para los eventos sin enviar
+            capacidad: Máximo de mensajes en memoria (el exceso va al spool)
+            timeout_publicacion: Segundos de espera del handshake QoS1
+            reintento: Segundos entre intentos de reconexión
+        """
+        self.config = config
+        self.client_id = client_id
+        self.spool_path = Path(spool_path)
+        self.capacidad = capacidad
+        self.timeout_publicacion = timeout_publicacion
+        self.reintento = reintento
+
+        self._cola = deque()
+        self._heartbeats: Dict[str, Dict] = {}
+        self._cond = threading.Condition()
+        # Mensajes que el hilo emisor sacó de la cola o del spool y aún no confirmó
+        self._en_envio: List[Dict] = []
+        # True si flush ya los guardó en el spool (el emisor no debe guardarlos otra vez)
+        self._en_envio_guardado = False
+        self._detener = False
+        self._hilo: Optional[threading.Thread] = None
+        self._cliente = None
+        self.enviados = 0
+        self.en_spool = 0
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def enviar(self, topic: str, payload: Dict, qos: int = 1) -> None:
+        """
+        Encola un evento sin bloquear.
+
+        Args:
+            topic: Tópico MQTT
+            payload: Contenido del evento (se serializa a JSON)
+            qos: Nivel de QoS
+        """
+        mensaje = {"topic": topic, "payload": json.dumps(payload), "qos": qos}
+        desborde = None
+
+        with self._cond:
+            if topic.endswith("/heartbeat"):
+                pendiente = self._heartbeats.get(topic)
+                if pendiente is not None:
+                    # Fusionar con el heartbeat aún no enviado
+                    pendiente["payload"] = mensaje["payload"]
+                    return
+                self._heartbeats[topic] = mensaje
+
+            self._cola.append(mensaje)
+            if len(self._cola) > self.capacidad:
+                desborde = self._extraer(len(self._cola) - self.capacidad)
+            self._cond.notify()
+
+        if desborde:
+            self._agregar_spool(desborde)
+        self._iniciar()
+
+    def flush(self, timeout: float = 2.0) -> bool:
+        """
+        Espera (acotado) a que se envíen los eventos pendientes. Lo que no
+        alcance a enviarse se guarda en el spool para el próximo arranque.
+
+        Args:
+            timeout: Segundos máximos de espera
+
+        Returns:
+            True si todo se envió a tiempo
+        """
+        limite = time.monotonic() + timeout
+        with self._cond:
+            while self._cola or (self._en_envio and not self._en_envio_guardado):
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                self._cond.wait(restante)
+            pendientes = []
+            if self._en_envio and not self._en_envio_guardado:
+                # El emisor sigue publicando: guardarlos también (son los más antiguos)
+                pendientes.extend(self._en_envio)
+                self._en_envio_guardado = True
+            pendientes.extend(self._extraer(len(self._cola)))
+
+        if pendientes:
+            self._agregar_spool(pendientes)
+            return False
+        return True
+
+    def cerrar(self, timeout: float = 2.0) -> bool:
+        """Hace flush acotado y detiene el hilo emisor"""
+        enviado = self.flush(timeout)
+        with self._cond:
+            self._detener = True
+            self._cond.notify_all()
+        if self._cliente is not None:
+            try:
+                self._cliente.loop_stop()
+                self._cliente.disconnect()
+            except Exception:
+                pass
+        return enviado
+
+    def estadisticas(self) -> Dict:
+        """Estado de la cola para diagnóstico"""
+        with self._cond:
+            return {
+                "en_memoria": len(self._cola),
+                "en_vuelo": len(self._en_envio),
+                "enviados": self.enviados,
+                "enviados_a_spool": self.en_spool,
+                "conectado": self._conectado()
+            }
+
+    # ------------------------------------------------------------------
+    # Cola en memoria
+    # ------------------------------------------------------------------
+
+    def _extraer(self, cantidad: int) -> List[Dict]:
+        """Saca los N mensajes más antiguos de la cola (con el lock tomado)"""
+        mensajes = []
+        for _ in range(cantidad):
+            mensaje = self._cola.popleft()
+            if self._heartbeats.get(mensaje["topic"]) is mensaje:
+                del self._heartbeats[mensaje["topic"]]
+            mensajes.append(mensaje)
+        return mensajes
+
+    def _iniciar(self) -> None:
+        """Arranca el hilo emisor la primera vez que se encola algo"""
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        with self._cond:
+            if self._hilo is not None and self._hilo.is_alive():
+                return
+            self._detener = False
+            self._hilo = threading.Thread(target=self._ejecutar, name="mqtt-outbox", daemon=True)
+            self._hilo.start()
+
+    def _tomar(self, mensajes: List[Dict]) -> None:
+        """Marca mensajes como en vuelo en el hilo emisor (con el lock tomado)"""
+        self._en_envio = mensajes
+        self._en_envio_guardado = False
+
+    def _confirmar(self) -> bool:
+        """
+        Quita de los mensajes en vuelo el primero, ya publicado.
+
+        Returns:
+            False si flush ya guardó los mensajes en vuelo (hay que dejar de publicar)
+        """
+        with self._cond:
+            if self._en_envio_guardado:
+                return False
+            del self._en_envio[0]
+            return True
+
+    def _soltar(self) -> List[Dict]:
+        """Termina el envío en curso y devuelve los mensajes que quedan por guardar"""
+        with self._cond:
+            restantes = [] if self._en_envio_guardado else self._en_envio
+            self._en_envio = []
+            self._en_envio_guardado = False
+            self._cond.notify_all()
+        return restantes
+
+    # ------------------------------------------------------------------
+    # Hilo emisor
+    # ------------------------------------------------------------------
+
+    def _ejecutar(self) -> None:
+        """Conecta, vacía el spool y luego la cola en memoria, en orden"""
+        while True:
+            with self._cond:
+                while not self._detener and not self._cola and not self._hay_spool():
+                    self._cond.wait(self.reintento)
+                if self._detener:
+                    return
+
+            if not self._conectar():
+                # Sin conexión: persistir lo pendiente y reintentar más tarde
+                with self._cond:
+                    self._tomar(self._extraer(len(self._cola)))
+                    pendientes = list(self._en_envio)
+                if pendientes:
+                    self._agregar_spool(pendientes)
+                self._soltar()
+                with self._cond:
+                    if not self._detener:
+                        self._cond.wait(self.reintento)
+                continue
+
+            # Primero los eventos más antiguos (spool), luego la memoria
+            if not self._vaciar_spool():
+                continue
+
+            with self._cond:
+                if not self._cola:
+                    continue
+                mensaje = self._extraer(1)[0]
+                self._tomar([mensaje])
+
+            if self._publicar(mensaje):
+                self._confirmar()
+            restantes = self._soltar()
+            if restantes:
+                self._agregar_spool(restantes)
+
+    def _conectado(self) -> bool:
+        """True si el cliente MQTT está conectado"""
+        return self._cliente is not None and self._cliente.is_connected()
+
+    def _conectar(self) -> bool:
+        """Crea y conecta el cliente MQTT si hace falta"""
+        if self._conectado():
+            return True
+
+        try:
+            import paho.mqtt.client as mqtt
+        except ImportError:
+            return False
+
+        try:
+            if self._cliente is None:
+                if hasattr(mqtt, "CallbackAPIVersion"):
+                    self._cliente = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=self.client_id)
+                else:
+                    self._cliente = mqtt.Client(client_id=self.client_id)
+
+                if self.config.get("username"):
+                    self._cliente.username_pw_set(self.config["username"], self.config.get("password"))
+
+                self._cliente.connect(self.config["broker"], self.config["port"], 60)
+                self._cliente.loop_start()
+            else:
+                self._cliente.reconnect()
+
+            # Esperar el CONNACK
+            limite = time.monotonic() + self.timeout_publicacion
+            while not self._cliente.is_connected() and time.monotonic() < limite:
+                time.sleep(0.05)
+            return self._cliente.is_connected()
+
+        except Exception:
+            return False
+
+    def _publicar(self, mensaje: Dict) -> bool:
+        """Publica un mensaje y espera el handshake QoS1 (acotado)"""
+        try:
+            info = self._cliente.publish(mensaje["topic"], mensaje["payload"], qos=mensaje.get("qos", 1))
+            if mensaje.get("qos", 1) > 0:
+                info.wait_for_publish(self.timeout_publicacion)
+                if not info.is_published():
+                    return False
+            self.enviados += 1
+            return True
+        except Exception:
+            return False
+
+    # ------------------------------------------------------------------
+    # Spool en disco
+    # ------------------------------------------------------------------
+
+    def _bloquear(self, fd: int) -> None:
+        """Bloqueo exclusivo del spool entre procesos"""
+        if FCNTL_AVAILABLE:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+
+    def _hay_spool(self) -> bool:
+        """True si hay eventos pendientes en el spool"""
+        try:
+            return self.spool_path.stat().st_size > 0
+        except OSError:
+            return False
+
+    def _agregar_spool(self, mensajes: List[Dict]) -> None:
+        """Agrega mensajes al final del spool (durable)"""
+        if not mensajes:
+            return
+        datos = "".join(json.dumps(m, separators=(",", ":")) + "\n" for m in mensajes).encode("utf-8")
+        try:
+            fd = os.open(self.spool_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                self._bloquear(fd)
+                os.write(fd, datos)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self.en_spool += len(mensajes)
+        except OSError as e:
+            print(f"⚠️  No se pudo guardar eventos MQTT pendientes: {e}")
+
+    def _vaciar_spool(self, lote: int = 100) -> bool:
+        """
+        Publica en orden los eventos del spool. El bloqueo del archivo solo se
+        toma para sacar el lote y, si algo falla, para devolver lo no enviado
+        al principio: nunca mientras se espera a la red.
+
+        Returns:
+            True si el spool quedó vacío
+        """
+        if not self._hay_spool():
+            return True
+
+        mensajes = self._sacar_spool(lote)
+        for mensaje in mensajes:
+            if not self._publicar(mensaje):
+                break
+            if not self._confirmar():
+                # flush guardó el resto en el spool mientras se publicaba
+                self._soltar()
+                return False
+
+        restantes = self._soltar()
+        if restantes:
+            self._devolver_spool(restantes)
+            return False
+        return not self._hay_spool()
+
+    def _sacar_spool(self, lote: int) -> List[Dict]:
+        """Saca del spool los primeros `lote` eventos y los marca como en vuelo"""
+        try:
+            fd = os.open(self.spool_path, os.O_RDWR)
+        except OSError:
+            return []
+
+        try:
+            self._bloquear(fd)
+            with os.fdopen(os.dup(fd), "rb") as f:
+                lineas = f.read().splitlines()
+
+            mensajes = []
+            for linea in lineas[:lote]:
+                try:
+                    mensajes.append(json.loads(linea))
+                except ValueError:
+                    continue
+
+            # Marcarlos en vuelo antes de soltar el bloqueo: nunca quedan fuera de ambos
+            with self._cond:
+                self._tomar(mensajes)
+            self._reescribir(fd, lineas[lote:])
+            return list(mensajes)
+        except OSError as e:
+            # El spool quedó como estaba: no hay nada en vuelo
+            print(f"⚠️  No se pudo leer el spool MQTT: {e}")
+            with self._cond:
+                self._tomar([])
+            return []
+        finally:
+            os.close(fd)
+
+    def _devolver_spool(self, mensajes: List[Dict]) -> None:
+        """Vuelve a poner mensajes no enviados al principio del spool"""
+        lineas = [json.dumps(m, separators=(",", ":")).encode("utf-8") for m in mensajes]
+        try:
+            fd = os.open(self.spool_path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                self._bloquear(fd)
+                with os.fdopen(os.dup(fd), "rb") as f:
+                    lineas.extend(f.read().splitlines())
+                self._reescribir(fd, lineas)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            print(f"⚠️  No se pudo guardar eventos MQTT pendientes: {e}")
+
+    @staticmethod
+    def _reescribir(fd: int, lineas: List[bytes]) -> None:
+        """Reemplaza el contenido del spool (con el bloqueo tomado)"""
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.ftruncate(fd, 0)
+        if lineas:
+            os.write(fd, b"\n".join(lineas) + b"\n")
+        os.fsync(fd)
@@ -0,0 +1,820 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Docker CTF Lab - Almacenamiento de Progreso
+Backends de progreso intercambiables:
+- JSON (por defecto): diario de eventos append-only con compactación atómica
+  a un snapshot JSON y bloqueo advisory para que el CLI y el dashboard no se pisen.
+- SQLite (WAL): una base de datos para todo un salón en un servidor compartido.
+
+Uso de la herramienta de migración:
+    python3 progress_store.py importar <base.db> <progreso.json> [...]
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Bloqueo advisory entre procesos (solo POSIX)
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+    fcntl = None
+
+
+def progreso_inicial() -> Dict:
+    """Progreso vacío de un estudiante nuevo"""
+    return {
+        "completados": [],
+        "puntos": 0,
+        "documento_estudiante": "",
+        "fecha_inicio": datetime.now().isoformat()
+    }
+
+
+def aplicar_evento(progress: Dict, evento: Dict) -> bool:
+    """
+    Aplica un evento del diario sobre un progreso (idempotente).
+
+    Args:
+        progress: Progreso a modificar
+        evento: Evento del diario
+
+    Returns:
+        True si el evento cambió el progreso
+    """
+    tipo = evento.get("ev")
+
+    if tipo == "completado":
+        reto_id = evento["reto_id"]
+        if reto_id in progress["completados"]:
+            return False
+        progress["completados"].append(reto_id)
+        progress["puntos"] += evento.get("puntos", 0)
+        progress[f"reto_{reto_id}_fecha"] = evento.get("fecha", "")
+        return True
+
+    if tipo == "documento":
+        if progress.get("documento_estudiante") == evento["documento"]:
+            return False
+        progress["documento_estudiante"] = evento["documento"]
+        return True
+
+    return False
+
+
+class ProgressStore(ABC):
+    """
+    Interfaz de los backends de progreso de un estudiante.
+    'progress' mantiene el diccionario con el formato histórico
+    (completados, puntos, documento_estudiante, fecha_inicio, reto_N_fecha).
+    """
+
+    progress: Dict
+
+    @abstractmethod
+    def cargar(self) -> Dict:
+        """Carga el progreso desde el almacenamiento"""
+
+    @abstractmethod
+    def refrescar(self) -> bool:
+        """Aplica cambios escritos por otros procesos; True si hubo cambios"""
+
+    @abstractmethod
+    def registrar_completado(self, reto_id: int, puntos: int, fecha: Optional[str] = None) -> bool:
+        """Registra un reto completado; False si ya estaba completado"""
+
+    def registrar_completados(self, retos: List[Tuple[int, int]],
+                              fecha: Optional[str] = None) -> List[int]:
+        """
+        Registra varios retos completados de una vez.
+
+        Args:
+            retos: Lista de tuplas (reto_id, puntos)
+            fecha: Fecha ISO de completado (ahora por defecto)
+
+        Returns:
+            IDs de los retos registrados (sin los que ya estaban completados)
+        """
+        return [
+            reto_id for reto_id, puntos in retos
+            if self.registrar_completado(reto_id, puntos, fecha)
+        ]
+
+    @abstractmethod
+    def registrar_documento(self, documento: str) -> bool:
+        """Registra el documento del estudiante; True si cambió"""
+
+    def compactar(self) -> Dict:
+        """Consolida el almacenamiento (no-op si el backend no lo necesita)"""
+        return self.progress
+
+    def leaderboard(self, limite: int = 10) -> List[Dict]:
+        """Ranking de estudiantes por puntos"""
+        documento = self.progress.get("documento_estudiante")
+        if not documento:
+            return []
+        return [{
+            "rank": 1,
+            "documento": documento,
+            "puntos": self.progress.get("puntos", 0),
+            "completados": len(self.progress.get("completados", []))
+        }]
+
+    def flush(self) -> None:
+        """Fuerza a disco las escrituras pendientes"""
+        pass
+
+    def cerrar(self) -> None:
+        """Libera los recursos del backend"""
+        pass
+
+
+def _cerrar_diario(descriptores: Dict[str, int]) -> None:
+    """Hace fsync y cierra el diario abierto (al cerrar o al recolectar el store)"""
+    fd = descriptores.pop("diario", None)
+    if fd is None:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class JsonProgressStore(ProgressStore):
+    """
+    Progreso de un estudiante guardado como snapshot JSON (formato histórico
+    de ~/.docker_ctf_progress.json) más un diario de eventos JSON lines.
+
+    - Las escrituras son appends O(1) bajo un lock exclusivo; antes de
+      escribir se aplica la cola del diario escrita por otros procesos.
+    - El fsync se agrupa por cantidad de eventos o por tiempo.
+    - Cada 'compactar_cada' eventos el estado se vuelca atómicamente al
+      snapshot y el diario se trunca.
+    """
+
+    def __init__(self, snapshot_path, fsync_cada: int = 8, fsync_intervalo: float = 1.0,
+                 compactar_cada: int = 256):
+        """
+        Args:
+            snapshot_path: Ruta del snapshot JSON
+            fsync_cada: Eventos escritos antes de forzar un fsync
+            fsync_intervalo: Segundos máximos entre fsyncs
+            compactar_cada: Eventos en el diario antes de compactar
+        """
+        self.snapshot_path = Path(snapshot_path)
+        self.journal_path = self.snapshot_path.with_suffix(".journal")
+        self.lock_path = self.snapshot_path.with_suffix(".lock")
+        self.fsync_cada = fsync_cada
+        self.fsync_intervalo = fsync_intervalo
+        self.compactar_cada = compactar_cada
+
+        self.progress: Dict = progreso_inicial()
+        self._lock = threading.RLock()
+        self._lock_fd: Optional[int] = None
+        # Diario abierto para agrupar fsyncs; se cierra con cerrar() o cuando
+        # el store deja de usarse (weakref: no retiene la instancia)
+        self._descriptores: Dict[str, int] = {}
+        weakref.finalize(self, _cerrar_diario, self._descriptores)
+        self._offset = 0
+        self._eventos_diario = 0
+        self._firma_snapshot = None
+        self._pendientes_fsync = 0
+        self._ultimo_fsync = time.monotonic()
+
+    # ------------------------------------------------------------------
+    # Bloqueo entre procesos
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def _bloqueo(self, exclusivo: bool):
+        """
+        Lock entre hilos (RLock) y entre procesos (flock sobre .lock). El
+        descriptor del .lock se abre y se cierra en cada operación.
+        """
+        with self._lock:
+            if not FCNTL_AVAILABLE or self._lock_fd is not None:
+                # Sin fcntl, o bloqueo ya tomado por este mismo hilo
+                yield
+                return
+            self._lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+                yield
+            finally:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+
+    def _firma(self):
+        """Identifica la versión del snapshot (cambia al compactar)"""
+        try:
+            st = os.stat(self.snapshot_path)
+            return (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _leer_snapshot(self) -> Dict:
+        """Lee el snapshot o devuelve un progreso inicial"""
+        try:
+            with open(self.snapshot_path, "r") as f:
+                progress = json.load(f)
+            progress.setdefault("completados", [])
+            progress.setdefault("puntos", 0)
+            progress.setdefault("documento_estudiante", "")
+            return progress
+        except (OSError, ValueError):
+            return progreso_inicial()
+
+    def _recargar(self) -> None:
+        """Reconstruye el estado desde el snapshot y todo el diario"""
+        self._firma_snapshot = self._firma()
+        self.progress = self._leer_snapshot()
+        self._offset = 0
+        self._eventos_diario = 0
+        self._aplicar_cola()
+
+    def _aplicar_cola(self) -> bool:
+        """Aplica los eventos del diario escritos desde el último offset"""
+        try:
+            with open(self.journal_path, "rb") as f:
+                f.seek(self._offset)
+                datos = f.read()
+        except FileNotFoundError:
+            return False
+
+        # Ignorar una última línea incompleta (escritura interrumpida)
+        fin = datos.rfind(b"\n") + 1
+        cambio = False
+        for linea in datos[:fin].splitlines():
+            if not linea.strip():
+                continue
+            try:
+                evento = json.loads(linea)
+            except ValueError:
+                continue
+            self._eventos_diario += 1
+            cambio = aplicar_evento(self.progress, evento) or cambio
+        self._offset += fin
+        return cambio
+
+    def _sincronizar(self) -> bool:
+        """Trae los cambios de otros procesos (debe llamarse con el lock)"""
+        try:
+            tamano = os.path.getsize(self.journal_path)
+        except OSError:
+            tamano = 0
+
+        if self._firma() != self._firma_snapshot or tamano < self._offset:
+            anterior = json.dumps(self.progress, sort_keys=True)
+            self._recargar()
+            return json.dumps(self.progress, sort_keys=True) != anterior
+
+        if tamano == self._offset:
+            return False
+        return self._aplicar_cola()
+
+    def cargar(self) -> Dict:
+        """
+        Carga el progreso (snapshot + cola del diario).
+
+        Returns:
+            Diccionario de progreso
+        """
+        with self._bloqueo(exclusivo=False):
+            self._recargar()
+        return self.progress
+
+    def refrescar(self) -> bool:
+        """
+        Aplica los cambios escritos por otros procesos.
+
+        Returns:
+            True si el progreso cambió
+        """
+        with self._bloqueo(exclusivo=False):
+            return self._sincronizar()
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+
+    def _registrar(self, evento: Dict) -> bool:
+        """Sincroniza, aplica y agrega un evento al diario"""
+        return self._registrar_eventos([evento])[0]
+
+    def _registrar_eventos(self, eventos: List[Dict]) -> List[bool]:
+        """
+        Sincroniza, aplica y agrega varios eventos al diario con un solo
+        lock y una sola escritura.
+
+        Returns:
+            Por cada evento, True si cambió el progreso
+        """
+        with self._bloqueo(exclusivo=True):
+            self._sincronizar()
+            aplicados = [aplicar_evento(self.progress, evento) for evento in eventos]
+            nuevos = [evento for evento, aplicado in zip(eventos, aplicados) if aplicado]
+            if not nuevos:
+                return aplicados
+
+            if self._firma_snapshot is None:
+                # Primer evento: fijar el snapshot (y la fecha de inicio)
+                self._compactar()
+            else:
+                self._append(*nuevos)
+
+            if self._eventos_diario >= self.compactar_cada:
+                self._compactar()
+            return aplicados
+
+    def _append(self, *eventos: Dict) -> None:
+        """Agrega líneas al diario en una sola escritura (con el lock exclusivo tomado)"""
+        fd = self._descriptores.get("diario")
+        if fd is None:
+            fd = self._descriptores["diario"] = os.open(
+                self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+
+        # Descartar una línea incompleta dejada por un proceso interrumpido
+        # (tras _sincronizar, todo lo que sigue al offset es una línea rota)
+        if os.fstat(fd).st_size > self._offset:
+            os.truncate(self.journal_path, self._offset)
+
+        lineas = "".join(json.dumps(evento, separators=(",", ":")) + "\n" for evento in eventos)
+        os.write(fd, lineas.encode("utf-8"))
+        self._offset = os.fstat(fd).st_size
+        self._eventos_diario += len(eventos)
+        self._pendientes_fsync += len(eventos)
+
+        if (self._pendientes_fsync >= self.fsync_cada or
+                time.monotonic() - self._ultimo_fsync >= self.fsync_intervalo):
+            self._fsync()
+
+    def _fsync(self) -> None:
+        """Fuerza a disco los eventos pendientes del diario"""
+        fd = self._descriptores.get("diario")
+        if fd is not None and self._pendientes_fsync:
+            os.fsync(fd)
+        self._pendientes_fsync = 0
+        self._ultimo_fsync = time.monotonic()
+
+    def registrar_completado(self, reto_id: int, puntos: int, fecha: Optional[str] = None) -> bool:
+        """
+        Registra un reto completado.
+
+        Args:
+            reto_id: ID del reto
+            puntos: Puntos del reto
+            fecha: Fecha ISO de completado (ahora por defecto)
+
+        Returns:
+            True si se registró, False si ya estaba completado
+        """
+        return self._registrar({
+            "ev": "completado",
+            "reto_id": reto_id,
+            "puntos": puntos,
+            "fecha": fecha or datetime.now().isoformat()
+        })
+
+    def registrar_completados(self, retos: List[Tuple[int, int]],
+                              fecha: Optional[str] = None) -> List[int]:
+        """
+        Registra varios retos completados con una sola escritura del diario.
+
+        Returns:
+            IDs de los retos registrados (sin los que ya estaban completados)
+        """
+        fecha = fecha or datetime.now().isoformat()
+        aplicados = self._registrar_eventos([
+            {"ev": "completado", "reto_id": reto_id, "puntos": puntos, "fecha": fecha}
+            for reto_id, puntos in retos
+        ])
+        return [reto_id for (reto_id, _), aplicado in zip(retos, aplicados) if aplicado]
+
+    def registrar_documento(self, documento: str) -> bool:
+        """
+        Registra el documento del estudiante.
+
+        Returns:
+            True si el documento cambió
+        """
+        return self._registrar({"ev": "documento", "documento": documento})
+
+    # ------------------------------------------------------------------
+    # Compactación
+    # ------------------------------------------------------------------
+
+    def _escribir_snapshot(self, progress: Dict) -> None:
+        """Escribe el snapshot de forma atómica (tmp + fsync + rename)"""
+        tmp = self.snapshot_path.with_suffix(f".tmp{os.getpid()}")
+        with open(tmp, "w") as f:
+            json.dump(progress, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        try:
+            dir_fd = os.open(self.snapshot_path.parent, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+
+    def _compactar(self) -> None:
+        """Vuelca el estado al snapshot y trunca el diario (con el lock)"""
+        self._fsync()
+        self._escribir_snapshot(self.progress)
+        if self.journal_path.exists():
+            os.truncate(self.journal_path, 0)
+        self._firma_snapshot = self._firma()
+        self._offset = 0
+        self._eventos_diario = 0
+
+    def compactar(self) -> Dict:
+        """
+        Compacta el diario en el snapshot.
+
+        Returns:
+            Progreso actualizado
+        """
+        with self._bloqueo(exclusivo=True):
+            self._sincronizar()
+            self._compactar()
+        return self.progress
+
+    def flush(self) -> None:
+        """Fuerza a disco los eventos pendientes"""
+        with self._lock:
+            self._fsync()
+
+    def cerrar(self) -> None:
+        """Hace fsync de lo pendiente y cierra el diario (se reabre si se vuelve a escribir)"""
+        with self._lock:
+            self._pendientes_fsync = 0
+            _cerrar_diario(self._descriptores)
+
+
+# ============================================================================
+# BACKEND SQLITE
+# ============================================================================
+
+# Sentencias reutilizadas: sqlite3 mantiene una caché de sentencias preparadas
+# por conexión indexada por el texto SQL.
+SQL_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS estudiantes (
+    documento TEXT PRIMARY KEY,
+    fecha_inicio TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS completados (
+    documento TEXT NOT NULL,
+    reto_id INTEGER NOT NULL,
+    puntos INTEGER NOT NULL,
+    fecha TEXT NOT NULL,
+    PRIMARY KEY (documento, reto_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS puntajes (
+    documento TEXT PRIMARY KEY,
+    puntos INTEGER NOT NULL DEFAULT 0,
+    completados INTEGER NOT NULL DEFAULT 0,
+    ultima_fecha TEXT NOT NULL DEFAULT ''
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_puntajes_ranking
+    ON puntajes (puntos DESC, ultima_fecha ASC);
+
+-- 'revision' se incrementa en la misma transacción que cada escritura;
+-- 'documento_activo' es el último documento registrado con setup
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor NOT NULL
+) WITHOUT ROWID;
+
+INSERT OR IGNORE INTO meta (clave, valor) VALUES ('revision', 0);
+"""
+
+SQL_INSERTAR_ESTUDIANTE = "INSERT OR IGNORE INTO estudiantes (documento, fecha_inicio) VALUES (?, ?)"
+SQL_INSERTAR_PUNTAJE = "INSERT OR IGNORE INTO puntajes (documento) VALUES (?)"
+SQL_INSERTAR_COMPLETADO = (
+    "INSERT OR IGNORE INTO completados (documento, reto_id, puntos, fecha) VALUES (?, ?, ?, ?)"
+)
+SQL_SUMAR_PUNTAJE = (
+    "UPDATE puntajes SET puntos = puntos + ?, completados = completados + 1, "
+    "ultima_fecha = MAX(ultima_fecha, ?) WHERE documento = ?"
+)
+SQL_SUBIR_REVISION = "UPDATE meta SET valor = valor + 1 WHERE clave = 'revision'"
+SQL_REVISION = "SELECT valor FROM meta WHERE clave = 'revision'"
+SQL_GUARDAR_META = "INSERT OR REPLACE INTO meta (clave, valor) VALUES (?, ?)"
+SQL_LEER_META = "SELECT valor FROM meta WHERE clave = ?"
+SQL_ESTUDIANTE = "SELECT fecha_inicio FROM estudiantes WHERE documento = ?"
+SQL_COMPLETADOS = "SELECT reto_id, puntos, fecha FROM completados WHERE documento = ? ORDER BY fecha, reto_id"
+SQL_LEADERBOARD = (
+    "SELECT documento, puntos, completados FROM puntajes "
+    "ORDER BY puntos DESC, ultima_fecha ASC LIMIT ?"
+)
+
+
+class SQLiteProgressBackend:
+    """
+    Progreso de todos los estudiantes en una base SQLite en modo WAL,
+    indexada por (documento, reto_id). Usa una conexión por hilo para
+    permitir lecturas concurrentes con un escritor.
+    """
+
+    def __init__(self, db_path):
+        """
+        Args:
+            db_path: Ruta del archivo SQLite
+        """
+        self.db_path = str(db_path)
+        self._local = threading.local()
+        conexion = self._conexion()
+        conexion.executescript(SQL_ESQUEMA)
+
+    def _conexion(self) -> sqlite3.Connection:
+        """Conexión del hilo actual (se crea y configura la primera vez)"""
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.db_path, timeout=10.0, cached_statements=64,
+                                       isolation_level=None, check_same_thread=False)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            conexion.execute("PRAGMA busy_timeout=10000")
+            self._local.conexion = conexion
+        return conexion
+
+    def revision(self) -> int:
+        """
+        Revisión de los datos: se incrementa en la misma transacción que
+        cada escritura, desde cualquier conexión o proceso.
+        """
+        return self._conexion().execute(SQL_REVISION).fetchone()[0]
+
+    def documento_activo(self) -> str:
+        """Último documento registrado con setup ('' si no hay)"""
+        fila = self._conexion().execute(SQL_LEER_META, ("documento_activo",)).fetchone()
+        return fila[0] if fila else ""
+
+    def registrar_estudiante(self, documento: str, fecha_inicio: Optional[str] = None,
+                             activo: bool = False) -> None:
+        """
+        Da de alta un estudiante si no existe.
+
+        Args:
+            documento: Documento del estudiante
+            fecha_inicio: Fecha ISO de inicio (ahora por defecto)
+            activo: Guardarlo como documento activo (el que usa el CLI por defecto)
+        """
+        conexion = self._conexion()
+        with conexion:
+            conexion.execute("BEGIN IMMEDIATE")
+            cursor = conexion.execute(SQL_INSERTAR_ESTUDIANTE,
+                                      (documento, fecha_inicio or datetime.now().isoformat()))
+            if cursor.rowcount == 1:
+                conexion.execute(SQL_INSERTAR_PUNTAJE, (documento,))
+                conexion.execute(SQL_SUBIR_REVISION)
+            if activo:
+                conexion.execute(SQL_GUARDAR_META, ("documento_activo", documento))
+
+    def registrar_completado(self, documento: str, reto_id: int, puntos: int,
+                             fecha: Optional[str] = None) -> bool:
+        """
+        Registra un reto completado en una sola transacción.
+
+        Returns:
+            True si se registró, False si ya estaba completado
+        """
+        fecha = fecha or datetime.now().isoformat()
+        conexion = self._conexion()
+        with conexion:
+            conexion.execute("BEGIN IMMEDIATE")
+            conexion.execute(SQL_INSERTAR_ESTUDIANTE, (documento, fecha))
+            conexion.execute(SQL_INSERTAR_PUNTAJE, (documento,))
+            cursor = conexion.execute(SQL_INSERTAR_COMPLETADO, (documento, reto_id, puntos, fecha))
+            if cursor.rowcount != 1:
+                return False
+            conexion.execute(SQL_SUMAR_PUNTAJE, (puntos, fecha, documento))
+            conexion.execute(SQL_SUBIR_REVISION)
+        return True
+
+    def registrar_completados(self, documento: str, retos: List[Tuple[int, int]],
+                              fecha: Optional[str] = None) -> List[int]:
+        """
+        Registra varios retos completados en una sola transacción.
+
+        Returns:
+            IDs de los retos registrados (sin los que ya estaban completados)
+        """
+        fecha = fecha or datetime.now().isoformat()
+        registrados = []
+        conexion = self._conexion()
+        with conexion:
+            conexion.execute("BEGIN IMMEDIATE")
+            conexion.execute(SQL_INSERTAR_ESTUDIANTE, (documento, fecha))
+            conexion.execute(SQL_INSERTAR_PUNTAJE, (documento,))
+            for reto_id, puntos in retos:
+                cursor = conexion.execute(SQL_INSERTAR_COMPLETADO, (documento, reto_id, puntos, fecha))
+                if cursor.rowcount == 1:
+                    conexion.execute(SQL_SUMAR_PUNTAJE, (puntos, fecha, documento))
+                    registrados.append(reto_id)
+            if registrados:
+                conexion.execute(SQL_SUBIR_REVISION)
+        return registrados
+
+    def estado(self, documento: str) -> Dict:
+        """
+        Progreso de un estudiante en el formato histórico del archivo JSON.
+
+        Returns:
+            Diccionario de progreso (vacío si el estudiante no existe)
+        """
+        conexion = self._conexion()
+        fila = conexion.execute(SQL_ESTUDIANTE, (documento,)).fetchone()
+        progress = progreso_inicial()
+        progress["documento_estudiante"] = documento
+        if fila:
+            progress["fecha_inicio"] = fila[0]
+        for reto_id, puntos, fecha in conexion.execute(SQL_COMPLETADOS, (documento,)):
+            progress["completados"].append(reto_id)
+            progress["puntos"] += puntos
+            progress[f"reto_{reto_id}_fecha"] = fecha
+        return progress
+
+    def leaderboard(self, limite: int = 10) -> List[Dict]:
+        """Ranking de estudiantes por puntos (desempate: quién llegó primero)"""
+        return [
+            {"rank": i + 1, "documento": documento, "puntos": puntos, "completados": completados}
+            for i, (documento, puntos, completados)
+            in enumerate(self._conexion().execute(SQL_LEADERBOARD, (limite,)))
+        ]
+
+    def importar_progreso(self, progress: Dict, puntos_por_reto: Dict[int, int]) -> Optional[str]:
+        """
+        Importa un progreso en formato JSON (idempotente).
+
+        Args:
+            progress: Progreso en el formato del archivo JSON
+            puntos_por_reto: Puntos de cada reto (el JSON solo guarda el total)
+
+        Returns:
+            Documento importado o None si el progreso no tiene documento
+        """
+        documento = progress.get("documento_estudiante")
+        if not documento:
+            return None
+        self.registrar_estudiante(documento, progress.get("fecha_inicio"))
+        for reto_id in progress.get("completados", []):
+            fecha = progress.get(f"reto_{reto_id}_fecha") or progress.get("fecha_inicio")
+            self.registrar_completado(documento, reto_id, puntos_por_reto.get(reto_id, 0), fecha)
+        return documento
+
+    def para_estudiante(self, documento: str = "") -> "SQLiteProgressStore":
+        """Vista ProgressStore de un estudiante"""
+        return SQLiteProgressStore(self, documento)
+
+
+class SQLiteProgressStore(ProgressStore):
+    """Adaptador ProgressStore de un estudiante sobre SQLiteProgressBackend"""
+
+    def __init__(self, backend: SQLiteProgressBackend, documento: str = ""):
+        self.backend = backend
+        self.documento = documento
+        self.progress: Dict = progreso_inicial()
+        self._revision = None
+
+    def cargar(self) -> Dict:
+        """Carga el progreso del estudiante desde la base"""
+        # La revisión se lee antes que los datos: una escritura intermedia
+        # solo provoca una relectura de más, nunca una que falte
+        self._revision = self.backend.revision()
+        if self.documento:
+            self.progress = self.backend.estado(self.documento)
+        else:
+            self.progress = progreso_inicial()
+        return self.progress
+
+    def refrescar(self) -> bool:
+        """Relee el progreso solo si alguna escritura cambió la revisión de la base"""
+        if self.backend.revision() == self._revision:
+            return False
+        anterior = self.progress
+        self.cargar()
+        return self.progress != anterior
+
+    def registrar_completado(self, reto_id: int, puntos: int, fecha: Optional[str] = None) -> bool:
+        """Registra un reto completado del estudiante"""
+        registrado = self.backend.registrar_completado(self.documento, reto_id, puntos, fecha)
+        self.cargar()
+        return registrado
+
+    def registrar_completados(self, retos: List[Tuple[int, int]],
+                              fecha: Optional[str] = None) -> List[int]:
+        """Registra varios retos completados del estudiante en una transacción"""
+        registrados = self.backend.registrar_completados(self.documento, retos, fecha)
+        self.cargar()
+        return registrados
+
+    def registrar_documento(self, documento: str) -> bool:
+        """
+        Asocia el store a un documento, lo da de alta en la base y lo guarda
+        como documento activo para las próximas ejecuciones del CLI.
+        """
+        if documento == self.documento:
+            return False
+        self.documento = documento
+        self.backend.registrar_estudiante(documento, activo=True)
+        self.cargar()
+        return True
+
+    def leaderboard(self, limite: int = 10) -> List[Dict]:
+        """Ranking de todos los estudiantes de la base"""
+        return self.backend.leaderboard(limite)
+
+
+def crear_progress_store(progress_file, documento: str = "") -> ProgressStore:
+    """
+    Crea el backend de progreso configurado por variables de entorno.
+
+    DOCKER_CTF_PROGRESS_BACKEND: 'json' (por defecto) o 'sqlite'
+    DOCKER_CTF_PROGRESS_DB: ruta de la base SQLite (~/.docker_ctf_progress.db)
+    DOCKER_CTF_DOCUMENTO: documento del estudiante para el backend SQLite
+        (si no se indica, el último registrado con setup en la base)
+
+    Args:
+        progress_file: Ruta del snapshot JSON (backend por defecto)
+        documento: Documento del estudiante (backend SQLite)
+    """
+    backend = os.getenv("DOCKER_CTF_PROGRESS_BACKEND", "json").lower()
+
+    if backend == "sqlite":
+        db_path = os.getenv("DOCKER_CTF_PROGRESS_DB", str(Path.home() / ".docker_ctf_progress.db"))
+        base = SQLiteProgressBackend(db_path)
+        return base.para_estudiante(
+            documento or os.getenv("DOCKER_CTF_DOCUMENTO", "") or base.documento_activo()
+        )
+
+    return JsonProgressStore(progress_file)
+
+
+def importar_archivos_json(db_path, archivos: List[str]) -> int:
+    """
+    Importa archivos de progreso JSON (con su diario) a una base SQLite.
+
+    Returns:
+        Cantidad de estudiantes importados
+    """
+    from challenge_packs import cargar_pack
+
+    backend = SQLiteProgressBackend(db_path)
+    puntos_por_reto = {reto.id: reto.puntos for reto in cargar_pack().retos}
+    importados = 0
+
+    for archivo in archivos:
+        try:
+            progress = JsonProgressStore(archivo).cargar()
+            documento = backend.importar_progreso(progress, puntos_por_reto)
+        except Exception as e:
+            print(f"   ❌ {archivo}: {e}")
+            continue
+
+        if documento:
+            print(f"   ✅ {archivo}: {documento} ({len(progress.get('completados', []))} retos)")
+            importados += 1
+        else:
+            print(f"   ⚠️  {archivo}: sin documento de estudiante, omitido")
+
+    return importados
+
+
+def main():
+    """Herramienta de migración de progreso JSON a SQLite"""
+    if len(sys.argv) < 4 or sys.argv[1] != "importar":
+        print("\nUso:\n    python3 progress_store.py importar <base.db> <progreso.json> [...]\n")
+        sys.exit(1)
+
+    print(f"\n📥 Importando progreso a {sys.argv[2]}...")
+    importados = importar_archivos_json(sys.argv[2], sys.argv[3:])
+    print(f"\n✅ {importados} estudiantes importados\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Docker CTF Lab - Trabajos de Verificación
+Ejecuta las verificaciones contra Docker en un pool acotado de hilos, para
+que el dashboard responda al instante con un id de trabajo en lugar de
+quedar esperando al daemon de Docker.
+
+Cada trabajo tiene un plazo: si se vence (o se cancela) su resultado se
+descarta y el trabajo no debe producir efectos. Antes de producirlos la
+tarea reclama el trabajo (TrabajoVerificacion.reclamar): desde ese momento
+ya no se vence ni se cancela, y su resultado siempre se entrega.
+Los trabajos repetidos del mismo tipo, estudiante y reto se deduplican.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+ESTADO_PENDIENTE = "pendiente"
+ESTADO_EJECUTANDO = "ejecutando"
+# Reclamado por la tarea: está produciendo efectos, el plazo ya no lo vence
+ESTADO_CONFIRMADO = "confirmado"
+ESTADO_TERMINADO = "terminado"
+ESTADO_CANCELADO = "cancelado"
+ESTADO_VENCIDO = "vencido"
+ESTADO_ERROR = "error"
+
+ESTADOS_ACTIVOS = (ESTADO_PENDIENTE, ESTADO_EJECUTANDO)
+
+
+class ColaLlena(Exception):
+    """No se aceptan más trabajos hasta que terminen los activos"""
+
+
+class TrabajoVerificacion:
+    """Un trabajo del pool: estado, resultado y plazo"""
+
+    def __init__(self, tipo: str, clave: Hashable, plazo: float, datos: Optional[Dict] = None):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.clave = clave
+        self.datos = datos or {}
+        self.estado = ESTADO_PENDIENTE
+        self.resultado = None
+        self.error = ""
+        self.vence = time.monotonic() + plazo
+        self.terminado_en: Optional[float] = None
+        self._listo = threading.Event()
+        self._future = None
+        # Lock del gestor (lo asigna GestorTrabajos.enviar)
+        self._cond = threading.Condition()
+
+    def vigente(self) -> bool:
+        """
+        True mientras el trabajo no fue cancelado ni se venció su plazo.
+        Las tareas lo consultan antes de producir efectos (p. ej. registrar
+        el progreso) después de una espera larga.
+        """
+        return self.estado in ESTADOS_ACTIVOS and time.monotonic() < self.vence
+
+    def reclamar(self) -> bool:
+        """
+        Marca atómicamente (respecto del vigilante de plazos y de la
+        cancelación) que la tarea va a producir efectos. Se llama justo
+        antes de escribir el progreso.
+
+        Returns:
+            True si el trabajo seguía vigente: ya no se vencerá ni se podrá
+            cancelar, y su resultado se entregará. False si ya se venció o se
+            canceló (la tarea no debe producir efectos).
+        """
+        with self._cond:
+            if not self.vigente():
+                return False
+            self.estado = ESTADO_CONFIRMADO
+            return True
+
+    def esperar(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que el trabajo termine; True si terminó"""
+        return self._listo.wait(timeout)
+
+    def a_dict(self) -> Dict:
+        """Estado del trabajo para la API"""
+        datos = {
+            "job_id": self.id,
+            "tipo": self.tipo,
+            "estado": self.estado,
+            "resultado": self.resultado
+        }
+        datos.update(self.datos)
+        if self.error:
+            datos["error"] = self.error
+        return datos
+
+
+class GestorTrabajos:
+    """
+    Pool acotado de trabajos de verificación con plazos, cancelación y
+    deduplicación por clave.
+    """
+
+    def __init__(self, workers: int = 4, max_activos: int = 64, plazo: float = 15.0,
+                 retencion: float = 300.0,
+                 on_terminado: Optional[Callable[[TrabajoVerificacion], None]] = None):
+        """
+        Args:
+            workers: Hilos del pool (verificaciones simultáneas contra Docker)
+            max_activos: Máximo de trabajos pendientes o en ejecución
+            plazo: Segundos que tiene cada trabajo para terminar
+            retencion: Segundos que se guarda un trabajo terminado para consultarlo
+            on_terminado: Callback invocado al terminar cada trabajo (cualquier estado)
+        """
+        self.max_activos = max_activos
+        self.plazo = plazo
+        self.retencion = retencion
+        self.on_terminado = on_terminado
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="verificacion")
+        self._cond = threading.Condition()
+        self._trabajos: Dict[str, TrabajoVerificacion] = {}
+        self._activos: Dict[Hashable, TrabajoVerificacion] = {}
+        self._vigilante: Optional[threading.Thread] = None
+        self._contadores = {"enviados": 0, "deduplicados": 0, "rechazados": 0,
+                            ESTADO_TERMINADO: 0, ESTADO_CANCELADO: 0, ESTADO_VENCIDO: 0, ESTADO_ERROR: 0}
+
+    def enviar(self, tipo: str, clave: Hashable,
+               tarea: Callable[[TrabajoVerificacion], object],
+               datos: Optional[Dict] = None) -> Tuple[TrabajoVerificacion, bool]:
+        """
+        Encola un trabajo, o devuelve el que ya está activo con la misma clave.
+
+        Args:
+            tipo: Tipo de trabajo (ej: "verify", "submit")
+            clave: Identifica trabajos equivalentes (ej: (tipo, documento, reto_id))
+            tarea: Función (trabajo) -> resultado, ejecutada en el pool
+            datos: Campos extra para a_dict() (ej: reto_id)
+
+        Returns:
+            Tupla (trabajo, nuevo)
+
+        Raises:
+            ColaLlena: Si ya hay max_activos trabajos activos
+        """
+        with self._cond:
+            self._purgar()
+            existente = self._activos.get(clave)
+            if existente is not None:
+                self._contadores["deduplicados"] += 1
+                return existente, False
+            if len(self._activos) >= self.max_activos:
+                self._contadores["rechazados"] += 1
+                raise ColaLlena(f"hay {len(self._activos)} verificaciones en curso")
+
+            trabajo = TrabajoVerificacion(tipo, clave, self.plazo, datos)
+            trabajo._cond = self._cond
+            self._trabajos[trabajo.id] = trabajo
+            self._activos[clave] = trabajo
+            self._contadores["enviados"] += 1
+            trabajo._future = self._pool.submit(self._ejecutar, trabajo, tarea)
+            self._iniciar_vigilante()
+            self._cond.notify_all()
+        return trabajo, True
+
+    def obtener(self, trabajo_id: str) -> Optional[TrabajoVerificacion]:
+        """Trabajo por id (activo o terminado hace menos de `retencion`)"""
+        with self._cond:
+            return self._trabajos.get(trabajo_id)
+
+    def cancelar(self, trabajo_id: str) -> bool:
+        """
+        Cancela un trabajo activo. Si todavía no empezó no se ejecuta; si
+        está en ejecución su resultado se descarta.
+
+        Returns:
+            True si el trabajo estaba activo
+        """
+        with self._cond:
+            trabajo = self._trabajos.get(trabajo_id)
+            if trabajo is None or trabajo.estado not in ESTADOS_ACTIVOS:
+                return False
+            trabajo._future.cancel()
+            self._finalizar(trabajo, ESTADO_CANCELADO)
+        self._notificar(trabajo)
+        return True
+
+    def estadisticas(self) -> Dict:
+        """Contadores del gestor"""
+        with self._cond:
+            datos = dict(self._contadores)
+            datos["activos"] = len(self._activos)
+        return datos
+
+    def cerrar(self) -> None:
+        """Cancela lo pendiente y deja de aceptar trabajos"""
+        with self._cond:
+            for trabajo in list(self._activos.values()):
+                trabajo._future.cancel()
+                self._finalizar(trabajo, ESTADO_CANCELADO)
+            self._cond.notify_all()
+        self._pool.shutdown(wait=False)
+
+    def _ejecutar(self, trabajo: TrabajoVerificacion, tarea) -> None:
+        with self._cond:
+            if trabajo.estado != ESTADO_PENDIENTE:
+                return
+            if time.monotonic() >= trabajo.vence:
+                # Esperó en la cola más que su plazo: ya no vale la pena
+                self._finalizar(trabajo, ESTADO_VENCIDO)
+                notificar = True
+            else:
+                trabajo.estado = ESTADO_EJECUTANDO
+                notificar = False
+        if notificar:
+            self._notificar(trabajo)
+            return
+
+        try:
+            resultado, estado, error = tarea(trabajo), ESTADO_TERMINADO, ""
+        except Exception as e:
+            resultado, estado, error = None, ESTADO_ERROR, str(e)
+
+        with self._cond:
+            if trabajo.estado not in (ESTADO_EJECUTANDO, ESTADO_CONFIRMADO):
+                # Cancelado o vencido mientras corría: se descarta el resultado
+                return
+            if (estado == ESTADO_TERMINADO and trabajo.estado == ESTADO_EJECUTANDO
+                    and time.monotonic() >= trabajo.vence):
+                resultado, estado = None, ESTADO_VENCIDO
+            self._finalizar(trabajo, estado, resultado, error)
+        self._notificar(trabajo)
+
+    def _finalizar(self, trabajo: TrabajoVerificacion, estado: str,
+                   resultado=None, error: str = "") -> None:
+        """Marca el trabajo como terminado (bajo el lock)"""
+        trabajo.estado = estado
+        trabajo.resultado = resultado
+        trabajo.error = error
+        trabajo.terminado_en = time.monotonic()
+        if self._activos.get(trabajo.clave) is trabajo:
+            del self._activos[trabajo.clave]
+        self._contadores[estado] += 1
+        trabajo._listo.set()
+
+    def _notificar(self, trabajo: TrabajoVerificacion) -> None:
+        """Invoca el callback de terminado sin propagar sus errores"""
+        if self.on_terminado is None:
+            return
+        try:
+            self.on_terminado(trabajo)
+        except Exception as e:
+            print(f"⚠️  Error notificando trabajo de verificación: {e}")
+
+    def _purgar(self) -> None:
+        """Olvida los trabajos terminados hace más de `retencion` (bajo el lock)"""
+        limite = time.monotonic() - self.retencion
+        viejos = [
+            trabajo_id for trabajo_id, trabajo in self._trabajos.items()
+            if trabajo.terminado_en is not None and trabajo.terminado_en < limite
+        ]
+        for trabajo_id in viejos:
+            del self._trabajos[trabajo_id]
+
+    def _iniciar_vigilante(self) -> None:
+        if self._vigilante is None:
+            self._vigilante = threading.Thread(target=self._vigilar_plazos, name="verificacion-plazos", daemon=True)
+            self._vigilante.start()
+
+    def _vigilar_plazos(self) -> None:
+        """
+        Vence los trabajos que pasaron su plazo aunque sigan corriendo (una
+        llamada a Docker no se puede interrumpir; su resultado se descarta).
+        Los trabajos reclamados no se vencen.
+        """
+        while True:
+            vencidos = []
+            with self._cond:
+                ahora = time.monotonic()
+                con_plazo = [t for t in self._activos.values() if t.estado in ESTADOS_ACTIVOS]
+                for trabajo in con_plazo:
+                    if ahora >= trabajo.vence:
+                        self._finalizar(trabajo, ESTADO_VENCIDO)
+                        vencidos.append(trabajo)
+                if not vencidos:
+                    proximo = min((t.vence for t in con_plazo), default=None)
+                    self._cond.wait(None if proximo is None else max(proximo - ahora, 0.01))
+            for trabajo in vencidos:
+                self._notificar(trabajo)
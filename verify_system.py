@@ -85,6 +85,13 @@ def check_files():
     print("\n📄 Verificando archivos del sistema...")
     required_files = {
         'docker_challenge.py': 'Sistema principal de retos',
+        'challenge_packs.py': 'Cargador de packs de retos',
+        'progress_store.py': 'Almacenamiento de progreso',
+        'mqtt_outbox.py': 'Cola de eventos MQTT',
+        'lab_daemon.py': 'Daemon del laboratorio',
+        'writeup.py': 'Write-up del taller',
+        'verification_jobs.py': 'Trabajos de verificación',
+        'retos/docker_ctf_lab.json': 'Pack de retos por defecto',
         'web_dashboard.py': 'Servidor web',
         'templates/index.html': 'Dashboard HTML',
         'requirements.txt': 'Dependencias',
@@ -137,10 +144,10 @@ def check_configuration():
         print("   ✅ Laboratorio configurado")
         
         if progress_file.exists():
-            import json
             try:
-                with open(progress_file, 'r') as f:
-                    progress = json.load(f)
+                # Snapshot JSON + diario de eventos
+                from progress_store import JsonProgressStore
+                progress = JsonProgressStore(progress_file).cargar()
                 completados = len(progress.get('completados', []))
                 puntos = progress.get('puntos', 0)
                 documento = progress.get('documento_estudiante', 'No configurado')
@@ -161,6 +168,39 @@ def check_configuration():
         return True  # No es crítico
 
 
+def check_startup_time():
+    """Verifica que los comandos rápidos del CLI respeten el presupuesto de arranque"""
+    print("\n⏱️  Verificando tiempo de arranque del CLI...")
+    import time
+    
+    presupuesto_ms = 100
+    
+    def medir(args):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable] + args, capture_output=True, timeout=30)
+        return (time.perf_counter() - inicio) * 1000
+    
+    try:
+        # Descontar el arranque del intérprete (no depende del laboratorio)
+        base_ms = min(medir(['-c', 'pass']) for _ in range(3))
+        
+        all_ok = True
+        for comando in (['hint', '1'], ['status'], ['start']):
+            total_ms = min(medir(['docker_challenge.py'] + comando) for _ in range(3))
+            extra_ms = total_ms - base_ms
+            nombre = ' '.join(comando)
+            if extra_ms <= presupuesto_ms:
+                print(f"   ✅ '{nombre}': {extra_ms:.0f} ms (presupuesto {presupuesto_ms} ms)")
+            else:
+                print(f"   ⚠️  '{nombre}': {extra_ms:.0f} ms (presupuesto {presupuesto_ms} ms)")
+                all_ok = False
+        
+        return all_ok
+    except (OSError, subprocess.TimeoutExpired):
+        print("   ⚠️  No se pudo medir el tiempo de arranque")
+        return False
+
+
 def check_ports():
     """Verifica disponibilidad del puerto 5000"""
     print("\n🔌 Verificando puertos...")
@@ -221,6 +261,7 @@ def main():
         'Archivos': check_files(),
         'Permisos': check_permissions(),
         'Configuración': check_configuration(),
+        'Arranque CLI': check_startup_time(),
         'Puertos': check_ports()
     }
     
@@ -3,64 +3,454 @@
 """
 Docker CTF Lab - Web Dashboard
 Servidor Flask para interfaz web del laboratorio
+
+Desarrollo:  python3 web_dashboard.py
+Producción:  gunicorn -k gthread -w 4 --threads 16 -b 0.0.0.0:5000 'web_dashboard:create_app()'
 """
 
-import subprocess
+import hashlib
 import json
-import re
-from flask import Flask, render_template, request, jsonify
-from docker_challenge import DockerChallenge
-
-app = Flask(__name__)
-challenge = DockerChallenge()
-
-# Mapeo de IDs de retos a textos base para generación de flags UUID
-# Debe coincidir exactamente con el usado en docker_challenge.py
-FLAG_BASES = {
-    1: "primer_contenedor",
-    2: "imagen_descargada",
-    3: "contenedor_background",
-    4: "puerto_mapeado",
-    5: "volumen_creado",
-    6: "red_creada",
-    7: "contenedores_conectados",
-    8: "ssh_configurado",
-    9: "telnet_activo",
-    10: "scada_desplegado",
-    11: "vnc_funcionando",
-    12: "dockerfile_creado",
-    13: "compose_desplegado",
-    14: "inspeccion_exitosa",
-    15: "limpieza_completa"
-}
-
-
-@app.route('/')
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from flask import Blueprint, Flask, Response, current_app, render_template, request, jsonify
+from docker_challenge import (
+    DockerChallenge,
+    VERIFICACION_SIN_DOCUMENTO,
+    VERIFICACION_FLAG_INVALIDA,
+    VERIFICACION_YA_COMPLETADO,
+    VERIFICACION_POR_VERIFICAR,
+)
+from verification_jobs import (
+    ColaLlena,
+    GestorTrabajos,
+    ESTADO_CANCELADO,
+    ESTADO_CONFIRMADO,
+    ESTADO_ERROR,
+    ESTADO_TERMINADO,
+    ESTADO_VENCIDO,
+)
+from writeup import WriteupTaller
+
+bp = Blueprint("dashboard", __name__)
+
+# Streams SSE (/api/stream): máximo de conexiones simultáneas por proceso,
+# intervalo del keep-alive y cada cuánto se revisa el progreso escrito por
+# otros procesos. Cada stream abierto ocupa un hilo del worker, así que el
+# máximo se deriva de los hilos por worker (--threads de gunicorn, indicado en
+# DOCKER_CTF_THREADS) dejando 4 libres para las páginas y la API: con el
+# despliegue documentado (--threads 16) son 12 streams por worker.
+SERVER_THREADS = int(os.getenv("DOCKER_CTF_THREADS", "16"))
+SSE_MAX_STREAMS = int(os.getenv("DOCKER_CTF_SSE_MAX_STREAMS", str(max(SERVER_THREADS - 4, 1))))
+SSE_KEEPALIVE = 15.0
+SSE_INTERVALO_PROGRESO = 2.0
+# Sin watcher de eventos Docker, la verificación se recalcula cada tanto
+SSE_INTERVALO_VERIFICACION = 10.0
+
+# Trabajos de verificación contra Docker: hilos del pool, plazo de cada
+# trabajo (segundos) y máximo de trabajos en curso
+JOBS_WORKERS = int(os.getenv("DOCKER_CTF_JOB_WORKERS", "4"))
+JOBS_PLAZO = float(os.getenv("DOCKER_CTF_JOB_PLAZO", "15"))
+JOBS_MAX = int(os.getenv("DOCKER_CTF_JOB_MAX", "64"))
+MENSAJE_VENCIDO = "⏱️  Docker tardó demasiado en responder. Intenta de nuevo en unos segundos."
+
+# Máximo de flags por envío en lote (/api/submit-batch)
+BATCH_MAX_FLAGS = int(os.getenv("DOCKER_CTF_BATCH_MAX_FLAGS", "50"))
+
+
+class CacheRespuestas:
+    """
+    Cuerpos JSON ya serializados por endpoint, válidos mientras no cambie
+    la revisión del progreso. El ETag (fuerte) es el SHA-1 del cuerpo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[int, bytes, str]] = {}
+
+    def obtener(self, nombre: str, revision: int, generar: Callable[[], bytes]) -> Tuple[bytes, str]:
+        """Devuelve (cuerpo, etag) de la revisión, generándolo si hace falta"""
+        guardado = self._cache.get(nombre)
+        if guardado and guardado[0] == revision:
+            return guardado[1], guardado[2]
+
+        cuerpo = generar()
+        etag = hashlib.sha1(cuerpo).hexdigest()
+        with self._lock:
+            self._cache[nombre] = (revision, cuerpo, etag)
+        return cuerpo, etag
+
+
+def respuesta_cacheada(nombre: str, generar: Callable[[], object]) -> Response:
+    """
+    Respuesta JSON cacheada por revisión del progreso con ETag; las
+    peticiones con If-None-Match que coincide reciben 304 sin cuerpo.
+    
+    Args:
+        nombre: Clave del endpoint en la caché
+        generar: Devuelve los datos a serializar o el JSON ya serializado (str)
+    """
+    def serializar() -> bytes:
+        datos = generar()
+        if isinstance(datos, str):
+            return datos.encode("utf-8")
+        return current_app.json.dumps(datos).encode("utf-8")
+    
+    # Leer la revisión antes de generar: si el progreso cambia mientras
+    # tanto, la próxima petición ve una revisión nueva y regenera
+    revision = challenge.revision_progreso
+    cuerpo, etag = cache_respuestas.obtener(nombre, revision, serializar)
+    
+    respuesta = Response(cuerpo, mimetype="application/json")
+    respuesta.set_etag(etag)
+    # El navegador debe revalidar siempre (la respuesta cambia con el progreso)
+    respuesta.headers["Cache-Control"] = "no-cache"
+    return respuesta.make_conditional(request)
+
+
+class CanalEventos:
+    """
+    Eventos que se envían por los streams SSE. Cada evento lleva un id
+    creciente y se guarda en un historial acotado para que un cliente que
+    se reconecta (cabecera Last-Event-ID) reciba lo que se perdió.
+    """
+
+    def __init__(self, capacidad: int = 256, max_suscriptores: int = SSE_MAX_STREAMS):
+        # Los ids solo valen en el proceso que los generó: con varios workers
+        # el navegador puede reconectarse a otro y debe resincronizarse
+        self.instancia = f"{os.getpid():x}{int(time.time()):x}"
+        self._cond = threading.Condition()
+        self._historial = deque(maxlen=capacidad)
+        self._ultimo_id = 0
+        self.max_suscriptores = max_suscriptores
+        self.suscriptores = 0
+
+    @property
+    def ultimo_id(self) -> int:
+        return self._ultimo_id
+
+    def publicar(self, tipo: str, datos: object) -> int:
+        """Agrega un evento y despierta a los streams; devuelve su id"""
+        cuerpo = json.dumps(datos, sort_keys=True)
+        with self._cond:
+            self._ultimo_id += 1
+            self._historial.append((self._ultimo_id, tipo, cuerpo))
+            self._cond.notify_all()
+            return self._ultimo_id
+
+    def id_evento(self, evento_id: int) -> str:
+        """Id de un evento tal como se envía al navegador"""
+        return f"{self.instancia}.{evento_id}"
+
+    def leer_id(self, texto: Optional[str]) -> Optional[int]:
+        """Id local de un Last-Event-ID; None si no es de este proceso"""
+        instancia, _, numero = (texto or "").partition(".")
+        if instancia != self.instancia or not numero.isdigit():
+            return None
+        return int(numero)
+
+    def pendientes(self, desde_id: int) -> Optional[List[Tuple[int, str, str]]]:
+        """
+        Eventos posteriores a desde_id.
+        
+        Returns:
+            Lista de (id, tipo, datos JSON), o None si el cliente debe
+            resincronizarse (el id ya salió del historial)
+        """
+        with self._cond:
+            return self._pendientes(desde_id)
+
+    def esperar(self, desde_id: int, timeout: float) -> Optional[List[Tuple[int, str, str]]]:
+        """Como pendientes(), pero espera hasta timeout a que haya eventos nuevos"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._ultimo_id != desde_id, timeout)
+            return self._pendientes(desde_id)
+
+    def _pendientes(self, desde_id: int) -> Optional[List[Tuple[int, str, str]]]:
+        if desde_id == self._ultimo_id:
+            return []
+        if desde_id > self._ultimo_id or not self._historial or self._historial[0][0] > desde_id + 1:
+            return None
+        return [evento for evento in self._historial if evento[0] > desde_id]
+
+    def suscribir(self) -> bool:
+        """Reserva un stream; False si se alcanzó el máximo"""
+        with self._cond:
+            if self.suscriptores >= self.max_suscriptores:
+                return False
+            self.suscriptores += 1
+            return True
+
+    def desuscribir(self) -> None:
+        with self._cond:
+            self.suscriptores -= 1
+
+
+# ============================================================================
+# ESTADO POR PROCESO
+# ============================================================================
+# Cada proceso (el servidor de desarrollo o cada worker de gunicorn) arma su
+# propio DockerChallenge en la primera petición: el cliente Docker, el watcher
+# y la sesión MQTT no sobreviven a un fork. Lo que comparten los procesos es el
+# progress store; cada petición trae los cambios de los demás
+# (refrescar_progreso) y eso invalida las cachés locales por revisión.
+
+challenge: Optional[DockerChallenge] = None
+cache_respuestas: Optional[CacheRespuestas] = None
+canal_eventos: Optional[CanalEventos] = None
+gestor_trabajos: Optional[GestorTrabajos] = None
+RETOS_ESTATICOS: Dict[int, str] = {}
+TOTAL_PUNTOS = 0
+
+# Último estado publicado por el canal (para detectar qué cambió)
+_lock_publicacion = threading.Lock()
+_publicado: Dict = {}
+
+_pid_proceso = None
+_lock_proceso = threading.Lock()
+
+# Write-up del taller: no depende del estudiante, se comparte entre hilos
+writeup_taller = WriteupTaller(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'TALLER.md'))
+
+
+def _datos_progreso() -> Dict:
+    """Progreso del estudiante (mismo formato que /api/progress)"""
+    return {
+        "documento": challenge.documento_estudiante,
+        "completados": challenge.progress.get("completados", []),
+        "puntos": challenge.progress.get("puntos", 0),
+        "total_retos": len(challenge.retos),
+        "total_puntos": TOTAL_PUNTOS,
+        "fecha_inicio": challenge.progress.get("fecha_inicio", "")
+    }
+
+
+def publicar_progreso() -> None:
+    """
+    Publica un evento 'progress' si cambió la revisión del progreso, y un
+    evento 'completado' por cada reto completado desde la última publicación.
+    """
+    revision = challenge.revision_progreso
+    if revision == _publicado["revision"]:
+        return
+    
+    with _lock_publicacion:
+        if revision == _publicado["revision"]:
+            return
+        datos = _datos_progreso()
+        completados = set(datos["completados"])
+        # Con otro estudiante configurado no hay retos "recién completados"
+        nuevos = completados - _publicado["completados"] if datos["documento"] == _publicado["documento"] else set()
+        _publicado.update(revision=revision, documento=datos["documento"], completados=completados)
+        
+        canal_eventos.publicar("progress", datos)
+        for reto_id in sorted(nuevos):
+            reto = challenge.retos_por_id.get(reto_id)
+            canal_eventos.publicar("completado", {
+                "reto_id": reto_id,
+                "nombre": reto.nombre if reto else "",
+                "puntos": reto.puntos if reto else 0,
+                "puntos_totales": datos["puntos"]
+            })
+
+
+def _estado_verificacion() -> Dict[int, bool]:
+    """
+    Última verificación publicada (la calcula si todavía no hay una). La
+    consulta a Docker se hace fuera del lock: publicar_progreso, que corre en
+    cada request, no espera a Docker.
+    """
+    with _lock_publicacion:
+        if _publicado["verificacion"] is not None:
+            return dict(_publicado["verificacion"])
+        invalidaciones = _publicado["invalidaciones"]
+
+    resultados = challenge.verify_all()
+    with _lock_publicacion:
+        # No pisar un resultado más nuevo ni revivir uno invalidado mientras tanto
+        if _publicado["verificacion"] is None and _publicado["invalidaciones"] == invalidaciones:
+            _publicado["verificacion"] = resultados
+    return dict(resultados)
+
+
+def publicar_verificacion() -> None:
+    """Recalcula los requisitos Docker y publica los retos cuyo estado cambió"""
+    resultados = challenge.verify_all()
+    with _lock_publicacion:
+        anteriores = _publicado["verificacion"]
+        _publicado["verificacion"] = resultados
+        if anteriores is None:
+            return
+        cambios = [
+            {"id": reto_id, "requisitos_cumplidos": cumple}
+            for reto_id, cumple in sorted(resultados.items())
+            if anteriores.get(reto_id) != cumple
+        ]
+        if cambios:
+            canal_eventos.publicar("verificacion", {"retos": cambios})
+
+
+def inicializar_proceso() -> DockerChallenge:
+    """
+    Crea el estado del proceso actual si todavía no existe (o si se heredó
+    de un proceso padre por fork).
+    
+    Returns:
+        El DockerChallenge del proceso
+    """
+    global challenge, cache_respuestas, canal_eventos, gestor_trabajos, RETOS_ESTATICOS, TOTAL_PUNTOS
+    global _publicado, _vigilante, _pid_proceso
+    
+    if _pid_proceso == os.getpid():
+        return challenge
+    
+    with _lock_proceso:
+        if _pid_proceso == os.getpid():
+            return challenge
+        
+        nuevo = DockerChallenge()
+        challenge = nuevo
+        cache_respuestas = CacheRespuestas()
+        canal_eventos = CanalEventos()
+        gestor_trabajos = GestorTrabajos(JOBS_WORKERS, JOBS_MAX, JOBS_PLAZO, on_terminado=_al_terminar_trabajo)
+        RETOS_ESTATICOS = _serializar_estaticos(nuevo)
+        TOTAL_PUNTOS = sum(r.puntos for r in nuevo.retos)
+        _publicado = {
+            "revision": nuevo.revision_progreso,
+            "documento": nuevo.documento_estudiante,
+            "completados": set(nuevo.progress.get("completados", [])),
+            "verificacion": None,
+            "invalidaciones": 0
+        }
+        _vigilante = None
+        
+        # Watcher de eventos Docker (opcional): mantiene el estado en memoria
+        # y empuja los cambios de verificación a los streams
+        if os.getenv("DOCKER_CTF_WATCHER", "false").lower() == "true":
+            nuevo.iniciar_watcher(on_cambio=_al_cambiar_docker)
+        
+        # Se marca al final: los demás hilos no ven un estado a medio armar
+        _pid_proceso = os.getpid()
+        return nuevo
+
+
+def _al_terminar_trabajo(trabajo) -> None:
+    """Callback del gestor de trabajos: empuja el resultado a los streams"""
+    canal_eventos.publicar("job", _datos_trabajo(trabajo))
+
+
+def _al_cambiar_docker(evento: Dict) -> None:
+    """Callback del watcher de eventos Docker"""
+    if canal_eventos.suscriptores:
+        publicar_verificacion()
+    else:
+        # Nadie escucha: se recalcula cuando se conecte un stream
+        with _lock_publicacion:
+            _publicado["verificacion"] = None
+            _publicado["invalidaciones"] += 1
+
+
+def _vigilar_cambios() -> None:
+    """
+    Hilo de fondo de los streams: trae el progreso escrito por otros
+    procesos (CLI, daemon) y, sin watcher de eventos Docker, recalcula la
+    verificación periódicamente.
+    """
+    ultima_verificacion = time.monotonic()
+    while True:
+        time.sleep(SSE_INTERVALO_PROGRESO)
+        if not canal_eventos.suscriptores:
+            continue
+        try:
+            challenge.refrescar_progreso()
+            publicar_progreso()
+            
+            watcher = challenge.docker_watcher
+            sin_watcher = watcher is None or not watcher.sincronizado.is_set()
+            if sin_watcher and time.monotonic() - ultima_verificacion >= SSE_INTERVALO_VERIFICACION:
+                ultima_verificacion = time.monotonic()
+                publicar_verificacion()
+        except Exception as e:
+            print(f"⚠️  Error vigilando cambios para los streams: {e}")
+
+
+_vigilante = None
+_lock_vigilante = threading.Lock()
+
+
+def _iniciar_vigilante() -> None:
+    """Inicia (una sola vez) el hilo que vigila los cambios"""
+    global _vigilante
+    with _lock_vigilante:
+        if _vigilante is None:
+            _vigilante = threading.Thread(target=_vigilar_cambios, name="sse-vigilante", daemon=True)
+            _vigilante.start()
+
+
+def _formato_sse(evento_id: int, tipo: str, datos: str) -> str:
+    """Serializa un evento en el formato text/event-stream"""
+    return f"id: {canal_eventos.id_evento(evento_id)}\nevent: {tipo}\ndata: {datos}\n\n"
+
+
+def _serializar_estaticos(challenge: DockerChallenge) -> Dict[int, str]:
+    """
+    Serializa una sola vez los datos estáticos de cada reto (textos y
+    preguntas) como objeto JSON abierto, al que luego se agregan los campos
+    que dependen del progreso.
+    """
+    estaticos = {}
+    for reto in challenge.retos:
+        datos = json.dumps({
+            "id": reto.id,
+            "nombre": reto.nombre,
+            "descripcion": reto.descripcion,
+            "pista": reto.pista,
+            "puntos": reto.puntos,
+            "dificultad": reto.dificultad,
+            "categoria": reto.categoria,
+            "preguntas": reto.preguntas_dict()
+        }, sort_keys=True)
+        estaticos[reto.id] = datos[:-1]
+    return estaticos
+
+
+@bp.before_request
+def refrescar_progreso():
+    """Aplica el progreso registrado por otros procesos (CLI u otros workers)"""
+    inicializar_proceso().refrescar_progreso()
+    publicar_progreso()
+
+
+@bp.route('/')
 def index():
     """Página principal del dashboard"""
     return render_template('index.html')
 
 
-@app.route('/test')
+@bp.route('/test')
 def test():
     """Página de prueba para debugging"""
     return render_template('test_challenges.html')
 
 
-@app.route('/api/debug')
+@bp.route('/api/debug')
 def debug_info():
     """Endpoint de diagnóstico"""
-    return jsonify({
+    return respuesta_cacheada("debug", lambda: {
         "status": "OK",
         "documento_estudiante": challenge.documento_estudiante,
         "total_retos": len(challenge.retos),
-        "retos_ids": [r["id"] for r in challenge.retos],
+        "retos_ids": [r.id for r in challenge.retos],
         "completados": challenge.progress.get("completados", []),
-        "puntos": challenge.progress.get("puntos", 0)
+        "puntos": challenge.progress.get("puntos", 0),
+        "revision": challenge.revision_progreso
     })
 
 
-@app.route('/api/progress')
+@bp.route('/api/progress')
 def get_progress():
     """
     Endpoint para obtener el progreso del usuario
@@ -68,17 +458,73 @@ def get_progress():
     Returns:
         JSON con progreso completo
     """
-    return jsonify({
-        "documento": challenge.documento_estudiante,
-        "completados": challenge.progress.get("completados", []),
-        "puntos": challenge.progress.get("puntos", 0),
-        "total_retos": len(challenge.retos),
-        "total_puntos": sum(r["puntos"] for r in challenge.retos),
-        "fecha_inicio": challenge.progress.get("fecha_inicio", "")
-    })
+    return respuesta_cacheada("progress", _datos_progreso)
+
+
+@bp.route('/api/stream')
+def stream():
+    """
+    Stream SSE (text/event-stream) con los cambios del laboratorio:
+    
+        progress      Progreso del estudiante (mismo formato que /api/progress)
+        completado    Reto recién completado
+        verificacion  Retos cuyos requisitos Docker cambiaron de estado
+        sync          Estado completo (al conectar o si no se puede retomar)
+    
+    Cada evento lleva un id; al reconectar, el navegador envía Last-Event-ID
+    y recibe los eventos que se perdió.
+    """
+    if not canal_eventos.suscribir():
+        respuesta = jsonify({
+            "success": False,
+            "message": "❌ Demasiados streams abiertos, usa /api/progress"
+        })
+        respuesta.status_code = 503
+        respuesta.headers["Retry-After"] = "30"
+        return respuesta
+    
+    _iniciar_vigilante()
+    ultimo_id = canal_eventos.leer_id(request.headers.get("Last-Event-ID") or request.args.get("lastEventId"))
+    
+    def sincronizar() -> Tuple[int, str]:
+        # El id se lee antes de armar el estado: lo publicado mientras
+        # tanto se vuelve a enviar y el cliente no pierde cambios
+        evento_id = canal_eventos.ultimo_id
+        datos = json.dumps({
+            "progreso": _datos_progreso(),
+            "verificacion": [
+                {"id": reto_id, "requisitos_cumplidos": cumple}
+                for reto_id, cumple in sorted(_estado_verificacion().items())
+            ]
+        }, sort_keys=True)
+        return evento_id, _formato_sse(evento_id, "sync", datos)
+    
+    def generar():
+        nonlocal ultimo_id
+        yield "retry: 3000\n\n"
+        
+        eventos = None if ultimo_id is None else canal_eventos.pendientes(ultimo_id)
+        while True:
+            if eventos is None:
+                ultimo_id, mensaje = sincronizar()
+                yield mensaje
+            elif eventos:
+                ultimo_id = eventos[-1][0]
+                yield "".join(_formato_sse(*evento) for evento in eventos)
+            else:
+                # Comentario SSE: mantiene viva la conexión a través de proxies
+                # y permite detectar clientes desconectados
+                yield ": keep-alive\n\n"
+            eventos = canal_eventos.esperar(ultimo_id, SSE_KEEPALIVE)
+    
+    respuesta = Response(generar(), mimetype="text/event-stream")
+    respuesta.headers["Cache-Control"] = "no-cache"
+    respuesta.headers["X-Accel-Buffering"] = "no"
+    respuesta.call_on_close(canal_eventos.desuscribir)
+    return respuesta
 
 
-@app.route('/api/challenges')
+@bp.route('/api/challenges')
 def get_challenges():
     """
     Endpoint para obtener todos los retos
@@ -86,47 +532,203 @@ def get_challenges():
     Returns:
         JSON con lista de retos (incluye flag si está completado)
     """
-    challenges_data = []
+    return respuesta_cacheada("challenges", _generar_challenges)
+
+
+def _generar_challenges() -> str:
+    """Lista de retos: datos estáticos ya serializados + estado del estudiante"""
+    completados = set(challenge.progress.get("completados", []))
+    partes = []
     
     for reto in challenge.retos:
-        completado = reto["id"] in challenge.progress.get("completados", [])
+        completado = reto.id in completados
         
-        challenge_data = {
-            "id": reto["id"],
-            "nombre": reto["nombre"],
-            "descripcion": reto["descripcion"],
-            "pista": reto["pista"],
-            "puntos": reto["puntos"],
-            "dificultad": reto["dificultad"],
-            "categoria": reto["categoria"],
+        dinamicos = {
             "completado": completado,
-            "fecha_completado": challenge.progress.get(f"reto_{reto['id']}_fecha", "") if completado else None,
-            "preguntas": reto.get("preguntas", [])
+            "fecha_completado": challenge.progress.get(f"reto_{reto.id}_fecha", "") if completado else None
         }
         
         # Si el reto NO está completado, mostrar la flag para que pueda copiarla
         if not completado:
-            flag_personalizada = challenge.generar_flag_personalizada(reto["id"], FLAG_BASES[reto["id"]])
-            challenge_data["flag"] = flag_personalizada
+            dinamicos["flag"] = challenge.obtener_flag(reto.id)
         
-        challenges_data.append(challenge_data)
+        partes.append(RETOS_ESTATICOS[reto.id] + "," + current_app.json.dumps(dinamicos)[1:])
+    
+    return "[" + ",".join(partes) + "]"
+
+
+def _respuesta_verificacion(resultado) -> Dict:
+    """Respuesta de /api/verify-flag para un ResultadoVerificacion"""
+    if resultado.estado == VERIFICACION_SIN_DOCUMENTO:
+        return {
+            "success": False,
+            "message": "❌ Error al verificar el sistema. Asegúrate de haber ejecutado 'python3 docker_challenge.py setup' primero."
+        }
+    
+    if resultado.estado == VERIFICACION_FLAG_INVALIDA:
+        return {
+            "success": False,
+            "message": "❌ Flag incorrecta o no válida"
+        }
+    
+    reto = resultado.reto
+    
+    if resultado.estado == VERIFICACION_YA_COMPLETADO:
+        return {
+            "success": False,
+            "message": f"⚠️  Ya completaste este reto: {reto.nombre}"
+        }
+    
+    if resultado.exitoso:
+        return {
+            "success": True,
+            "message": f"✅ Verificación Docker exitosa para: {reto.nombre}\n\n🎯 El comando fue ejecutado correctamente. Procediendo a enviar la flag...",
+            "reto_id": resultado.reto_id,
+            "reto_nombre": reto.nombre
+        }
+    
+    return {
+        "success": False,
+        "message": f"⚠️  Flag correcta, pero no se detectó la ejecución del comando Docker.\n\n💡 Reto: {reto.nombre}\n\n📝 Pista: {reto.pista or 'Revisa la descripción del reto'}\n\nAsegúrate de ejecutar el comando requerido antes de enviar la flag.",
+        "reto_id": resultado.reto_id,
+        "reto_nombre": reto.nombre,
+        "pista": reto.pista
+    }
+
+
+def _respuesta_submit(exito: bool, mensaje: str, reto_id: int) -> Dict:
+    """Respuesta de /api/submit para el resultado de submit_flag"""
+    response = {
+        "success": exito,
+        "message": mensaje,
+        "reto_id": reto_id if exito else None,
+        "puntos_totales": challenge.progress.get("puntos", 0),
+        "completados": len(challenge.progress.get("completados", [])),
+        "total_retos": len(challenge.retos)
+    }
+    
+    # Verificar si completó todos los retos
+    if exito and len(challenge.progress["completados"]) == len(challenge.retos):
+        response["all_completed"] = True
+        response["message"] += "\n\n🏆 ¡FELICIDADES! Has completado TODOS los retos del Docker CTF Lab 🐳"
+    
+    return response
+
+
+def _respuesta_submit_batch(resultados) -> Dict:
+    """Respuesta de /api/submit-batch para el resultado de submit_flags"""
+    aceptadas = sum(1 for r in resultados if r.exito)
+    response = {
+        "success": aceptadas > 0,
+        "message": f"✅ {aceptadas}/{len(resultados)} flags aceptadas",
+        "resultados": [
+            {
+                "flag": r.flag,
+                "success": r.exito,
+                "message": r.mensaje,
+                "reto_id": r.reto_id or None
+            }
+            for r in resultados
+        ],
+        "puntos_totales": challenge.progress.get("puntos", 0),
+        "completados": len(challenge.progress.get("completados", [])),
+        "total_retos": len(challenge.retos)
+    }
+    
+    if aceptadas and len(challenge.progress["completados"]) == len(challenge.retos):
+        response["all_completed"] = True
+        response["message"] += "\n\n🏆 ¡FELICIDADES! Has completado TODOS los retos del Docker CTF Lab 🐳"
     
-    return jsonify(challenges_data)
+    return response
+
 
+def _resultado_trabajo(trabajo) -> Optional[Dict]:
+    """Respuesta final de un trabajo (None mientras sigue activo)"""
+    if trabajo.estado == ESTADO_TERMINADO:
+        return trabajo.resultado
+    if trabajo.estado == ESTADO_VENCIDO:
+        return {
+            "success": False,
+            "message": MENSAJE_VENCIDO
+        }
+    if trabajo.estado == ESTADO_CANCELADO:
+        return {
+            "success": False,
+            "message": "⚪ Verificación cancelada"
+        }
+    if trabajo.estado == ESTADO_ERROR:
+        return {
+            "success": False,
+            "message": f"❌ Error en la verificación: {trabajo.error}"
+        }
+    return None
 
-@app.route('/api/verify-flag', methods=['POST'])
+
+def _datos_trabajo(trabajo) -> Dict:
+    """Estado de un trabajo para la API y el stream"""
+    datos = trabajo.a_dict()
+    datos["resultado"] = _resultado_trabajo(trabajo)
+    return datos
+
+
+def _encolar_trabajo(tipo: str, reto_id, tarea, asincrono: bool):
+    """
+    Envía una verificación contra Docker al pool de trabajos.
+    
+    Args:
+        tipo: "verify", "verify-all", "submit" o "submit-batch"
+        reto_id: Reto de la flag, tupla de retos de un lote, o None para
+            todos los retos (junto con el tipo y el estudiante deduplica)
+        tarea: Función (trabajo) -> respuesta JSON, ejecutada en el pool
+        asincrono: Si True responde 202 con el id del trabajo; si no, espera
+            el resultado (como máximo el plazo del trabajo)
+    """
+    clave = (tipo, challenge.documento_estudiante, reto_id)
+    try:
+        trabajo, _ = gestor_trabajos.enviar(tipo, clave, tarea, {"reto_id": reto_id})
+    except ColaLlena:
+        respuesta = jsonify({
+            "success": False,
+            "message": "⏳ Hay demasiadas verificaciones en curso, intenta de nuevo en unos segundos"
+        })
+        respuesta.status_code = 503
+        respuesta.headers["Retry-After"] = "5"
+        return respuesta
+    
+    if asincrono:
+        datos = _datos_trabajo(trabajo)
+        datos["status_url"] = f"/api/jobs/{trabajo.id}"
+        respuesta = jsonify(datos)
+        if datos["resultado"] is None:
+            respuesta.status_code = 202
+            respuesta.headers["Location"] = datos["status_url"]
+        return respuesta
+    
+    # El vigilante de plazos termina el trabajo a más tardar al vencerse; uno
+    # reclamado ya está escribiendo el progreso y su resultado siempre llega
+    terminado = trabajo.esperar(JOBS_PLAZO + 1)
+    if not terminado and trabajo.estado == ESTADO_CONFIRMADO:
+        terminado = trabajo.esperar()
+    if not terminado or trabajo.estado == ESTADO_VENCIDO:
+        return jsonify({"success": False, "message": MENSAJE_VENCIDO}), 504
+    return jsonify(_resultado_trabajo(trabajo))
+
+
+@bp.route('/api/verify-flag', methods=['POST'])
 def verify_flag():
     """
     Endpoint para verificar una flag y los requisitos Docker antes de enviar.
-    Ejecuta 'python3 docker_challenge.py start' en el backend para obtener las flags oficiales.
+    Usa la verificación en proceso de DockerChallenge (índice de flags del estudiante).
+    La consulta a Docker corre en el pool de trabajos de verificación.
     
     Body JSON:
         {
-            "flag": "FLAG{...}"
+            "flag": "FLAG{...}",
+            "async": true          (opcional: responder 202 con el id del trabajo)
         }
     
     Returns:
-        JSON con resultado de la verificación
+        JSON con resultado de la verificación (o el trabajo, si async)
     """
     data = request.get_json()
     
@@ -136,106 +738,72 @@ def verify_flag():
             "message": "❌ Debes proporcionar una flag"
         }), 400
     
-    flag = data['flag'].strip()
-    
+    flag = data['flag']
     try:
-        # PASO 1: Ejecutar 'python3 docker_challenge.py start' para obtener las flags oficiales
-        result = subprocess.run(
-            ['python3', 'docker_challenge.py', 'start'],
-            capture_output=True,
-            text=True,
-            timeout=15,
-            cwd='/workspaces/ctf_docker_lab'
-        )
-        
-        if result.returncode != 0:
-            return jsonify({
-                "success": False,
-                "message": "❌ Error al verificar el sistema. Asegúrate de haber ejecutado 'python3 docker_challenge.py setup' primero."
-            })
-        
-        # PASO 2: Parsear la salida para encontrar el reto que corresponde a esta flag
-        output = result.stdout
-        reto_id = None
-        
-        # Buscar líneas con formato: "🚩 Flag a enviar: uuid"
-        # y luego buscar hacia arriba para encontrar "Reto X:"
-        lines = output.split('\n')
-        for i, line in enumerate(lines):
-            if flag in line and "Flag a enviar" in line:
-                # Buscar hacia arriba para encontrar "Reto X:"
-                for j in range(i-1, max(0, i-10), -1):
-                    match = re.search(r'Reto\s+(\d+):', lines[j])
-                    if match:
-                        reto_id = int(match.group(1))
-                        break
-                if reto_id:
-                    break
-        
-        if not reto_id:
-            return jsonify({
-                "success": False,
-                "message": "❌ Flag incorrecta o no válida"
-            })
-        
-        # PASO 3: Obtener información del reto
-        reto = next((r for r in challenge.retos if r["id"] == reto_id), None)
-        if not reto:
-            return jsonify({
-                "success": False,
-                "message": "❌ Reto no encontrado"
-            })
-        
-        # PASO 4: Verificar si ya fue completado
-        if reto_id in challenge.progress.get("completados", []):
-            return jsonify({
-                "success": False,
-                "message": f"⚠️  Ya completaste este reto: {reto['nombre']}"
-            })
-        
-        # PASO 5: Verificar requisitos Docker del reto (ejecuta verificación real de Docker)
-        verificacion_exitosa = challenge._verificar_reto_especifico(reto_id)
-        
-        if verificacion_exitosa:
-            return jsonify({
-                "success": True,
-                "message": f"✅ Verificación Docker exitosa para: {reto['nombre']}\n\n🎯 El comando fue ejecutado correctamente. Procediendo a enviar la flag...",
-                "reto_id": reto_id,
-                "reto_nombre": reto['nombre']
-            })
-        else:
-            return jsonify({
-                "success": False,
-                "message": f"⚠️  Flag correcta, pero no se detectó la ejecución del comando Docker.\n\n💡 Reto: {reto['nombre']}\n\n📝 Pista: {reto.get('pista', 'Revisa la descripción del reto')}\n\nAsegúrate de ejecutar el comando requerido antes de enviar la flag.",
-                "reto_id": reto_id,
-                "reto_nombre": reto['nombre'],
-                "pista": reto.get('pista', '')
-            })
-            
-    except subprocess.TimeoutExpired:
-        return jsonify({
-            "success": False,
-            "message": "❌ Timeout al verificar el sistema. Intenta nuevamente."
-        })
+        resultado = challenge.identificar_flag(flag)
     except Exception as e:
         return jsonify({
             "success": False,
             "message": f"❌ Error en la verificación: {str(e)}"
         })
+    
+    # Lo que no depende de Docker se responde en el acto
+    if resultado.estado != VERIFICACION_POR_VERIFICAR:
+        return jsonify(_respuesta_verificacion(resultado))
+    
+    def tarea(trabajo):
+        return _respuesta_verificacion(challenge.verificar_flag(flag))
+    
+    return _encolar_trabajo("verify", resultado.reto_id, tarea, bool(data.get("async")))
 
 
-@app.route('/api/submit', methods=['POST'])
+@bp.route('/api/verify-all')
+def verify_all():
+    """
+    Endpoint para verificar los requisitos Docker de todos los retos
+    a partir de una sola foto del estado de Docker.
+    La captura corre en el pool de trabajos de verificación.
+    
+    Query:
+        async=true     (opcional: responder 202 con el id del trabajo)
+    
+    Returns:
+        JSON con el estado de cada reto (o el trabajo, si async)
+    """
+    def tarea(trabajo):
+        resultados = challenge.verify_all()
+        completados = challenge.progress.get("completados", [])
+        return {
+            "success": True,
+            "retos": [
+                {
+                    "id": reto.id,
+                    "nombre": reto.nombre,
+                    "completado": reto.id in completados,
+                    "requisitos_cumplidos": resultados.get(reto.id, False)
+                }
+                for reto in challenge.retos
+            ]
+        }
+    
+    asincrono = request.args.get("async", "false").lower() in ("1", "true")
+    return _encolar_trabajo("verify-all", None, tarea, asincrono)
+
+
+@bp.route('/api/submit', methods=['POST'])
 def submit_flag():
     """
     Endpoint para enviar una flag
+    La consulta a Docker corre en el pool de trabajos de verificación.
     
     Body JSON:
         {
-            "flag": "FLAG{...}"
+            "flag": "FLAG{...}",
+            "async": true          (opcional: responder 202 con el id del trabajo)
         }
     
     Returns:
-        JSON con resultado de la validación
+        JSON con resultado de la validación (o el trabajo, si async)
     """
     data = request.get_json()
     
@@ -246,26 +814,122 @@ def submit_flag():
         }), 400
     
     flag = data['flag']
-    exito, mensaje, reto_id = challenge.submit_flag(flag)
+    identificacion = challenge.identificar_flag(flag)
     
-    response = {
-        "success": exito,
-        "message": mensaje,
-        "reto_id": reto_id if exito else None,
-        "puntos_totales": challenge.progress.get("puntos", 0),
-        "completados": len(challenge.progress.get("completados", [])),
-        "total_retos": len(challenge.retos)
-    }
+    # Lo que no depende de Docker se responde en el acto
+    if identificacion.estado != VERIFICACION_POR_VERIFICAR:
+        exito, mensaje, reto_id = challenge.submit_flag(flag, identificacion)
+        return jsonify(_respuesta_submit(exito, mensaje, reto_id))
     
-    # Verificar si completó todos los retos
-    if exito and len(challenge.progress["completados"]) == len(challenge.retos):
-        response["all_completed"] = True
-        response["message"] += "\n\n🏆 ¡FELICIDADES! Has completado TODOS los retos del Docker CTF Lab 🐳"
+    def tarea(trabajo):
+        verificacion = challenge.verificar_flag(flag)
+        # Vencido o cancelado mientras esperaba a Docker: no se registra nada.
+        # Reclamado, el plazo ya no lo vence y la respuesta refleja lo escrito
+        if not trabajo.reclamar():
+            return None
+        exito, mensaje, reto_id = challenge.submit_flag(flag, verificacion)
+        publicar_progreso()
+        return _respuesta_submit(exito, mensaje, reto_id)
+    
+    return _encolar_trabajo("submit", identificacion.reto_id, tarea, bool(data.get("async")))
+
+
+@bp.route('/api/submit-batch', methods=['POST'])
+def submit_batch():
+    """
+    Endpoint para enviar varias flags de una vez (p. ej. retos resueltos sin
+    conexión). Los requisitos Docker se verifican contra una sola foto del
+    estado, el progreso se guarda con una sola escritura y se publica un
+    solo evento MQTT. Corre como un único trabajo de verificación.
+    
+    Body JSON:
+        {
+            "flags": ["FLAG{...}", "FLAG{...}"],
+            "async": true          (opcional: responder 202 con el id del trabajo)
+        }
+    
+    Returns:
+        JSON con el resultado de cada flag (o el trabajo, si async)
+    """
+    data = request.get_json()
+    flags = data.get('flags') if isinstance(data, dict) else None
+    
+    if not isinstance(flags, list) or not flags or not all(isinstance(f, str) for f in flags):
+        return jsonify({
+            "success": False,
+            "message": "❌ Debes proporcionar una lista de flags"
+        }), 400
+    
+    if len(flags) > BATCH_MAX_FLAGS:
+        return jsonify({
+            "success": False,
+            "message": f"❌ Máximo {BATCH_MAX_FLAGS} flags por envío"
+        }), 400
+    
+    identificaciones = [challenge.identificar_flag(flag) for flag in flags]
+    por_verificar = tuple(sorted({
+        r.reto_id for r in identificaciones if r.estado == VERIFICACION_POR_VERIFICAR
+    }))
     
-    return jsonify(response)
+    # Si ninguna flag depende de Docker se responde en el acto
+    if not por_verificar:
+        return jsonify(_respuesta_submit_batch(challenge.submit_flags(flags, identificaciones)))
+    
+    def tarea(trabajo):
+        verificaciones = challenge.verificar_flags(flags)
+        # Vencido o cancelado mientras esperaba a Docker: no se registra nada.
+        # Reclamado, el plazo ya no lo vence y la respuesta refleja lo escrito
+        if not trabajo.reclamar():
+            return None
+        resultados = challenge.submit_flags(flags, verificaciones)
+        publicar_progreso()
+        return _respuesta_submit_batch(resultados)
+    
+    return _encolar_trabajo("submit-batch", por_verificar, tarea, bool(data.get("async")))
 
 
-@app.route('/api/hint/<int:reto_id>')
+@bp.route('/api/jobs/<job_id>', methods=['GET', 'DELETE'])
+def job_status(job_id):
+    """
+    Endpoint para consultar (GET) o cancelar (DELETE) un trabajo de verificación
+    
+    Args:
+        job_id: Id devuelto por /api/verify-flag o /api/submit con async
+    
+    Returns:
+        JSON con el estado del trabajo; "resultado" es la respuesta del
+        endpoint original cuando el trabajo terminó (null mientras corre)
+    """
+    trabajo = gestor_trabajos.obtener(job_id)
+    if trabajo is None:
+        return jsonify({
+            "success": False,
+            "message": "Trabajo no encontrado"
+        }), 404
+    
+    if request.method == 'DELETE':
+        gestor_trabajos.cancelar(job_id)
+    
+    return jsonify(_datos_trabajo(trabajo))
+
+
+@bp.route('/api/jobs')
+def jobs_stats():
+    """
+    Endpoint con los contadores del pool de trabajos de verificación
+    
+    Returns:
+        JSON con trabajos activos, terminados, vencidos, deduplicados, etc.
+    """
+    return jsonify({
+        "success": True,
+        "workers": JOBS_WORKERS,
+        "plazo": JOBS_PLAZO,
+        "estadisticas": gestor_trabajos.estadisticas()
+    })
+
+
+@bp.route('/api/hint/<int:reto_id>')
 def get_hint(reto_id):
     """
     Endpoint para obtener la pista de un reto
@@ -276,7 +940,7 @@ def get_hint(reto_id):
     Returns:
         JSON con la pista
     """
-    reto = next((r for r in challenge.retos if r["id"] == reto_id), None)
+    reto = challenge.retos_por_id.get(reto_id)
     
     if not reto:
         return jsonify({
@@ -287,12 +951,12 @@ def get_hint(reto_id):
     return jsonify({
         "success": True,
         "reto_id": reto_id,
-        "nombre": reto["nombre"],
-        "pista": reto["pista"]
+        "nombre": reto.nombre,
+        "pista": reto.pista
     })
 
 
-@app.route('/api/flags')
+@bp.route('/api/flags')
 def get_flags():
     """
     Endpoint para obtener las flags de los retos completados
@@ -301,49 +965,59 @@ def get_flags():
     Returns:
         JSON con las flags generadas para el estudiante
     """
+    return respuesta_cacheada("flags", _generar_flags)
+
+
+def _generar_flags() -> Dict:
+    """Flags de los retos completados del estudiante"""
     flags_data = []
     completados = challenge.progress.get("completados", [])
     
     for reto in challenge.retos:
-        if reto["id"] in completados:
-            # Generar flag personalizada usando el texto base correcto
-            flag_personalizada = challenge.generar_flag_personalizada(reto["id"], FLAG_BASES[reto["id"]])
+        if reto.id in completados:
             flags_data.append({
-                "id": reto["id"],
-                "nombre": reto["nombre"],
-                "flag": flag_personalizada,
-                "puntos": reto["puntos"]
+                "id": reto.id,
+                "nombre": reto.nombre,
+                "flag": challenge.obtener_flag(reto.id),
+                "puntos": reto.puntos
             })
     
-    return jsonify({
+    return {
         "success": True,
         "documento": challenge.documento_estudiante,
         "total_completados": len(completados),
         "flags": flags_data,
         "puntos_totales": challenge.progress.get("puntos", 0)
+    }
+
+
+@bp.route('/api/leaderboard')
+def get_leaderboard():
+    """
+    Endpoint para obtener el ranking de estudiantes por puntos
+    (todo el salón con el backend SQLite)
+    
+    Returns:
+        JSON con el ranking
+    """
+    limite = request.args.get('limit', 10, type=int)
+    return jsonify({
+        "success": True,
+        "leaderboard": challenge.progress_store.leaderboard(limite)
     })
 
 
-@app.route('/api/writeup')
+@bp.route('/api/writeup')
 def get_writeup():
     """
-    Endpoint para obtener el contenido del taller/write-up en formato Markdown
+    Endpoint para obtener el índice del taller/write-up (TALLER.md).
+    Cada sección se carga aparte con /api/writeup/<seccion>.
     
     Returns:
-        JSON con el contenido del archivo TALLER.md
+        JSON con el título y las secciones del taller
     """
     try:
-        import os
-        writeup_path = os.path.join(os.path.dirname(__file__), 'TALLER.md')
-        
-        with open(writeup_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        return jsonify({
-            "success": True,
-            "content": content,
-            "title": "🐳 Taller Docker CTF Lab - Write-ups y Soluciones"
-        })
+        writeup_taller.actualizar()
     except FileNotFoundError:
         return jsonify({
             "success": False,
@@ -354,6 +1028,76 @@ def get_writeup():
             "success": False,
             "message": f"❌ Error al cargar write-up: {str(e)}"
         }), 500
+    
+    respuesta = jsonify({
+        "success": True,
+        "title": writeup_taller.titulo,
+        "secciones": writeup_taller.indice
+    })
+    respuesta.set_etag(writeup_taller.huella)
+    respuesta.headers["Cache-Control"] = "no-cache"
+    return respuesta.make_conditional(request)
+
+
+@bp.route('/api/writeup/<seccion>')
+def get_writeup_seccion(seccion):
+    """
+    Endpoint para obtener una sección del write-up ya convertida a HTML.
+    Se entrega comprimida (brotli o gzip) según Accept-Encoding.
+    
+    Args:
+        seccion: Id de la sección (ej: reto-7, tips-y-trucos)
+    
+    Returns:
+        Fragmento HTML de la sección
+    """
+    try:
+        writeup_taller.actualizar()
+    except FileNotFoundError:
+        return jsonify({
+            "success": False,
+            "message": "❌ Archivo de write-up no encontrado"
+        }), 404
+    
+    codificacion = next(
+        (c for c in writeup_taller.codificaciones() if request.accept_encodings.quality(c) > 0),
+        "identity"
+    )
+    encontrado = writeup_taller.seccion(seccion, codificacion)
+    if encontrado is None:
+        return jsonify({
+            "success": False,
+            "message": "Sección no encontrada"
+        }), 404
+    
+    cuerpo, etag = encontrado
+    respuesta = Response(cuerpo, mimetype="text/html")
+    if codificacion != "identity":
+        respuesta.headers["Content-Encoding"] = codificacion
+    respuesta.headers["Vary"] = "Accept-Encoding"
+    respuesta.headers["Cache-Control"] = "no-cache"
+    # Un ETag por codificación: los bytes son distintos
+    respuesta.set_etag(f"{etag}-{codificacion}")
+    return respuesta.make_conditional(request)
+
+
+def create_app() -> Flask:
+    """
+    Crea la aplicación del dashboard. Es segura con varios procesos
+    (workers de gunicorn): cada uno arma su estado en la primera petición.
+    
+    Returns:
+        Aplicación Flask
+    """
+    app = Flask(__name__)
+    app.register_blueprint(bp)
+    
+    # El write-up se procesa al arrancar (y de nuevo si cambia el archivo)
+    try:
+        writeup_taller.actualizar()
+    except OSError:
+        pass
+    return app
 
 
 if __name__ == '__main__':
@@ -365,5 +1109,7 @@ if __name__ == '__main__':
     print("\n💡 Presiona CTRL+C para detener el servidor\n")
     print("=" * 70 + "\n")
     
-    # Ejecutar servidor
+    # Ejecutar servidor (con el laboratorio ya cargado)
+    app = create_app()
+    inicializar_proceso()
     app.run(host='0.0.0.0', port=5000, debug=False)
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Docker CTF Lab - Write-up del Taller
+Convierte TALLER.md en secciones HTML (una por reto) con su índice y guarda
+cada sección ya comprimida (gzip y, si está instalado, brotli), para que el
+dashboard la sirva sin leer ni procesar el archivo en cada petición.
+
+El conversor de Markdown cubre lo que usa el taller: títulos, párrafos,
+listas (anidadas), bloques de código, citas, tablas, separadores, código
+en línea, negritas, cursivas y enlaces.
+"""
+
+import gzip
+import hashlib
+import html
+import json
+import os
+import re
+import threading
+import unicodedata
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Títulos de sección que corresponden a un reto ("Reto 7: ...")
+RE_RETO = re.compile(r"^Reto\s+(\d+)\b")
+
+RE_TITULO = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+RE_ITEM = re.compile(r"^(\s*)([-*+]|\d+\.)\s+(.*)$")
+RE_SEPARADOR = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+RE_CELDAS_SEPARADOR = re.compile(r"^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$")
+RE_ENLACE = re.compile(r"\[([^\]]+)\]\(([^)\s]+)\)|(https?://[^\s<)]+)")
+RE_NEGRITA = re.compile(r"\*\*(.+?)\*\*")
+RE_CURSIVA = re.compile(r"(?<![\w*])\*(?![\s*])(.+?)(?<![\s*])\*(?![\w*])")
+
+# Nivel de compresión de los cuerpos (se comprimen una sola vez)
+NIVEL_GZIP = 9
+NIVEL_BROTLI = 11
+
+
+def _importar_brotli():
+    """Importa brotli solo si está instalado (es opcional)"""
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+# ============================================================================
+# MARKDOWN -> HTML
+# ============================================================================
+
+def slug(texto: str) -> str:
+    """Identificador para URLs: sin tildes ni emojis, en minúsculas y con guiones"""
+    normalizado = unicodedata.normalize("NFKD", texto)
+    ascii_texto = normalizado.encode("ascii", "ignore").decode("ascii").lower()
+    return "-".join(re.findall(r"[a-z0-9]+", ascii_texto))
+
+
+def _enlace(coincidencia) -> str:
+    texto, url, suelto = coincidencia.groups()
+    if suelto:
+        return f'<a href="{suelto}" target="_blank" rel="noopener">{suelto}</a>'
+    if url.lower().startswith("javascript:"):
+        return texto
+    externo = ' target="_blank" rel="noopener"' if url.startswith(("http://", "https://")) else ""
+    return f'<a href="{url}"{externo}>{texto}</a>'
+
+
+def render_inline(texto: str) -> str:
+    """Convierte el formato en línea de un texto (ya sin estructura de bloque)"""
+    partes = texto.split("`")
+    # Un ` sin cerrar se deja como texto
+    if len(partes) % 2 == 0:
+        partes[-2] += "`" + partes.pop()
+
+    salida = []
+    for i, parte in enumerate(partes):
+        if i % 2:
+            salida.append(f"<code>{html.escape(parte)}</code>")
+            continue
+        parte = html.escape(parte)
+        parte = RE_ENLACE.sub(_enlace, parte)
+        parte = RE_NEGRITA.sub(r"<strong>\1</strong>", parte)
+        parte = RE_CURSIVA.sub(r"<em>\1</em>", parte)
+        salida.append(parte)
+    return "".join(salida)
+
+
+def _celdas(linea: str) -> List[str]:
+    linea = linea.strip()
+    if linea.startswith("|"):
+        linea = linea[1:]
+    if linea.endswith("|"):
+        linea = linea[:-1]
+    return [celda.strip() for celda in linea.split("|")]
+
+
+def _render_tabla(lineas: List[str]) -> str:
+    encabezado = "".join(f"<th>{render_inline(c)}</th>" for c in _celdas(lineas[0]))
+    filas = "".join(
+        "<tr>" + "".join(f"<td>{render_inline(c)}</td>" for c in _celdas(linea)) + "</tr>"
+        for linea in lineas[2:]
+    )
+    return f"<table><thead><tr>{encabezado}</tr></thead><tbody>{filas}</tbody></table>"
+
+
+def _render_lista(items: List[Tuple[int, bool, str]], pos: int = 0) -> Tuple[str, int]:
+    """Lista (y sus sublistas por sangría) a partir de items (sangría, ordenada, texto)"""
+    sangria, ordenada, _ = items[pos]
+    etiqueta = "ol" if ordenada else "ul"
+    salida = [f"<{etiqueta}>"]
+    while pos < len(items) and items[pos][0] >= sangria:
+        salida.append(f"<li>{render_inline(items[pos][2])}")
+        pos += 1
+        if pos < len(items) and items[pos][0] > sangria:
+            sublista, pos = _render_lista(items, pos)
+            salida.append(sublista)
+        salida.append("</li>")
+    salida.append(f"</{etiqueta}>")
+    return "".join(salida), pos
+
+
+def markdown_a_html(texto: str) -> str:
+    """Convierte Markdown (el subconjunto usado por el taller) a HTML"""
+    lineas = texto.splitlines()
+    salida: List[str] = []
+    parrafo: List[str] = []
+
+    def cerrar_parrafo():
+        if parrafo:
+            salida.append(f"<p>{render_inline(' '.join(parrafo))}</p>")
+            parrafo.clear()
+
+    i = 0
+    while i < len(lineas):
+        linea = lineas[i]
+        limpia = linea.strip()
+
+        # Bloque de código
+        if limpia.startswith("```"):
+            cerrar_parrafo()
+            lenguaje = limpia[3:].strip()
+            codigo = []
+            i += 1
+            while i < len(lineas) and not lineas[i].strip().startswith("```"):
+                codigo.append(lineas[i])
+                i += 1
+            clase = f' class="language-{html.escape(lenguaje)}"' if lenguaje else ""
+            salida.append(f"<pre><code{clase}>{html.escape(chr(10).join(codigo))}</code></pre>")
+            i += 1
+            continue
+
+        if not limpia:
+            cerrar_parrafo()
+            i += 1
+            continue
+
+        titulo = RE_TITULO.match(linea)
+        if titulo:
+            cerrar_parrafo()
+            nivel = len(titulo.group(1))
+            salida.append(f'<h{nivel} id="{slug(titulo.group(2))}">{render_inline(titulo.group(2))}</h{nivel}>')
+            i += 1
+            continue
+
+        if RE_SEPARADOR.match(linea):
+            cerrar_parrafo()
+            salida.append("<hr>")
+            i += 1
+            continue
+
+        # Tabla: encabezado + fila separadora |---|
+        if limpia.startswith("|") and i + 1 < len(lineas) and RE_CELDAS_SEPARADOR.match(lineas[i + 1]):
+            cerrar_parrafo()
+            tabla = []
+            while i < len(lineas) and lineas[i].strip().startswith("|"):
+                tabla.append(lineas[i])
+                i += 1
+            salida.append(_render_tabla(tabla))
+            continue
+
+        if limpia.startswith(">"):
+            cerrar_parrafo()
+            cita = []
+            while i < len(lineas) and lineas[i].strip().startswith(">"):
+                cita.append(lineas[i].strip()[1:].lstrip())
+                i += 1
+            salida.append(f"<blockquote>{markdown_a_html(chr(10).join(cita))}</blockquote>")
+            continue
+
+        if RE_ITEM.match(linea):
+            cerrar_parrafo()
+            items: List[Tuple[int, bool, str]] = []
+            while i < len(lineas) and lineas[i].strip():
+                item = RE_ITEM.match(lineas[i])
+                if item:
+                    items.append((len(item.group(1).expandtabs(4)), item.group(2)[-1] == ".", item.group(3)))
+                elif lineas[i][:1].isspace():
+                    # Continuación del item anterior
+                    sangria, ordenada, texto_item = items[-1]
+                    items[-1] = (sangria, ordenada, texto_item + " " + lineas[i].strip())
+                else:
+                    break
+                i += 1
+            pos = 0
+            while pos < len(items):
+                lista, pos = _render_lista(items, pos)
+                salida.append(lista)
+            continue
+
+        parrafo.append(limpia)
+        i += 1
+
+    cerrar_parrafo()
+    return "\n".join(salida)
+
+
+# ============================================================================
+# SECCIONES
+# ============================================================================
+
+class SeccionWriteup(NamedTuple):
+    """Sección del write-up (un reto o un apartado general)"""
+    id: str
+    titulo: str
+    nivel: int
+    reto_id: Optional[int]
+    markdown: str
+
+    @property
+    def tiene_contenido(self) -> bool:
+        """False para títulos de grupo sin texto propio (p. ej. 'Nivel Intermedio')"""
+        return any(linea.strip() and not RE_TITULO.match(linea) for linea in self.markdown.splitlines())
+
+
+def _es_indice_manual(markdown: str) -> bool:
+    """True si la sección es solo una lista de enlaces internos (el índice del archivo)"""
+    cuerpo = [linea.strip() for linea in markdown.splitlines()[1:] if linea.strip()]
+    return bool(cuerpo) and all(re.match(r"^[-*+]\s+\[[^\]]+\]\(#[^)]*\)$", linea) for linea in cuerpo)
+
+
+def dividir_secciones(texto: str) -> Tuple[str, List[SeccionWriteup]]:
+    """
+    Divide el taller en secciones: una por cada título '##' y una por cada
+    reto ('### Reto N: ...'). Lo anterior al primer '##' es la portada.
+
+    Returns:
+        Tupla (título del documento, secciones en orden)
+    """
+    titulo_documento = ""
+    bloques: List[Tuple[str, int, List[str]]] = [("", 1, [])]
+    en_codigo = False
+
+    for linea in texto.splitlines():
+        if linea.strip().startswith("```"):
+            en_codigo = not en_codigo
+        titulo = None if en_codigo else RE_TITULO.match(linea)
+        if titulo:
+            nivel = len(titulo.group(1))
+            texto_titulo = titulo.group(2)
+            if nivel == 1 and not titulo_documento:
+                titulo_documento = texto_titulo
+                continue
+            if nivel == 2 or (nivel == 3 and RE_RETO.match(texto_titulo)):
+                bloques.append((texto_titulo, nivel, []))
+        bloques[-1][2].append(linea)
+
+    secciones = []
+    usados = set()
+    for texto_titulo, nivel, contenido in bloques:
+        # Los '---' al final solo separan secciones en el archivo
+        while contenido and (not contenido[-1].strip() or RE_SEPARADOR.match(contenido[-1])):
+            contenido.pop()
+        markdown = "\n".join(contenido)
+
+        if not texto_titulo:
+            if not markdown.strip():
+                continue
+            identificador, reto_id = "portada", None
+            texto_titulo = titulo_documento or "Portada"
+        else:
+            reto = RE_RETO.match(texto_titulo)
+            reto_id = int(reto.group(1)) if reto else None
+            identificador = f"reto-{reto_id}" if reto else slug(texto_titulo) or "seccion"
+
+        if _es_indice_manual(markdown):
+            continue
+
+        # Identificadores únicos aunque se repita un título
+        base, n = identificador, 2
+        while identificador in usados:
+            identificador = f"{base}-{n}"
+            n += 1
+        usados.add(identificador)
+
+        secciones.append(SeccionWriteup(identificador, texto_titulo, nivel, reto_id, markdown))
+
+    return titulo_documento, secciones
+
+
+# ============================================================================
+# CACHÉ DEL WRITE-UP
+# ============================================================================
+
+class CuerpoSeccion(NamedTuple):
+    """HTML de una sección en cada codificación disponible"""
+    etag: str
+    codificaciones: Dict[str, bytes]
+
+
+class WriteupTaller:
+    """
+    Write-up procesado y comprimido en memoria. Se vuelve a procesar solo
+    cuando cambia el archivo (mtime o tamaño).
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._firma = None
+        self.titulo = ""
+        self.indice: List[Dict] = []
+        self.huella = ""
+        self._cuerpos: Dict[str, CuerpoSeccion] = {}
+
+    def actualizar(self) -> bool:
+        """
+        Procesa el archivo si cambió desde la última vez.
+
+        Returns:
+            True si se volvió a procesar
+
+        Raises:
+            FileNotFoundError: Si el archivo no existe
+        """
+        info = os.stat(self.ruta)
+        firma = (info.st_mtime_ns, info.st_size)
+        if firma == self._firma:
+            return False
+
+        with self._lock:
+            if firma == self._firma:
+                return False
+            with open(self.ruta, "r", encoding="utf-8") as f:
+                texto = f.read()
+            self._procesar(texto)
+            self._firma = firma
+        return True
+
+    def _procesar(self, texto: str) -> None:
+        titulo, secciones = dividir_secciones(texto)
+        brotli = _importar_brotli()
+
+        indice = []
+        cuerpos = {}
+        for seccion in secciones:
+            entrada = {
+                "id": seccion.id,
+                "titulo": seccion.titulo,
+                "nivel": seccion.nivel,
+                "reto_id": seccion.reto_id,
+                "contenido": seccion.tiene_contenido
+            }
+            if seccion.tiene_contenido:
+                cuerpo = markdown_a_html(seccion.markdown).encode("utf-8")
+                codificaciones = {
+                    "identity": cuerpo,
+                    # mtime=0: el mismo HTML da siempre los mismos bytes
+                    "gzip": gzip.compress(cuerpo, NIVEL_GZIP, mtime=0)
+                }
+                if brotli is not None:
+                    codificaciones["br"] = brotli.compress(cuerpo, quality=NIVEL_BROTLI)
+                cuerpos[seccion.id] = CuerpoSeccion(hashlib.sha1(cuerpo).hexdigest(), codificaciones)
+                entrada["bytes"] = len(cuerpo)
+            indice.append(entrada)
+
+        # Se reemplaza todo junto: las peticiones en curso ven una versión completa
+        self.titulo = titulo
+        self.indice = indice
+        self.huella = hashlib.sha1(json.dumps([titulo, indice], sort_keys=True).encode("utf-8")).hexdigest()
+        self._cuerpos = cuerpos
+
+    def codificaciones(self) -> Tuple[str, ...]:
+        """Codificaciones disponibles además de identity (preferidas primero)"""
+        return ("br", "gzip") if _importar_brotli() is not None else ("gzip",)
+
+    def seccion(self, seccion_id: str, codificacion: str = "identity") -> Optional[Tuple[bytes, str]]:
+        """
+        HTML de una sección en la codificación pedida.
+
+        Returns:
+            Tupla (cuerpo, etag), o None si la sección no existe
+        """
+        cuerpo = self._cuerpos.get(seccion_id)
+        if cuerpo is None:
+            return None
+        datos = cuerpo.codificaciones.get(codificacion, cuerpo.codificaciones["identity"])
+        return datos, cuerpo.etag
+
+
+def main():
+    """Muestra el índice del taller y el tamaño de cada sección"""
+    import sys
+    ruta = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "TALLER.md")
+    writeup = WriteupTaller(ruta)
+    writeup.actualizar()
+
+    print(f"📖 {writeup.titulo}\n")
+    for entrada in writeup.indice:
+        sangria = "  " if entrada["nivel"] > 2 else ""
+        if not entrada["contenido"]:
+            print(f"{sangria}{entrada['titulo']}")
+            continue
+        gz = len(writeup.seccion(entrada["id"], "gzip")[0])
+        print(f"{sangria}{entrada['titulo']}  [{entrada['id']}] {entrada['bytes']} B -> {gz} B gzip")
+
+
+if __name__ == "__main__":
+    main()